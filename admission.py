@@ -0,0 +1,219 @@
+# admission.py
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUED, ADMISSION_REJECTED, STAGE_SECONDS
+
+# -------------------------------------------------------
+# Admission control for the CPU-heavy endpoints
+#
+# /api/parse-resume and /api/submit-application each get a controller:
+#
+#   per-IP token bucket   <RATE_PER_MINUTE> sustained, <RATE_BURST> at once;
+#                         over it -> 429 with Retry-After = time to next token
+#   concurrency limit     at most <MAX_CONCURRENCY> requests running
+#   wait queue            up to <MAX_QUEUE> more wait for a slot, for at
+#                         most ADMISSION_MAX_WAIT s; a full queue or a wait
+#                         that runs out -> 503 with Retry-After estimated from
+#                         recent service times
+#
+# The check runs before the request body is parsed, so a rejected upload
+# costs almost nothing, and health checks are never queued behind a burst.
+# State is per process: under gunicorn each worker enforces its own limits
+# (so the host allows WEB_WORKERS x MAX_CONCURRENCY). Buckets live in memory,
+# least recently seen clients are dropped past MAX_CLIENTS.
+# -------------------------------------------------------
+MAX_CLIENTS = 10000
+MAX_RETRY_AFTER = 60
+
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status: int, reason: str, retry_after: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBuckets:
+    """Per-client token buckets: `rate_per_minute` refill, `burst` capacity."""
+
+    def __init__(self, rate_per_minute: float, burst: int, max_clients: int = MAX_CLIENTS) -> None:
+        self.rate = rate_per_minute / 60.0
+        self.burst = max(1, burst)
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # client -> [tokens, last refill]
+        self._lock = threading.Lock()
+
+    def take(self, client: str) -> float:
+        """Take a token; returns 0.0 when allowed, else seconds until one is available."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = [float(self.burst), now]
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1.0:
+                bucket[0] -= 1.0
+                return 0.0
+            return (1.0 - bucket[0]) / self.rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        endpoint: str,
+        concurrency: int,
+        queue_size: int,
+        max_wait: float,
+        rate_per_minute: float = 0,
+        burst: int = 1,
+    ) -> None:
+        self.endpoint = endpoint
+        self.concurrency = max(1, concurrency)
+        self.queue_size = max(0, queue_size)
+        self.max_wait = max_wait
+        self.buckets = TokenBuckets(rate_per_minute, burst) if rate_per_minute > 0 else None
+        self._cond = threading.Condition()
+        self._running = 0
+        self._waiting = 0
+        self._service_time = 1.0  # EWMA of seconds per request, for Retry-After
+        self.rejected: Dict[str, int] = {"rate_limited": 0, "queue_full": 0, "queue_timeout": 0}
+
+    def _reject(self, status: int, reason: str, retry_after: float, message: str) -> AdmissionRejected:
+        with self._cond:
+            self.rejected[reason] += 1
+        ADMISSION_REJECTED.inc(endpoint=self.endpoint, reason=reason)
+        return AdmissionRejected(status, reason, min(MAX_RETRY_AFTER, max(1, math.ceil(retry_after))), message)
+
+    def _busy_retry_after(self) -> float:
+        # Time for the current backlog to drain through the slots.
+        return self._service_time * (self._waiting + 1) / self.concurrency
+
+    def acquire(self, client: str) -> float:
+        """
+        Take a slot for `client` or raise AdmissionRejected. Returns the start
+        time to hand back to release().
+        """
+        if self.buckets is not None:
+            wait = self.buckets.take(client)
+            if wait:
+                raise self._reject(429, "rate_limited", wait, "Too many requests; please wait and try again.")
+
+        t0 = time.monotonic()
+        reason = None
+        with self._cond:
+            if self._running >= self.concurrency:
+                if self._waiting >= self.queue_size:
+                    reason = "queue_full"
+                else:
+                    self._waiting += 1
+                    ADMISSION_QUEUED.inc(endpoint=self.endpoint)
+                    try:
+                        if not self._cond.wait_for(lambda: self._running < self.concurrency, self.max_wait):
+                            reason = "queue_timeout"
+                    finally:
+                        self._waiting -= 1
+                        ADMISSION_QUEUED.dec(endpoint=self.endpoint)
+            if reason is None:
+                self._running += 1
+            else:
+                retry_after = self._busy_retry_after()
+        if reason is not None:
+            raise self._reject(503, reason, retry_after, "Server is busy; please try again shortly.")
+        STAGE_SECONDS.observe(time.monotonic() - t0, stage="admission_wait", detail=self.endpoint)
+
+        ADMISSION_IN_FLIGHT.inc(endpoint=self.endpoint)
+        return time.monotonic()
+
+    def release(self, started: float) -> None:
+        elapsed = time.monotonic() - started
+        ADMISSION_IN_FLIGHT.dec(endpoint=self.endpoint)
+        with self._cond:
+            self._running -= 1
+            self._service_time = 0.8 * self._service_time + 0.2 * elapsed
+            self._cond.notify()
+
+    @contextmanager
+    def admit(self, client: str) -> Iterator[None]:
+        """Hold a slot for the duration of the block, or raise AdmissionRejected."""
+        started = self.acquire(client)
+        try:
+            yield
+        finally:
+            self.release(started)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "in_flight": self._running,
+                "queued": self._waiting,
+                "max_concurrency": self.concurrency,
+                "max_queue": self.queue_size,
+                "rejected": dict(self.rejected),
+                "clients": len(self.buckets) if self.buckets is not None else 0,
+            }
+
+
+# -------------------------------------------------------
+# Process-wide controllers
+# -------------------------------------------------------
+_CONTROLLERS: Dict[str, AdmissionController] = {}
+_CONTROLLERS_LOCK = threading.Lock()
+
+# endpoint -> config key prefix
+ENDPOINTS = {"parse-resume": "PARSE", "submit-application": "SUBMIT"}
+
+
+def get_admission_controller(cfg: Dict[str, Any], endpoint: str) -> Optional[AdmissionController]:
+    """The controller for `endpoint`, or None when ADMISSION_ENABLED is off."""
+    if not cfg.get("ADMISSION_ENABLED"):
+        return None
+    with _CONTROLLERS_LOCK:
+        controller = _CONTROLLERS.get(endpoint)
+        if controller is None:
+            prefix = ENDPOINTS[endpoint]
+            controller = _CONTROLLERS[endpoint] = AdmissionController(
+                endpoint,
+                concurrency=cfg[f"{prefix}_MAX_CONCURRENCY"] or os.cpu_count() or 1,
+                queue_size=cfg[f"{prefix}_MAX_QUEUE"],
+                max_wait=cfg["ADMISSION_MAX_WAIT"],
+                rate_per_minute=cfg[f"{prefix}_RATE_PER_MINUTE"],
+                burst=cfg[f"{prefix}_RATE_BURST"],
+            )
+        return controller
+
+
+def admission_stats(cfg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not cfg.get("ADMISSION_ENABLED"):
+        return None
+    return {endpoint: get_admission_controller(cfg, endpoint).stats() for endpoint in ENDPOINTS}
+
+
+def client_address(remote_addr: Optional[str], forwarded_for: Optional[str], trusted_proxies: int) -> str:
+    """
+    The client's IP. Behind `trusted_proxies` reverse proxies the address is
+    that many entries from the right of X-Forwarded-For (entries further
+    left are whatever the client chose to send).
+    """
+    if trusted_proxies > 0 and forwarded_for:
+        hops = [h.strip() for h in forwarded_for.split(",") if h.strip()]
+        if hops:
+            return hops[-min(trusted_proxies, len(hops))]
+    return remote_addr or "unknown"
@@ -1,63 +1,180 @@
 # app.py
 from __future__ import annotations
 
+import functools
+import hmac
 import json
-from typing import Any, Dict
+import time
+from typing import Any, Callable, Dict, Optional
 
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, current_app, g, make_response, request, jsonify, send_file
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 
+from admission import AdmissionRejected, admission_stats, client_address, get_admission_controller
+from archive import SEARCH_FIELDS, get_archive
+from extract_pool import ExtractionLimitExceeded, SandboxUnavailable
+from idempotency import IDEMPOTENCY_HEADER, IdempotencyConflict
+from legal_registry import UnknownLegalVersion
+from profiling import PROFILE_HEADER, PROFILE_ID_HEADER, get_request_profiler
+from readiness import get_readiness_prober
 from services import (
+    autofill_state,
+    enqueue_application_payload,
+    get_extension,
+    get_submission_status,
     load_env_and_config,
+    mail_digest_stats,
     parse_resume_file,
+    resume_cache_stats,
     submit_application_payload,
 )
+from metrics import CONTENT_TYPE, ERRORS, REQUEST_SECONDS, RESUME_UPLOADS, STAGE_SECONDS, render_metrics
+from uploads import configure_uploads
+
+api = Blueprint("api", __name__)
+
+
+def _cfg() -> Dict[str, Any]:
+    return current_app.config["APP_CFG"]
 
-app = Flask(__name__)
 
-@app.before_request
 def log_request() -> None:
+    g.request_t0 = time.perf_counter()
     print(f"➡ {request.method} {request.path}")
 
-CFG = load_env_and_config()
-app.secret_key = CFG["FLASK_SECRET_KEY"]
 
-CORS(
-    app,
-    resources={r"/api/*": {"origins": CFG["CORS_ORIGINS"]}},
-    supports_credentials=True,
-)
+def observe_request(response: Response) -> Response:
+    t0 = getattr(g, "request_t0", None)
+    if t0 is not None:
+        # Route template, not the raw path, so job ids don't explode label cardinality.
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - t0, route=route, method=request.method, status=str(response.status_code)
+        )
+    return response
+
+
+def upload_too_large(e: RequestEntityTooLarge) -> Any:
+    return jsonify({"error": e.description}), 413
+
+
+def admission_controlled(endpoint: str) -> Callable:
+    """
+    Run the view only once admission.py grants a slot; otherwise answer
+    429/503 with Retry-After before the upload is even parsed.
+    """
+    def decorate(view: Callable) -> Callable:
+        @functools.wraps(view)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            cfg = _cfg()
+            controller = get_admission_controller(cfg, endpoint)
+            if controller is None:
+                return view(*args, **kwargs)
+            client = client_address(
+                request.remote_addr, request.headers.get("X-Forwarded-For"), cfg["TRUSTED_PROXY_COUNT"]
+            )
+            try:
+                started = controller.acquire(client)
+            except AdmissionRejected as e:
+                resp = jsonify({"error": str(e), "code": e.reason})
+                resp.headers["Retry-After"] = str(e.retry_after)
+                return resp, e.status
+            try:
+                return view(*args, **kwargs)
+            finally:
+                controller.release(started)
+        return wrapper
+    return decorate
+
 
-@app.route("/api/health", methods=["GET"])
+def profiled(endpoint: str, view: Callable) -> Callable:
+    """
+    Profile the view when profiling.py wants this request. Only installed by
+    create_app() with PROFILE_ENABLED, so it costs nothing otherwise.
+    """
+    @functools.wraps(view)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        cfg = _cfg()
+        profiler = get_request_profiler(cfg)
+        client = client_address(
+            request.remote_addr, request.headers.get("X-Forwarded-For"), cfg["TRUSTED_PROXY_COUNT"]
+        )
+        if profiler is None or not profiler.wanted(client, request.headers.get(PROFILE_HEADER)):
+            return view(*args, **kwargs)
+        with profiler.profile(endpoint) as profile_id:
+            response = make_response(view(*args, **kwargs))
+        if profile_id:
+            response.headers[PROFILE_ID_HEADER] = profile_id
+        return response
+    return wrapper
+
+
+@api.route("/api/health", methods=["GET"])
 def health() -> Any:
+    cfg = _cfg()
     return jsonify(
         {
             "status": "ok",
-            "autofill_ready": bool(CFG["GEMINI_API_KEY"]),
-            "gemini_key_set": bool(CFG["GEMINI_API_KEY"]),
-            "model": CFG["GEMINI_MODEL"],
-            "mail_to": CFG["APPLICATION_MAIL_TO"],
-            "smtp_ready": bool(CFG["SMTP_HOST"]),
+            "autofill_ready": autofill_state(cfg) in {"closed", "half-open"},
+            "autofill_breaker": autofill_state(cfg),
+            "gemini_key_set": bool(cfg["GEMINI_API_KEY"]),
+            "model": cfg["GEMINI_MODEL"],
+            "mail_to": cfg["APPLICATION_MAIL_TO"],
+            "smtp_ready": bool(cfg["SMTP_HOST"]),
+            "resume_cache": resume_cache_stats(cfg),
+            "mail_digest_pending": mail_digest_stats(cfg),
+            "mail_digest_failed": mail_digest_stats(cfg, "failed"),
+            "admission": admission_stats(cfg),
         }
     )
 
-@app.route("/api/parse-resume", methods=["POST"])
+@api.route("/api/ready", methods=["GET"])
+def ready() -> Any:
+    """
+    Load balancer readiness: 200 when the last background probe round
+    passed, else 503. Served from the cached result; never probes inline.
+    """
+    is_ready, body = get_readiness_prober(_cfg()).snapshot()
+    return Response(body, status=200 if is_ready else 503, content_type="application/json")
+
+@api.route("/api/metrics", methods=["GET"])
+def metrics() -> Any:
+    return Response(render_metrics(), mimetype=None, content_type=CONTENT_TYPE)
+
+@api.route("/api/parse-resume", methods=["POST"])
+@admission_controlled("parse-resume")
 def parse_resume() -> Any:
-    file = request.files.get("file")
+    cfg = _cfg()
+    with STAGE_SECONDS.time(stage="upload_read", detail="parse-resume"):
+        file = request.files.get("file")
     if not file:
         return jsonify({"error": "No file provided"}), 400
+    RESUME_UPLOADS.inc(endpoint="parse-resume", ext=get_extension(file.filename) or "none")
 
     try:
-        result = parse_resume_file(file, CFG)
+        result = parse_resume_file(file, cfg)
         return jsonify(result)
+    except RequestEntityTooLarge:
+        raise
+    except ExtractionLimitExceeded as e:
+        ERRORS.inc(route="/api/parse-resume", type=type(e).__name__)
+        return jsonify({"error": str(e), "code": "extraction_limit"}), 422
     except ValueError as e:
+        ERRORS.inc(route="/api/parse-resume", type=type(e).__name__)
         return jsonify({"error": str(e)}), 400
+    except SandboxUnavailable as e:
+        ERRORS.inc(route="/api/parse-resume", type=type(e).__name__)
+        print("❌ /api/parse-resume sandbox error:", repr(e))
+        return jsonify({"error": "Resume processing is temporarily unavailable."}), 503
     except Exception as e:
+        ERRORS.inc(route="/api/parse-resume", type=type(e).__name__)
         print("❌ /api/parse-resume error:", repr(e))
         return jsonify({"error": "Internal error while processing resume."}), 500
 
 
-@app.route("/api/submit-application", methods=["POST"])
+@api.route("/api/submit-application", methods=["POST"])
+@admission_controlled("submit-application")
 def submit_application() -> Any:
     """
     Accepts either:
@@ -75,7 +192,17 @@ def submit_application() -> Any:
       6) Resume PDF (original if already PDF; otherwise converted to PDF)
 
     No extra “10-key / typing speed” etc. are used anywhere (removed).
+
+    With SUBMIT_QUEUE_ENABLED (default) the submission is spooled to disk and
+    sent in the background: responds 202 with a job id for
+    /api/submission-status/<job_id>. Otherwise renders + sends inline (200).
+
+    Retries are deduplicated on the Idempotency-Key header (or, without
+    one, a hash of payload + resume): a repeat of a submission that was
+    already accepted returns the original response with
+    Idempotent-Replayed: true and nothing is rendered or sent again.
     """
+    cfg = _cfg()
     try:
         payload: Dict[str, Any] = {}
         resume_bytes = None
@@ -84,7 +211,9 @@ def submit_application() -> Any:
         content_type = request.content_type or ""
 
         if content_type.startswith("multipart/form-data"):
-            payload_str = request.form.get("payload", "")
+            with STAGE_SECONDS.time(stage="upload_read", detail="submit-application"):
+                payload_str = request.form.get("payload", "")
+                resume_file = request.files.get("resume")
             if not payload_str.strip():
                 return jsonify({"error": "Missing payload field."}), 400
 
@@ -93,9 +222,10 @@ def submit_application() -> Any:
             except Exception:
                 return jsonify({"error": "Invalid payload JSON."}), 400
 
-            resume_file = request.files.get("resume")
             if resume_file and resume_file.filename:
-                resume_bytes = resume_file.read()
+                RESUME_UPLOADS.inc(endpoint="submit-application", ext=get_extension(resume_file.filename) or "none")
+                # Spooled upload (memory, or disk past UPLOAD_SPOOL_THRESHOLD); not read into bytes here.
+                resume_bytes = resume_file.stream
                 resume_filename = resume_file.filename
         else:
             payload = request.get_json(force=True, silent=False) or {}
@@ -107,26 +237,181 @@ def submit_application() -> Any:
         if not isinstance(form, dict):
             return jsonify({"error": "Invalid form object."}), 400
 
-        submit_application_payload(
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+
+        if cfg["SUBMIT_QUEUE_ENABLED"]:
+            job_id, replayed = enqueue_application_payload(
+                payload,
+                cfg,
+                resume_bytes=resume_bytes,
+                resume_filename=resume_filename,
+                idempotency_key=idempotency_key,
+            )
+            resp = jsonify({"status": "queued", "job_id": job_id})
+            if replayed:
+                resp.headers["Idempotent-Replayed"] = "true"
+            return resp, 202
+
+        replayed = submit_application_payload(
             payload,
-            CFG,
+            cfg,
             resume_bytes=resume_bytes,
             resume_filename=resume_filename,
+            idempotency_key=idempotency_key,
         )
 
-        return jsonify({"status": "ok"})
+        resp = jsonify({"status": "ok"})
+        if replayed:
+            resp.headers["Idempotent-Replayed"] = "true"
+        return resp
 
+    except RequestEntityTooLarge:
+        raise
+    except UnknownLegalVersion as e:
+        # The client retries with the full legalText.
+        ERRORS.inc(route="/api/submit-application", type=type(e).__name__)
+        return jsonify({"error": str(e), "code": "unknown_legal_version"}), 409
+    except IdempotencyConflict as e:
+        ERRORS.inc(route="/api/submit-application", type=type(e).__name__)
+        return jsonify({"error": str(e)}), 422
+    except ExtractionLimitExceeded as e:
+        ERRORS.inc(route="/api/submit-application", type=type(e).__name__)
+        return jsonify({"error": str(e), "code": "extraction_limit"}), 422
     except ValueError as e:
+        ERRORS.inc(route="/api/submit-application", type=type(e).__name__)
         return jsonify({"error": str(e)}), 400
+    except SandboxUnavailable as e:
+        ERRORS.inc(route="/api/submit-application", type=type(e).__name__)
+        print("❌ /api/submit-application sandbox error:", repr(e))
+        return jsonify({"error": "Resume processing is temporarily unavailable."}), 503
     except RuntimeError as e:
+        ERRORS.inc(route="/api/submit-application", type=type(e).__name__)
         print("❌ /api/submit-application runtime error:", repr(e))
         return jsonify({"error": str(e)}), 500
     except Exception as e:
+        ERRORS.inc(route="/api/submit-application", type=type(e).__name__)
         print("❌ /api/submit-application error:", repr(e))
         return jsonify({"error": "Internal error while submitting application."}), 500
 
 
+@api.route("/api/submission-status/<job_id>", methods=["GET"])
+def submission_status(job_id: str) -> Any:
+    cfg = _cfg()
+    status = get_submission_status(job_id, cfg)
+    if status is None:
+        return jsonify({"error": "Unknown submission id."}), 404
+    return jsonify(status)
+
+
+# -------------------------------------------------------
+# Archive of sent applications (HR only; needs ARCHIVE_API_TOKEN)
+# -------------------------------------------------------
+def _archive_or_error():
+    """(archive, None) for an authorized request, else (None, error response)."""
+    cfg = _cfg()
+    token = cfg["ARCHIVE_API_TOKEN"]
+    archive = get_archive(cfg) if token else None
+    if archive is None:
+        return None, (jsonify({"error": "Not found."}), 404)
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(supplied.encode("utf-8"), token.encode("utf-8")):
+        return None, (jsonify({"error": "Unauthorized."}), 401)
+    return archive, None
+
+
+@api.route("/api/archive/search", methods=["GET"])
+def archive_search() -> Any:
+    """
+    ?q=words&position=&location=&skills=&name=&resume=&since=&until=&limit=&cursor=
+    since/until are Unix timestamps; results are newest first, and
+    next_cursor (when not null) fetches the following page.
+    """
+    archive, error = _archive_or_error()
+    if error:
+        return error
+    args = request.args
+    try:
+        page = archive.search(
+            args.get("q", ""),
+            since=float(args["since"]) if args.get("since") else None,
+            until=float(args["until"]) if args.get("until") else None,
+            limit=int(args.get("limit", 20)),
+            cursor=args.get("cursor") or None,
+            **{column: args.get(column) for column in SEARCH_FIELDS},
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify(page)
+
+
+@api.route("/api/archive/<int:app_id>", methods=["GET"])
+def archive_record(app_id: int) -> Any:
+    archive, error = _archive_or_error()
+    if error:
+        return error
+    record = archive.get(app_id)
+    if record is None:
+        return jsonify({"error": "Unknown application."}), 404
+    return jsonify(record)
+
+
+@api.route("/api/archive/<int:app_id>/documents/<name>", methods=["GET"])
+def archive_document(app_id: int, name: str) -> Any:
+    archive, error = _archive_or_error()
+    if error:
+        return error
+    path = archive.document_path(app_id, name)
+    if path is None or not path.is_file():
+        return jsonify({"error": "Unknown document."}), 404
+    return send_file(path, mimetype="application/pdf", download_name=f"{app_id}_{name}.pdf")
+
+
+# -------------------------------------------------------
+# App factory
+# -------------------------------------------------------
+def create_app(cfg: Optional[Dict[str, Any]] = None) -> Flask:
+    """
+    Build the Flask app. `cfg` defaults to load_env_and_config(); serve.py
+    passes its own so the pre-fork master and the workers share one config.
+    """
+    cfg = cfg if cfg is not None else load_env_and_config()
+
+    app = Flask(__name__)
+    app.config["APP_CFG"] = cfg
+    app.secret_key = cfg["FLASK_SECRET_KEY"]
+    configure_uploads(app, cfg)
+
+    CORS(
+        app,
+        resources={r"/api/*": {"origins": cfg["CORS_ORIGINS"]}},
+        supports_credentials=True,
+    )
+
+    app.before_request(log_request)
+    app.after_request(observe_request)
+    app.register_error_handler(RequestEntityTooLarge, upload_too_large)
+    app.register_blueprint(api)
+    if cfg.get("PROFILE_ENABLED"):
+        for endpoint in ("parse-resume", "submit-application"):
+            name = f"api.{endpoint.replace('-', '_')}"
+            app.view_functions[name] = profiled(endpoint, app.view_functions[name])
+    return app
+
+
+def __getattr__(name: str) -> Any:
+    # `flask --app app run` and `gunicorn app:app` look up a module-level
+    # `app`; build it on first access so importing create_app stays cheap.
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    if name == "CFG":
+        return __getattr__("app").config["APP_CFG"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 if __name__ == "__main__":
+    # Development server only; see serve.py for production.
+    app = create_app()
     with app.app_context():
         print("🔍 Registered routes:")
         for rule in app.url_map.iter_rules():
@@ -0,0 +1,490 @@
+# archive.py
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# -------------------------------------------------------
+# Submission archive
+#
+# With ARCHIVE_ENABLED (off by default), every sent application is kept in
+# ARCHIVE_DIR for ARCHIVE_RETENTION_DAYS (0 = indefinitely):
+#
+#   archive.db     one row per application (payload JSON, resume text and the
+#                  searchable fields), an FTS5 index over name / position /
+#                  location / skills / resume text, and the list of PDFs
+#   blobs/ab/...   the generated PDFs, content-addressed by SHA-256
+#
+# The FTS table is external-content (it indexes the applications table
+# instead of keeping a second copy of every resume). Ids are assigned in
+# submission order, so "newest first" is rowid descending: FTS5 walks its
+# doclists backwards and stops after one page, and the cursor is the last
+# id seen. A page costs about the same at 100k applications as at 100,
+# however common the search words are.
+#
+# Expired applications are purged at most once an hour, after an add(): the
+# row, its index entry, and every PDF no other application still uses.
+#
+#   python archive.py search "slope stability" --position engineer
+#   python archive.py show 1234
+#   python archive.py export 1234 resume -o resume.pdf
+#   python archive.py stats
+#   python archive.py dump > payloads.jsonl     # input for regenerate.py
+#   python archive.py purge --days 365
+# -------------------------------------------------------
+SKILL_FIELDS = (
+    "skillsPrimaryFocus", "skillsTechnical", "skillsSoftware",
+    "skillsFieldLab", "skillsCommunication", "skillsCertifications",
+)
+SEARCH_FIELDS = ("name", "position", "location", "skills", "resume")
+MAX_PAGE_SIZE = 100
+PURGE_INTERVAL = 3600.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS applications (
+    id              INTEGER PRIMARY KEY,
+    submission_id   TEXT NOT NULL UNIQUE,   -- payload + resume fingerprint
+    submitted_at    REAL NOT NULL,
+    name            TEXT,
+    email           TEXT,
+    phone           TEXT,
+    position        TEXT,
+    location        TEXT,
+    skills          TEXT,
+    resume          TEXT,                   -- extracted resume text
+    resume_filename TEXT,
+    payload         TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS applications_submitted ON applications (submitted_at);
+CREATE INDEX IF NOT EXISTS applications_email ON applications (email);
+CREATE TABLE IF NOT EXISTS documents (
+    application_id  INTEGER NOT NULL REFERENCES applications (id),
+    name            TEXT NOT NULL,          -- main | eeo | disability | veteran | drug | resume
+    sha256          TEXT NOT NULL,
+    size            INTEGER NOT NULL,
+    PRIMARY KEY (application_id, name)
+);
+CREATE INDEX IF NOT EXISTS documents_sha256 ON documents (sha256);
+CREATE VIRTUAL TABLE IF NOT EXISTS applications_fts USING fts5(
+    name, position, location, skills, resume,
+    content='applications', content_rowid='id', tokenize='porter unicode61'
+);
+"""
+
+
+def _fts_phrase(text: str) -> str:
+    # Each word becomes a quoted FTS5 string, so user input can't inject
+    # query syntax; a trailing * is kept as a prefix match.
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+def fts_query(q: str = "", **fields: Optional[str]) -> str:
+    """FTS5 MATCH expression: all words of `q` anywhere, plus per-column filters."""
+    parts = []
+    if q and _fts_phrase(q):
+        parts.append(_fts_phrase(q))
+    for column, value in fields.items():
+        if column not in SEARCH_FIELDS:
+            raise ValueError(f"Unknown search field: {column}")
+        if value and _fts_phrase(value):
+            parts.append(f"{column} : ({_fts_phrase(value)})")
+    return " AND ".join(f"({p})" for p in parts)
+
+
+class SubmissionArchive:
+    def __init__(self, directory: str | Path, retention_days: float = 0.0) -> None:
+        self.directory = Path(directory)
+        self.blob_dir = self.directory / "blobs"
+        self.path = self.directory / "archive.db"
+        self.retention_days = retention_days
+        self._next_purge = 0.0
+        self._purge_lock = threading.Lock()
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    # ---------------------------------------------------
+    # Blobs
+    # ---------------------------------------------------
+    def _blob_path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / f"{digest}.pdf"
+
+    def _put_blob(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if not path.exists():
+            path.parent.mkdir(exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+        return digest
+
+    # ---------------------------------------------------
+    # Writes
+    # ---------------------------------------------------
+    def add(
+        self,
+        submission_id: str,
+        payload: Dict[str, Any],
+        documents: Dict[str, bytes],
+        resume_text: Optional[str] = None,
+        resume_filename: Optional[str] = None,
+        submitted_at: Optional[float] = None,
+    ) -> Tuple[int, bool]:
+        """
+        Store one application; returns (archive id, created). Adding the same
+        submission_id again (a resent submission) keeps the first copy.
+        """
+        form = payload.get("form") or {}
+        location = form.get("location") or ", ".join(
+            str(form[k]) for k in ("city", "state") if form.get(k)
+        )
+        skills = "\n".join(str(form[k]) for k in SKILL_FIELDS if form.get(k))
+        blobs = [(name, self._put_blob(pdf), len(pdf)) for name, pdf in documents.items()]
+
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM applications WHERE submission_id = ?", (submission_id,)
+            ).fetchone()
+            if row is not None:
+                conn.execute("COMMIT")
+                return row["id"], False
+            values = (
+                submission_id,
+                # Taken inside the write lock so ids and times increase together.
+                submitted_at if submitted_at is not None else time.time(),
+                form.get("name"), form.get("email"), form.get("phone"), form.get("position"),
+                location or None, skills or None, resume_text, resume_filename,
+                json.dumps(payload, ensure_ascii=False, separators=(",", ":")),
+            )
+            cur = conn.execute(
+                "INSERT INTO applications (submission_id, submitted_at, name, email, phone, position, location,"
+                " skills, resume, resume_filename, payload) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                values,
+            )
+            app_id = cur.lastrowid
+            conn.execute(
+                "INSERT INTO applications_fts (rowid, name, position, location, skills, resume)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (app_id, values[2], values[5], values[6], values[7], values[8]),
+            )
+            conn.executemany(
+                "INSERT INTO documents (application_id, name, sha256, size) VALUES (?, ?, ?, ?)",
+                [(app_id, name, digest, size) for name, digest, size in blobs],
+            )
+            conn.execute("COMMIT")
+            return app_id, True
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def purge(self, before: float) -> int:
+        """Delete applications submitted before `before` (Unix time) and their unshared PDFs; returns how many."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            expired = "SELECT id FROM applications WHERE submitted_at < ?"
+            digests = {
+                r[0]
+                for r in conn.execute(f"SELECT sha256 FROM documents WHERE application_id IN ({expired})", (before,))
+            }
+            # External-content FTS: an entry is removed by replaying its indexed values.
+            conn.execute(
+                "INSERT INTO applications_fts (applications_fts, rowid, name, position, location, skills, resume)"
+                " SELECT 'delete', id, name, position, location, skills, resume FROM applications"
+                " WHERE submitted_at < ?",
+                (before,),
+            )
+            conn.execute(f"DELETE FROM documents WHERE application_id IN ({expired})", (before,))
+            deleted = conn.execute("DELETE FROM applications WHERE submitted_at < ?", (before,)).rowcount
+            # Blobs are content-addressed: keep the ones a newer application still uses.
+            orphans = [
+                d for d in digests
+                if conn.execute("SELECT 1 FROM documents WHERE sha256 = ? LIMIT 1", (d,)).fetchone() is None
+            ]
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        for digest in orphans:
+            self._blob_path(digest).unlink(missing_ok=True)
+        return deleted
+
+    def purge_expired(self) -> int:
+        """Apply the retention period, at most once per PURGE_INTERVAL; returns applications deleted."""
+        if self.retention_days <= 0:
+            return 0
+        now = time.time()
+        with self._purge_lock:
+            if now < self._next_purge:
+                return 0
+            self._next_purge = now + PURGE_INTERVAL
+        return self.purge(now - self.retention_days * 86400)
+
+    # ---------------------------------------------------
+    # Reads
+    # ---------------------------------------------------
+    def search(
+        self,
+        q: str = "",
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        **fields: Optional[str],
+    ) -> Dict[str, Any]:
+        """
+        Newest-first page of matching applications:
+        {"results": [...], "next_cursor": str | None}. Pass next_cursor back
+        to get the following page.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        match = fts_query(q, **fields)
+        try:
+            below = int(cursor) if cursor else None
+        except ValueError:
+            raise ValueError("Invalid cursor.")
+
+        columns = (
+            "a.id, a.submission_id, a.submitted_at, a.name, a.email, a.phone, a.position, a.location,"
+            " a.resume_filename"
+        )
+        with closing(self._connect()) as conn:
+            # Time bounds become id bounds (one index probe each).
+            low = None
+            if since is not None:
+                low = self._first_id_at(conn, since)
+                if low is None:
+                    return {"results": [], "next_cursor": None}
+            if until is not None:
+                end = self._first_id_at(conn, until)
+                if end is not None:
+                    below = min(below, end) if below is not None else end
+
+            rowid = "f.rowid" if match else "a.id"
+            where: List[str] = []
+            params: List[Any] = []
+            if match:
+                where.append("applications_fts MATCH ?")
+                params.append(match)
+            if below is not None:
+                where.append(f"{rowid} < ?")
+                params.append(below)
+            if low is not None:
+                where.append(f"{rowid} >= ?")
+                params.append(low)
+            source = (
+                "applications_fts f JOIN applications a ON a.id = f.rowid" if match else "applications a"
+            )
+            sql = (
+                f"SELECT {columns} FROM {source}"
+                + (" WHERE " + " AND ".join(where) if where else "")
+                + f" ORDER BY {rowid} DESC LIMIT ?"
+            )
+            try:
+                rows = conn.execute(sql, params + [limit + 1]).fetchall()
+            except sqlite3.OperationalError as e:
+                if "fts5" in str(e):
+                    raise ValueError(f"Invalid search: {e}")
+                raise
+        results = [dict(r) for r in rows[:limit]]
+        next_cursor = str(results[-1]["id"]) if len(rows) > limit else None
+        return {"results": results, "next_cursor": next_cursor}
+
+    @staticmethod
+    def _first_id_at(conn: sqlite3.Connection, when: float) -> Optional[int]:
+        row = conn.execute(
+            "SELECT id FROM applications WHERE submitted_at >= ? ORDER BY submitted_at LIMIT 1", (when,)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def get(self, app_id: int) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM applications WHERE id = ?", (app_id,)).fetchone()
+            if row is None:
+                return None
+            docs = conn.execute(
+                "SELECT name, sha256, size FROM documents WHERE application_id = ? ORDER BY rowid", (app_id,)
+            ).fetchall()
+        record = dict(row)
+        record["payload"] = json.loads(record["payload"])
+        record["documents"] = [dict(d) for d in docs]
+        return record
+
+    def iter_payloads(self, batch: int = 500) -> Iterator[Dict[str, Any]]:
+        """Every application's payload in id order, `batch` rows per query."""
+        last = 0
+        with closing(self._connect()) as conn:
+            while True:
+                rows = conn.execute(
+                    "SELECT id, submission_id, submitted_at, payload FROM applications"
+                    " WHERE id > ? ORDER BY id LIMIT ?",
+                    (last, batch),
+                ).fetchall()
+                if not rows:
+                    return
+                for row in rows:
+                    yield {
+                        "id": row["id"],
+                        "submission_id": row["submission_id"],
+                        "submitted_at": row["submitted_at"],
+                        "payload": json.loads(row["payload"]),
+                    }
+                last = rows[-1]["id"]
+
+    def document_path(self, app_id: int, name: str) -> Optional[Path]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT sha256 FROM documents WHERE application_id = ? AND name = ?", (app_id, name)
+            ).fetchone()
+        return self._blob_path(row["sha256"]) if row is not None else None
+
+    def stats(self) -> Dict[str, Any]:
+        with closing(self._connect()) as conn:
+            count = conn.execute("SELECT count(*) FROM applications").fetchone()[0]
+            docs = conn.execute("SELECT count(*), coalesce(sum(size), 0) FROM documents").fetchone()
+        return {"applications": count, "documents": docs[0], "document_bytes": docs[1]}
+
+    def rebuild_index(self) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute("INSERT INTO applications_fts (applications_fts) VALUES ('rebuild')")
+            conn.execute("INSERT INTO applications_fts (applications_fts) VALUES ('optimize')")
+
+
+# -------------------------------------------------------
+# Process-wide archive
+# -------------------------------------------------------
+_ARCHIVE: Optional[SubmissionArchive] = None
+_ARCHIVE_LOCK = threading.Lock()
+
+
+def get_archive(cfg: Dict[str, Any]) -> Optional[SubmissionArchive]:
+    global _ARCHIVE
+
+    if not cfg.get("ARCHIVE_ENABLED"):
+        return None
+    with _ARCHIVE_LOCK:
+        if _ARCHIVE is None:
+            _ARCHIVE = SubmissionArchive(cfg["ARCHIVE_DIR"], retention_days=cfg["ARCHIVE_RETENTION_DAYS"])
+        return _ARCHIVE
+
+
+# -------------------------------------------------------
+# CLI
+# -------------------------------------------------------
+def _print_rows(rows: Iterable[Dict[str, Any]]) -> None:
+    for r in rows:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(r["submitted_at"]))
+        print(f"{r['id']:>8}  {when}  {r['name'] or '-':<28.28}  {r['position'] or '-':<28.28}  {r['location'] or '-'}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from services import load_env_and_config
+
+    cfg = load_env_and_config()
+    ap = argparse.ArgumentParser(description="Search the local archive of submitted applications.")
+    ap.add_argument("--dir", default=cfg["ARCHIVE_DIR"], help="archive directory (default ARCHIVE_DIR)")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    s = sub.add_parser("search", help="full-text search, newest first")
+    s.add_argument("q", nargs="?", default="", help="words to find anywhere (word* for a prefix)")
+    for column in SEARCH_FIELDS:
+        s.add_argument(f"--{column}", help=f"only match in {column}")
+    s.add_argument("--since", help="YYYY-MM-DD")
+    s.add_argument("--until", help="YYYY-MM-DD (exclusive)")
+    s.add_argument("--limit", type=int, default=20)
+    s.add_argument("--cursor", help="next_cursor printed by the previous page")
+    s.add_argument("--json", action="store_true")
+
+    show = sub.add_parser("show", help="print one application as JSON")
+    show.add_argument("id", type=int)
+
+    export = sub.add_parser("export", help="write one of an application's PDFs")
+    export.add_argument("id", type=int)
+    export.add_argument("document", help="main, eeo, disability, veteran, drug or resume")
+    export.add_argument("-o", "--output", required=True)
+
+    sub.add_parser("dump", help="write every payload as JSON lines to stdout, oldest first")
+    sub.add_parser("stats", help="counts and sizes")
+    sub.add_parser("reindex", help="rebuild and optimize the full-text index")
+    purge = sub.add_parser("purge", help="delete applications older than --days and their PDFs")
+    retention = cfg["ARCHIVE_RETENTION_DAYS"] or None
+    purge.add_argument("--days", type=float, default=retention, required=retention is None,
+                       help="default ARCHIVE_RETENTION_DAYS")
+    args = ap.parse_args(argv)
+
+    archive = SubmissionArchive(args.dir)
+    if args.command == "search":
+        def day(v: Optional[str]) -> Optional[float]:
+            return time.mktime(time.strptime(v, "%Y-%m-%d")) if v else None
+
+        t0 = time.perf_counter()
+        page = archive.search(
+            args.q, since=day(args.since), until=day(args.until), limit=args.limit, cursor=args.cursor,
+            **{c: getattr(args, c) for c in SEARCH_FIELDS},
+        )
+        if args.json:
+            print(json.dumps(page, indent=2))
+            return 0
+        _print_rows(page["results"])
+        print(f"⏱ {len(page['results'])} results in {(time.perf_counter() - t0) * 1000:.1f}ms")
+        if page["next_cursor"]:
+            print(f"➡ next page: --cursor {page['next_cursor']}")
+    elif args.command == "show":
+        record = archive.get(args.id)
+        if record is None:
+            print(f"❌ no application {args.id}")
+            return 1
+        print(json.dumps(record, indent=2, ensure_ascii=False))
+    elif args.command == "export":
+        path = archive.document_path(args.id, args.document)
+        if path is None:
+            print(f"❌ application {args.id} has no {args.document} document")
+            return 1
+        Path(args.output).write_bytes(path.read_bytes())
+        print(f"wrote {args.output}")
+    elif args.command == "dump":
+        for record in archive.iter_payloads():
+            sys.stdout.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+    elif args.command == "stats":
+        print(json.dumps(archive.stats(), indent=2))
+    elif args.command == "reindex":
+        archive.rebuild_index()
+        print("index rebuilt")
+    elif args.command == "purge":
+        print(f"purged {archive.purge(time.time() - args.days * 86400)} applications")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
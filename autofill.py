@@ -0,0 +1,293 @@
+# autofill.py
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional
+
+# -------------------------------------------------------
+# LLM resume autofill
+#
+# Sends the extracted resume text to Gemini and asks for JSON in the shape
+# StepResume.applyAllToForm consumes. Every call has a hard deadline, the
+# result is cached on (text hash, model), and a circuit breaker stops
+# calling the API after repeated slow/failed calls so /api/parse-resume
+# drops back to the regex path instead of waiting on a sick upstream.
+# -------------------------------------------------------
+# A model takes the prompt and a timeout in seconds and returns JSON text.
+AutofillModel = Callable[[str, float], str]
+
+_CONTACT_KEYS = ("name", "email", "phone", "cell", "address", "city", "state", "zip", "location")
+_JOB_KEYS = ("company", "address", "phone", "position", "dateFrom", "dateTo", "duties", "supervisor", "reasonForLeaving")
+_EDU_KEYS = (
+    "graduate", "graduateYears", "graduateMajor",
+    "trade", "tradeYears", "tradeMajor",
+    "high", "highYears", "highMajor",
+)
+_SKILL_KEYS = ("computerSkills", "driverLicense")
+_REF_KEYS = ("name", "company", "phone")
+
+PROMPT = """You fill in an employment application from a resume.
+Return ONLY a JSON object with exactly this shape (use null for anything not stated in the resume; do not guess):
+{
+  "contact": {"name", "email", "phone", "cell", "address", "city", "state", "zip", "location"},
+  "targetRole": string,
+  "employment": [ up to 3 most recent jobs, newest first:
+    {"company", "address", "phone", "position", "dateFrom", "dateTo", "duties", "supervisor", "reasonForLeaving"} ],
+  "education": {"graduate", "graduateYears", "graduateMajor", "trade", "tradeYears", "tradeMajor",
+                "high", "highYears", "highMajor"},
+  "skills": {"computerSkills", "driverLicense"},
+  "references": [ up to 3: {"name", "company", "phone"} ]
+}
+All values are strings or null. Dates as written in the resume (e.g. "Jan 2020", "Present").
+
+Resume:
+"""
+
+
+class AutofillUnavailable(Exception):
+    """The LLM path was skipped or failed; callers fall back to the regex parser."""
+
+
+# -------------------------------------------------------
+# Circuit breaker
+# -------------------------------------------------------
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures (or at once on
+    a permission error); open -> half-open after `reset_timeout`, where a single
+    trial call decides between closed and open again.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._open_for = reset_timeout
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at >= self._open_for:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._open_for = self.reset_timeout
+            self._trial_in_flight = False
+
+    def record_failure(self, trip: bool = False, open_for: Optional[float] = None) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if trip or self._failures >= self.failure_threshold or self._opened_at is not None:
+                self._opened_at = time.monotonic()
+                self._open_for = open_for or self.reset_timeout
+
+
+# -------------------------------------------------------
+# Models
+# -------------------------------------------------------
+def gemini_model(model_name: str, api_key: str) -> AutofillModel:
+    configured = threading.Event()
+
+    def call(prompt: str, timeout: float) -> str:
+        # Imported on first call: google.generativeai alone adds ~0.9 s to startup.
+        import google.generativeai as genai
+
+        if not configured.is_set():
+            genai.configure(api_key=api_key)
+            configured.set()
+        model = genai.GenerativeModel(model_name)
+        resp = model.generate_content(
+            prompt,
+            generation_config={"response_mime_type": "application/json", "temperature": 0},
+            request_options={"timeout": timeout},
+        )
+        return resp.text
+
+    return call
+
+
+def _is_permission_denied(exc: BaseException) -> bool:
+    try:
+        from google.api_core.exceptions import PermissionDenied
+    except ImportError:
+        return False
+    return isinstance(exc, PermissionDenied)
+
+
+# -------------------------------------------------------
+# Output normalization
+# -------------------------------------------------------
+def _str_or_none(v: Any) -> Optional[str]:
+    if v is None or isinstance(v, (dict, list)):
+        return None
+    s = str(v).strip()
+    return s or None
+
+
+def _pick(obj: Any, keys) -> Dict[str, Optional[str]]:
+    obj = obj if isinstance(obj, dict) else {}
+    return {k: _str_or_none(obj.get(k)) for k in keys}
+
+
+def _pick_list(items: Any, keys, limit: int = 3) -> List[Dict[str, Optional[str]]]:
+    items = items if isinstance(items, list) else []
+    return [_pick(i, keys) for i in items if isinstance(i, dict)][:limit]
+
+
+def normalize_autofill(raw: Any) -> Dict[str, Any]:
+    """Coerce model output into the exact parsed shape the frontend applies."""
+    raw = raw if isinstance(raw, dict) else {}
+    return {
+        "contact": _pick(raw.get("contact"), _CONTACT_KEYS),
+        "targetRole": _str_or_none(raw.get("targetRole")),
+        "employment": _pick_list(raw.get("employment"), _JOB_KEYS),
+        "education": _pick(raw.get("education"), _EDU_KEYS),
+        "skills": _pick(raw.get("skills"), _SKILL_KEYS),
+        "references": _pick_list(raw.get("references"), _REF_KEYS),
+    }
+
+
+def _parse_json(text: str) -> Any:
+    text = (text or "").strip()
+    # Models occasionally wrap JSON in a ``` fence despite the mime type.
+    fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", text, re.S)
+    if fenced:
+        text = fenced.group(1)
+    return json.loads(text)
+
+
+# -------------------------------------------------------
+# Autofill client
+# -------------------------------------------------------
+class Autofill:
+    def __init__(
+        self,
+        model: AutofillModel,
+        model_name: str,
+        timeout: float = 8.0,
+        max_chars: int = 30000,
+        max_concurrency: int = 4,
+        breaker: Optional[CircuitBreaker] = None,
+        cache=None,
+    ) -> None:
+        self.model = model
+        self.model_name = model_name
+        self.timeout = timeout
+        self.max_chars = max_chars
+        self.breaker = breaker or CircuitBreaker()
+        self.cache = cache
+        # Calls that blow the deadline keep running in the background; a small
+        # fixed pool bounds how many of those can pile up.
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_concurrency), thread_name_prefix="autofill")
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrency))
+
+    def cache_key(self, text: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{digest}-{re.sub(r'[^A-Za-z0-9._-]+', '_', self.model_name)}"
+
+    def _call(self, prompt: str) -> str:
+        try:
+            return self.model(prompt, self.timeout)
+        finally:
+            self._slots.release()
+
+    def parse(self, text: str) -> Dict[str, Any]:
+        text = (text or "")[: self.max_chars]
+        key = self.cache_key(text)
+        if self.cache is not None:
+            hit = self.cache.get("autofill", key)
+            if hit is not None:
+                return json.loads(hit)
+
+        if not self._slots.acquire(blocking=False):
+            raise AutofillUnavailable("too many autofill calls in flight")
+        if not self.breaker.allow():
+            self._slots.release()
+            raise AutofillUnavailable("circuit open")
+
+        future = self._pool.submit(self._call, PROMPT + text)
+        try:
+            raw = future.result(timeout=self.timeout)
+            parsed = normalize_autofill(_parse_json(raw))
+        except FutureTimeout:
+            self.breaker.record_failure()
+            raise AutofillUnavailable(f"no response within {self.timeout:.1f}s")
+        except Exception as e:
+            if _is_permission_denied(e):
+                # Bad/revoked key: no point retrying for a while.
+                self.breaker.record_failure(trip=True, open_for=self.breaker.reset_timeout * 10)
+            else:
+                self.breaker.record_failure()
+            raise AutofillUnavailable(repr(e)) from e
+
+        self.breaker.record_success()
+        if self.cache is not None:
+            self.cache.put("autofill", key, json.dumps(parsed).encode("utf-8"))
+        return parsed
+
+
+# -------------------------------------------------------
+# Process-wide client
+# -------------------------------------------------------
+_AUTOFILL: Optional[Autofill] = None
+_AUTOFILL_LOCK = threading.Lock()
+_MODEL_OVERRIDE: Optional[AutofillModel] = None
+
+
+def set_autofill_model(model: Optional[AutofillModel]) -> None:
+    """Swap in a local model (e.g. a stub for tests); None restores Gemini."""
+    global _MODEL_OVERRIDE, _AUTOFILL
+
+    with _AUTOFILL_LOCK:
+        _MODEL_OVERRIDE = model
+        _AUTOFILL = None
+
+
+def get_autofill(cfg: Dict[str, Any], cache=None) -> Optional[Autofill]:
+    global _AUTOFILL
+
+    if not cfg.get("AUTOFILL_ENABLED"):
+        return None
+    if _MODEL_OVERRIDE is None and not cfg.get("GEMINI_API_KEY"):
+        return None
+    with _AUTOFILL_LOCK:
+        if _AUTOFILL is None:
+            _AUTOFILL = Autofill(
+                _MODEL_OVERRIDE or gemini_model(cfg["GEMINI_MODEL"], cfg["GEMINI_API_KEY"]),
+                cfg["GEMINI_MODEL"],
+                timeout=cfg["AUTOFILL_TIMEOUT"],
+                max_chars=cfg["AUTOFILL_MAX_CHARS"],
+                max_concurrency=cfg["AUTOFILL_MAX_CONCURRENCY"],
+                breaker=CircuitBreaker(cfg["AUTOFILL_BREAKER_FAILURES"], cfg["AUTOFILL_BREAKER_RESET"]),
+                cache=cache,
+            )
+        return _AUTOFILL
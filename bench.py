@@ -0,0 +1,816 @@
+# bench.py
+"""
+Benchmarks for the PDF builders, text extraction and the full submission path.
+
+    python bench.py                           # run everything, print a table
+    python bench.py -k pdf -n 10              # only cases whose name contains "pdf"
+    python bench.py --save bench_baseline.json
+    python bench.py --compare bench_baseline.json --threshold 0.25
+    python bench.py --startup                 # cold import time + RSS of the web app
+    python bench.py --mime-rss                # peak RSS of sending a large message, per MIME path
+
+Each case reports median/min wall time, peak Python heap (tracemalloc, one
+extra run) and output bytes; scan.* cases also report input MB/s. --compare exits 1 when a case's median time or
+peak memory grew by more than --threshold over the baseline.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import socketserver
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# -------------------------------------------------------
+# Synthetic data
+# -------------------------------------------------------
+_WORDS = (
+    "geotechnical boring soil sample laboratory analysis slope stability foundation report "
+    "field investigation drilling logs consolidation compaction shear strength groundwater "
+    "engineering design review client coordination schedule budget safety inspection"
+).split()
+
+
+def words(n: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(_WORDS) for _ in range(n))
+
+
+def make_legal_text(paragraphs: int = 12) -> Dict[str, str]:
+    block = "\n\n".join(words(80, seed=i) for i in range(paragraphs))
+    return {
+        "eeoNotice": block,
+        "disabilityNotice": block,
+        "veteranNotice": block,
+        "alcoholDrugProgram": block + "\n\nANY APPLICANT WHO IS UNWILLING " + words(20),
+        "requiredNotice": block,
+    }
+
+
+def make_payload(jobs: int = 3, duty_words: int = 160, field_words: int = 60) -> Dict[str, Any]:
+    form: Dict[str, Any] = {
+        "name": "Jane Q. Applicant",
+        "position": "Geotechnical Engineer",
+        "location": "Honolulu",
+        "email": "jane@example.com",
+        "phone": "808-555-0100",
+        "address": "123 Example St",
+        "city": "Honolulu",
+        "state": "HI",
+        "zip": "96813",
+        "employment": [
+            {
+                "company": f"Employer {i} / {words(6, seed=i)}",
+                "position": "Staff Engineer",
+                "dateFrom": "2018-01",
+                "dateTo": "2023-06",
+                "duties": "\n".join(words(20, seed=i * 100 + j) for j in range(max(1, duty_words // 20))),
+                "reasonForLeaving": words(15, seed=i),
+                "supervisor": "Pat Supervisor / PE",
+            }
+            for i in range(jobs)
+        ],
+        "references": [{"name": f"Ref {i}", "company": "Co", "phone": "808-555-0101"} for i in range(3)],
+    }
+    for i, key in enumerate((
+        "skillsTechnical", "skillsSoftware", "skillsFieldLab", "skillsCommunication",
+        "skillsCertifications", "educationAdditional", "affiliations",
+    )):
+        form[key] = words(field_words, seed=1000 + i)
+    return {
+        "submittedAt": "2026-01-01T00:00:00Z",
+        "form": form,
+        "legalText": make_legal_text(),
+        "clientMeta": {"timezone": "Pacific/Honolulu"},
+    }
+
+
+def make_pdf_resume(pages: int = 20) -> bytes:
+    from reportlab.lib.pagesizes import LETTER
+    from reportlab.pdfgen import canvas
+
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=LETTER)
+    for p in range(pages):
+        y = 740
+        if p == 0:
+            c.drawString(72, y, "Jane Q. Applicant  jane@example.com  (808) 555-0100")
+            y -= 20
+        for line in range(45):
+            c.drawString(72, y, words(12, seed=p * 100 + line))
+            y -= 15
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def make_scanned_pdf_resume(pages: int = 3) -> bytes:
+    """A scanner-style PDF: one 300 dpi letter-size JPEG per page."""
+    from PIL import Image, ImageDraw
+
+    images = []
+    for p in range(pages):
+        im = Image.new("RGB", (2550, 3300), (245, 243, 238))
+        draw = ImageDraw.Draw(im)
+        for line in range(48):
+            draw.text((200, 200 + line * 60), words(14, seed=p * 100 + line), fill=(30, 30, 30))
+        images.append(Image.blend(im, Image.effect_noise(im.size, 12).convert("RGB"), 0.08))
+    buf = io.BytesIO()
+    images[0].save(buf, "PDF", resolution=300, save_all=True, append_images=images[1:], quality=95)
+    return buf.getvalue()
+
+
+def make_docx_resume(paragraphs: int = 200, images: int = 0) -> bytes:
+    import docx
+
+    d = docx.Document()
+    d.add_paragraph("Jane Q. Applicant  jane@example.com  (808) 555-0100")
+    for i in range(paragraphs):
+        d.add_paragraph(words(40, seed=i))
+    if images:
+        from PIL import Image
+
+        img = io.BytesIO()
+        Image.effect_noise((800, 800), 64).convert("RGB").save(img, format="PNG")
+        for _ in range(images):
+            img.seek(0)
+            d.add_picture(img)
+    out = io.BytesIO()
+    d.save(out)
+    return out.getvalue()
+
+
+def make_txt_resume(kb: int = 64) -> bytes:
+    return words(kb * 1024 // 8).encode("utf-8")
+
+
+_FIRST = ("Jane", "Kekoa", "Maria", "David", "Leilani", "Robert", "Grace", "Kenji")
+_LAST = ("Applicant", "Kahale", "Santos", "Nakamura", "Smith", "Lee", "Fernandez", "Wong")
+
+
+def make_resume_text(seed: int = 0, jobs: int = 4) -> str:
+    """A plain-text resume with every section resume_scan.py looks for."""
+    rng = random.Random(seed)
+    name = f"{rng.choice(_FIRST)} {rng.choice(_LAST)}"
+    lines = [
+        name.upper(),
+        "Geotechnical Engineer",
+        f"{rng.randint(10, 9999)} Kapiolani Blvd | Honolulu, HI 968{rng.randint(10, 99)}",
+        f"{name.split()[0].lower()}{seed}@example.com | (808) 555-{rng.randint(1000, 9999)}",
+        f"linkedin.com/in/applicant{seed}",
+        "",
+        "SUMMARY",
+        words(40, seed=seed),
+        "",
+        "EXPERIENCE",
+    ]
+    for j in range(jobs):
+        end = 2024 - 3 * j
+        lines += [
+            f"Employer {j} Inc. | Staff Engineer | Jan {end - 3} – {'Present' if j == 0 else f'Dec {end}'}",
+            "Honolulu, HI",
+            *(f"• {words(14, seed=seed * 100 + j * 10 + k)}" for k in range(5)),
+            "Supervisor: Pat Supervisor",
+            "",
+        ]
+    lines += [
+        "EDUCATION",
+        "University of Hawaii at Manoa",
+        f"B.S. in Civil Engineering, {2000 + seed % 20} - {2004 + seed % 20}",
+        f"Kaimuki High School, {1996 + seed % 20}",
+        "",
+        "SKILLS",
+        "AutoCAD, gINT, Excel, Python, " + ", ".join(words(8, seed=seed).split()),
+        "Valid Hawaii driver's license",
+        "",
+        "CERTIFICATIONS",
+        "OSHA 40-Hour HAZWOPER",
+        "",
+        "REFERENCES",
+        *(f"{rng.choice(_FIRST)} {rng.choice(_LAST)}, Employer {r} Inc., (808) 555-01{r}{r}" for r in range(3)),
+    ]
+    return "\n".join(lines)
+
+
+def make_resume_corpus(count: int = 200) -> List[str]:
+    return [make_resume_text(seed=i) for i in range(count)]
+
+
+class Upload:
+    """Just enough of werkzeug's FileStorage for the extractors."""
+
+    def __init__(self, data: bytes, filename: str) -> None:
+        self.stream = io.BytesIO(data)
+        self.filename = filename
+
+    def read(self) -> bytes:
+        return self.stream.read()
+
+
+# -------------------------------------------------------
+# Local SMTP sink (accepts and discards mail)
+# -------------------------------------------------------
+class _SinkHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        self.server.opened()
+        try:
+            self._serve()
+        finally:
+            self.server.closed()
+
+    def _serve(self) -> None:
+        self.wfile.write(b"220 bench sink\r\n")
+        in_transaction = False  # like a real relay: MAIL inside an open transaction is a 503
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line[:4].upper()
+            fault = self.server.fault(cmd)
+            if fault is not None:
+                if not fault:
+                    return  # drop the connection
+                self.wfile.write(fault)
+            elif cmd == b"EHLO" or cmd == b"HELO":
+                self.wfile.write(b"250-bench\r\n250 8BITMIME\r\n")
+            elif cmd == b"MAIL" and in_transaction:
+                self.wfile.write(b"503 nested MAIL command\r\n")
+            elif cmd == b"MAIL":
+                in_transaction = True
+                self.wfile.write(b"250 ok\r\n")
+            elif cmd == b"RSET":
+                in_transaction = False
+                self.wfile.write(b"250 ok\r\n")
+            elif cmd == b"DATA":
+                in_transaction = False
+                self.wfile.write(b"354 go ahead\r\n")
+                size = 0
+                while True:
+                    data = self.rfile.readline()
+                    if data in (b".\r\n", b""):
+                        break
+                    size += len(data)
+                self.server.bytes_received += size
+                self.wfile.write(b"250 queued\r\n")
+            elif cmd == b"QUIT":
+                self.wfile.write(b"221 bye\r\n")
+                return
+            else:
+                self.wfile.write(b"250 ok\r\n")
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _SinkHandler)
+        self.bytes_received = 0
+        self.connections = 0
+        self.active = 0
+        self.max_active = 0
+        # command (b"MAIL", b"NOOP", ...) -> replies to send instead of the
+        # normal one, first to last; b"" drops the connection. For tests.
+        self.faults: Dict[bytes, List[bytes]] = {}
+        self._lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def opened(self) -> None:
+        with self._lock:
+            self.connections += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def closed(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+    def fault(self, cmd: bytes) -> Optional[bytes]:
+        with self._lock:
+            replies = self.faults.get(cmd)
+            return replies.pop(0) if replies else None
+
+
+# -------------------------------------------------------
+# Cases
+# -------------------------------------------------------
+# A case factory does its (untimed) setup and returns the function to time.
+# That function returns the number of output bytes it produced.
+CASES: Dict[str, Callable[[], Callable[[], int]]] = {}
+# Cases whose run() returns the number of input bytes processed; reported in MB/s.
+THROUGHPUT_CASES: set = set()
+
+
+def case(name: str, throughput: bool = False):
+    def register(factory):
+        CASES[name] = factory
+        if throughput:
+            THROUGHPUT_CASES.add(name)
+        return factory
+    return register
+
+
+@case("pdf.main.3_long_jobs")
+def _main_pdf():
+    import services
+
+    payload = make_payload(jobs=3, duty_words=160)
+    return lambda: len(services.build_main_application_pdf(payload))
+
+
+@case("pdf.legal.eeo")
+def _eeo_pdf():
+    import services
+
+    payload = make_payload()
+    return lambda: len(services.build_eeo_pdf(payload))
+
+
+@case("pdf.legal.all_four")
+def _legal_pdfs():
+    import services
+
+    payload = make_payload()
+    builders = (services.build_eeo_pdf, services.build_disability_pdf,
+                services.build_veteran_pdf, services.build_alcohol_drug_pdf)
+    return lambda: sum(len(b(payload)) for b in builders)
+
+
+@case("pdf.legal.all_four_registered")
+def _legal_pdfs_registered():
+    # Same texts, sent as legalVersion ids and resolved from the registry.
+    import services
+    from legal_registry import LegalRegistry
+
+    registry = LegalRegistry()
+    payload = make_payload()
+    versions = {key: registry.register(text) for key, text in payload.pop("legalText").items()}
+    payload["legalVersion"] = versions
+    builders = (services.build_eeo_pdf, services.build_disability_pdf,
+                services.build_veteran_pdf, services.build_alcohol_drug_pdf)
+    return lambda: sum(len(b(registry.resolve(payload))) for b in builders)
+
+
+@case("pdf.styles.stylesheet_rebuild")
+def _stylesheet_rebuild():
+    # What every builder paid per PDF before the process-wide style registry.
+    import services
+
+    services._styles()
+    return lambda: len(services._build_styles())
+
+
+def _static_labels(cached: bool):
+    # The fixed text of one main application: field labels plus headings.
+    import services
+
+    services._styles()
+    labels = [f"<b>Field label number {i}</b>" for i in range(60)]
+
+    def run() -> int:
+        n = 0
+        for text in labels:
+            p = services._static(text, "Label") if cached else services.Paragraph(text, services._styles()["Label"])
+            n += int(p.wrap(2.0 * 72, 1000)[1])
+        return n
+    return run
+
+
+@case("pdf.static.labels_parsed_per_pdf")
+def _labels_fresh():
+    return _static_labels(cached=False)
+
+
+@case("pdf.static.labels_cached")
+def _labels_cached():
+    return _static_labels(cached=True)
+
+
+@case("pdf.kv_block.large_text")
+def _kv_block():
+    import services
+
+    rows = [(f"Field {i}", "\n".join(words(20, seed=i * 10 + j) for j in range(12))) for i in range(8)]
+
+    def run() -> int:
+        styles = services._styles()
+        return len(services._build_doc("kv", "", [services._kv_block(rows, styles)]))
+    return run
+
+
+@case("pdf.resume.docx_to_pdf")
+def _resume_docx():
+    import services
+
+    data = make_docx_resume(paragraphs=150)
+    return lambda: len(services.resume_to_pdf(data, "resume.docx")[0])
+
+
+@case("extract.pdf.20_pages")
+def _extract_pdf():
+    import services
+
+    data = make_pdf_resume(pages=20)
+    return lambda: len(services.extract_text_from_pdf(Upload(data, "resume.pdf")))
+
+
+@case("compress.pdf.scanned_3_pages")
+def _compress_pdf():
+    from pdf_compress import compress_pdf
+
+    data = make_scanned_pdf_resume(pages=3)
+    return lambda: compress_pdf(data, budget=1024 * 1024)[1]["after"]
+
+
+def _parse_pdf(mode: str):
+    import services
+
+    cfg = {**services.load_env_and_config(), "RESUME_CACHE_ENABLED": False,
+           "AUTOFILL_ENABLED": False, "PARSE_PDF_MODE": mode}
+    data = make_pdf_resume(pages=40)
+    return lambda: len(services.parse_resume_file(Upload(data, "resume.pdf"), cfg)["parsed"]["contact"]["email"])
+
+
+@case("parse.pdf.40_pages.lazy")
+def _parse_pdf_lazy():
+    return _parse_pdf("lazy")
+
+
+@case("parse.pdf.40_pages.full")
+def _parse_pdf_full():
+    return _parse_pdf("full")
+
+
+@case("scan.resume.corpus_200", throughput=True)
+def _scan_corpus():
+    from resume_scan import scan_resume
+
+    corpus = make_resume_corpus(200)
+    size = sum(len(t.encode("utf-8")) for t in corpus)
+
+    def run() -> int:
+        for text in corpus:
+            scan_resume(text)
+        return size
+    return run
+
+
+@case("scan.resume.corpus_200.contact_regex", throughput=True)
+def _scan_corpus_contact_regex():
+    # The email + phone regexes the scanner replaced, for scale.
+    import re
+
+    email_re = re.compile(r"\b[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}\b", re.I)
+    phone_re = re.compile(r"(?:(?:\+?1[\s\-\.])?\(?\d{3}\)?[\s\-\.]?\d{3}[\s\-\.]?\d{4})(?:\s*(?:x|ext\.?)\s*\d+)?", re.I)
+    corpus = make_resume_corpus(200)
+    size = sum(len(t.encode("utf-8")) for t in corpus)
+
+    def run() -> int:
+        for text in corpus:
+            email_re.search(text)
+            phone_re.search(text)
+        return size
+    return run
+
+
+@case("extract.docx.300_paragraphs")
+def _extract_docx():
+    import services
+
+    data = make_docx_resume(paragraphs=300)
+    return lambda: len(services.extract_text_from_docx(Upload(data, "resume.docx")))
+
+
+def _python_docx_text(data: bytes) -> str:
+    # What extract_text_from_docx did before docx_text.py, for comparison.
+    import docx
+
+    document = docx.Document(io.BytesIO(data))
+    return "\n".join(p.text for p in document.paragraphs if p.text.strip())
+
+
+@case("extract.docx.300_paragraphs.python_docx")
+def _extract_docx_python_docx():
+    data = make_docx_resume(paragraphs=300)
+    return lambda: len(_python_docx_text(data))
+
+
+@case("extract.docx.2000_paragraphs_8_images")
+def _extract_docx_large():
+    import services
+
+    data = make_docx_resume(paragraphs=2000, images=8)
+    return lambda: len(services.extract_text_from_docx(Upload(data, "resume.docx")))
+
+
+@case("extract.docx.2000_paragraphs_8_images.python_docx")
+def _extract_docx_large_python_docx():
+    data = make_docx_resume(paragraphs=2000, images=8)
+    return lambda: len(_python_docx_text(data))
+
+
+@case("extract.txt.256kb")
+def _extract_txt():
+    import services
+
+    data = make_txt_resume(kb=256)
+    return lambda: len(services.extract_text_from_txt(Upload(data, "resume.txt")))
+
+
+@case("submit.send_application_email")
+def _send_email():
+    import services
+
+    sink = SMTPSink()
+    cfg = services.load_env_and_config()
+    cfg.update(SMTP_HOST="127.0.0.1", SMTP_PORT=sink.port, SMTP_USER="", SMTP_PASS="", SMTP_USE_TLS=False)
+    payload = make_payload(jobs=3, duty_words=160)
+    resume = make_docx_resume(paragraphs=150)
+
+    def run() -> int:
+        before = sink.bytes_received
+        services.send_application_email(payload, cfg, resume_bytes=resume, resume_filename="resume.docx")
+        return sink.bytes_received - before
+    return run
+
+
+# The five rendered forms are ~30-60 KB each; the resume is the big one.
+MIME_FORM_BYTES = 48 * 1024
+
+
+def make_mime_attachments(resume_mb: float) -> List[Tuple[str, bytes]]:
+    rnd = random.Random(3)
+    sizes = [MIME_FORM_BYTES] * 5 + [int(resume_mb * 1024 * 1024)]
+    return [(f"{i + 1}_Document.pdf", rnd.randbytes(n)) for i, n in enumerate(sizes)]
+
+
+def send_mime(smtp, mode: str, attachments: List[Tuple[str, bytes]]) -> None:
+    """Send the attachments the way send_application_email does, via `mode` "stream" or "email"."""
+    from email.message import EmailMessage
+
+    from mime_stream import StreamingMessage, send_streaming
+
+    if mode == "stream":
+        send_streaming(smtp, StreamingMessage("bench@example.com", "hr@example.com", "Bench", "body", attachments))
+        return
+    msg = EmailMessage()
+    msg["From"], msg["To"], msg["Subject"] = "bench@example.com", "hr@example.com", "Bench"
+    msg.set_content("body")
+    for filename, pdf in attachments:
+        msg.add_attachment(pdf, maintype="application", subtype="pdf", filename=filename)
+    smtp.send_message(msg)
+
+
+def _mime_case(mode: str):
+    import smtplib
+
+    sink = SMTPSink()
+    attachments = make_mime_attachments(resume_mb=4)
+
+    def run() -> int:
+        before = sink.bytes_received
+        with smtplib.SMTP("127.0.0.1", sink.port) as smtp:
+            send_mime(smtp, mode, attachments)
+        return sink.bytes_received - before
+    return run
+
+
+@case("mime.stream.6_pdfs_4mb")
+def _mime_stream():
+    return _mime_case("stream")
+
+
+@case("mime.email.6_pdfs_4mb")
+def _mime_email():
+    return _mime_case("email")
+
+
+# -------------------------------------------------------
+# MIME peak RSS (one send per fresh interpreter)
+# -------------------------------------------------------
+# tracemalloc only sees the Python heap; this measures what the process
+# actually grew by while sending, with the attachments already in memory.
+_MIME_RSS_PROBE = """
+import json, resource, smtplib, sys
+sys.path.insert(0, {root!r})
+import bench, email.message, mime_stream
+attachments = bench.make_mime_attachments({resume_mb!r})
+sink = bench.SMTPSink()
+smtp = smtplib.SMTP("127.0.0.1", sink.port)
+smtp.ehlo()
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+bench.send_mime(smtp, {mode!r}, attachments)
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+smtp.quit()
+print(json.dumps({{"before_kb": before, "growth_kb": after - before, "sent": sink.bytes_received}}))
+"""
+
+MIME_RSS_RESUME_MB = (1, 10)
+
+
+def mime_rss(repeat: int) -> Dict[str, Any]:
+    import subprocess
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    results: Dict[str, Any] = {}
+    for resume_mb in MIME_RSS_RESUME_MB:
+        for mode in ("email", "stream"):
+            runs = []
+            for _ in range(repeat):
+                out = subprocess.run(
+                    [sys.executable, "-W", "ignore", "-c",
+                     _MIME_RSS_PROBE.format(root=root, resume_mb=resume_mb, mode=mode)],
+                    capture_output=True, text=True, check=True, cwd=root,
+                )
+                runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+            growth_kb = statistics.median(r["growth_kb"] for r in runs)
+            name = f"mime_rss.{mode}.resume_{resume_mb}mb"
+            results[name] = {"median_s": 0.0, "peak_bytes": growth_kb * 1024, "repeat": repeat}
+            print(f"{name:<36} peak RSS +{growth_kb / 1024:7.1f} MB  (sent {runs[-1]['sent'] / 1048576:.1f} MB)")
+    return results
+
+
+# -------------------------------------------------------
+# Startup (cold import in a fresh interpreter)
+# -------------------------------------------------------
+_STARTUP_PROBE = """
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+t0 = time.perf_counter()
+{stmt}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"seconds": elapsed, "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+STARTUP_CASES = {
+    "import services": "import services",
+    "import app": "import app",
+    "import app + warm_up()": "import app, services; services.warm_up(app.CFG)",
+}
+
+
+def startup(repeat: int) -> Dict[str, Any]:
+    import subprocess
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    results: Dict[str, Any] = {}
+    for name, stmt in STARTUP_CASES.items():
+        runs = []
+        for _ in range(repeat):
+            out = subprocess.run(
+                [sys.executable, "-W", "ignore", "-c", _STARTUP_PROBE.format(root=root, stmt=stmt)],
+                capture_output=True, text=True, check=True, cwd=root,
+            )
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        seconds = statistics.median(r["seconds"] for r in runs)
+        rss_kb = statistics.median(r["max_rss_kb"] for r in runs)
+        results[f"startup.{name}"] = {"median_s": seconds, "peak_bytes": rss_kb * 1024, "repeat": repeat}
+        print(f"{name:<36} {seconds * 1000:9.1f} ms  max RSS {rss_kb / 1024:7.1f} MB")
+    return results
+
+
+# -------------------------------------------------------
+# Runner
+# -------------------------------------------------------
+def measure(fn: Callable[[], int], repeat: int, warmup: int = 1) -> Dict[str, Any]:
+    for _ in range(warmup):
+        fn()
+    times: List[float] = []
+    out_bytes = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out_bytes = fn()
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "max_s": max(times),
+        "peak_bytes": peak,
+        "output_bytes": out_bytes,
+        "repeat": repeat,
+    }
+
+
+def run(selected: List[str], repeat: int) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for name in selected:
+        fn = CASES[name]()
+        results[name] = measure(fn, repeat)
+        r = results[name]
+        line = (
+            f"{name:<36} {r['median_s'] * 1000:9.1f} ms  (min {r['min_s'] * 1000:7.1f})"
+            f"  peak {r['peak_bytes'] / 1024:9.0f} KB  out {r['output_bytes'] / 1024:8.0f} KB"
+        )
+        if name in THROUGHPUT_CASES and r["median_s"]:
+            r["mb_per_s"] = r["output_bytes"] / r["median_s"] / 1e6
+            line += f"  {r['mb_per_s']:7.1f} MB/s"
+        print(line)
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    regressions: List[str] = []
+    for name, r in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        for metric in ("median_s", "peak_bytes"):
+            if base[metric] and r[metric] > base[metric] * (1 + threshold):
+                regressions.append(
+                    f"{name}: {metric} {base[metric]:.4g} -> {r[metric]:.4g} (+{(r[metric] / base[metric] - 1) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def scratch_env(directory: str) -> Dict[str, str]:
+    """
+    Settings that keep every store the code under test writes to inside
+    `directory`: a benchmark must never add synthetic applicants to the
+    real archive, spools or legal-text registry.
+    """
+    return {
+        "ARCHIVE_ENABLED": "false",
+        "ARCHIVE_DIR": os.path.join(directory, "archive"),
+        "LEGAL_TEXT_DIR": os.path.join(directory, "legal"),
+        "SUBMIT_SPOOL_PATH": os.path.join(directory, "submissions.db"),
+        "MAIL_DIGEST_SPOOL_PATH": os.path.join(directory, "digests.db"),
+        "PROFILE_DIR": os.path.join(directory, "profiles"),
+        "RESUME_CACHE_DIR": "",
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("-k", dest="pattern", default="", help="only run cases whose name contains this")
+    ap.add_argument("-n", dest="repeat", type=int, default=5, help="timed runs per case (default 5)")
+    ap.add_argument("--save", metavar="PATH", help="write results as a JSON baseline")
+    ap.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    ap.add_argument("--threshold", type=float, default=0.25, help="allowed relative growth (default 0.25)")
+    ap.add_argument("--list", action="store_true", help="list cases and exit")
+    ap.add_argument("--startup", action="store_true", help="measure cold import time and RSS instead")
+    ap.add_argument("--mime-rss", action="store_true", help="measure peak RSS of a large send, per MIME path")
+    args = ap.parse_args(argv)
+
+    if args.list:
+        print("\n".join(CASES))
+        return 0
+
+    os.environ.setdefault("RENDER_MODE", "serial")
+    os.environ.setdefault("SUBMIT_QUEUE_ENABLED", "false")
+    os.environ.setdefault("RESUME_CACHE_ENABLED", "false")  # measure the work, not cache hits
+    with tempfile.TemporaryDirectory(prefix="bench-") as scratch:
+        os.environ.update(scratch_env(scratch))  # also inherited by the --startup / --mime-rss subprocesses
+        if args.startup:
+            results = startup(args.repeat)
+        elif args.mime_rss:
+            results = mime_rss(args.repeat)
+        else:
+            selected = [n for n in CASES if args.pattern in n]
+            results = run(selected, args.repeat)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": results,
+            }, f, indent=2)
+        print(f"saved baseline -> {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print("\nREGRESSIONS:")
+            print("\n".join(f"  {r}" for r in regressions))
+            return 1
+        print(f"\nno regressions vs {args.compare} (threshold {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
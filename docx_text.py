@@ -0,0 +1,154 @@
+# docx_text.py
+from __future__ import annotations
+
+import posixpath
+import zipfile
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+from xml.etree.ElementTree import ParseError, iterparse
+
+from uploads import ResumeData, open_binary
+
+# -------------------------------------------------------
+# Streaming DOCX text extraction
+#
+# A .docx is a zip; the text is in word/document.xml plus one XML part per
+# header/footer. Those parts are parsed with iterparse straight from the
+# archive, so images and other media are never decompressed and no
+# python-docx object model is built. Output is one line per non-blank
+# paragraph in document order: headers, body (table rows as tab-separated
+# cells), footers.
+# -------------------------------------------------------
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_R = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"
+
+_P, _T, _TAB, _BR, _CR = _W + "p", _W + "t", _W + "tab", _W + "br", _W + "cr"
+_TBL, _TR, _TC = _W + "tbl", _W + "tr", _W + "tc"
+_HEADER_REF, _FOOTER_REF = _W + "headerReference", _W + "footerReference"
+
+# A resume's document.xml is a few hundred KB; anything this large is a zip bomb.
+MAX_PART_BYTES = 64 * 1024 * 1024
+
+
+class DocxError(ValueError):
+    """The upload is not a readable .docx (e.g. a legacy binary .doc)."""
+
+
+def _open_part(zf: zipfile.ZipFile, name: str) -> IO[bytes]:
+    try:
+        info = zf.getinfo(name)
+    except KeyError:
+        raise DocxError(f"Word document is missing {name}.")
+    if info.file_size > MAX_PART_BYTES:
+        raise DocxError("Word document is too large to read.")
+    return zf.open(info)
+
+
+def _part_lines(stream: IO[bytes], refs: Optional[List[Tuple[str, str]]] = None) -> List[str]:
+    """
+    Text lines of one WordprocessingML part. With `refs`, header/footer
+    references met along the way (in section order) are appended to it.
+    """
+    lines: List[str] = []
+    sinks: List[List[str]] = [lines]   # where finished paragraphs/rows go; a cell pushes its own
+    paras: List[List[str]] = []        # text runs of the open paragraph(s); text boxes nest
+    rows: List[List[str]] = []
+    skip = 0                           # depth inside mc:Fallback (duplicate of mc:Choice)
+
+    for event, el in iterparse(stream, events=("start", "end")):
+        tag = el.tag
+        if tag == _MC_FALLBACK:
+            skip += 1 if event == "start" else -1
+            if event == "end":
+                el.clear()
+            continue
+        if skip:
+            continue
+
+        if event == "start":
+            if tag == _P:
+                paras.append([])
+            elif tag == _TR:
+                rows.append([])
+            elif tag == _TC:
+                sinks.append([])
+            continue
+
+        if tag == _T:
+            if paras and el.text:
+                paras[-1].append(el.text)
+        elif tag == _TAB:
+            if paras:
+                paras[-1].append("\t")
+        elif tag in (_BR, _CR):
+            if paras:
+                paras[-1].append("\n")
+        elif tag == _P:
+            text = "".join(paras.pop())
+            if text.strip():
+                sinks[-1].append(text)
+            el.clear()
+        elif tag == _TC:
+            cell = " ".join(sinks.pop())
+            if rows:
+                rows[-1].append(cell)
+        elif tag == _TR:
+            row = "\t".join(c for c in rows.pop() if c)
+            if row:
+                sinks[-1].append(row)
+        elif tag == _TBL:
+            el.clear()
+        elif refs is not None and tag in (_HEADER_REF, _FOOTER_REF):
+            refs.append(("header" if tag == _HEADER_REF else "footer", el.get(_R + "id", "")))
+    return lines
+
+
+def _relationships(zf: zipfile.ZipFile) -> Dict[str, str]:
+    try:
+        stream = _open_part(zf, "word/_rels/document.xml.rels")
+    except DocxError:
+        return {}
+    targets: Dict[str, str] = {}
+    with stream:
+        for _, el in iterparse(stream):
+            if el.tag == _PKG_REL and el.get("TargetMode") != "External":
+                targets[el.get("Id", "")] = posixpath.normpath(posixpath.join("word", el.get("Target", "")))
+    return targets
+
+
+def iter_docx_lines(data: ResumeData) -> Iterator[str]:
+    try:
+        zf = zipfile.ZipFile(open_binary(data))
+    except zipfile.BadZipFile:
+        raise DocxError("Could not read the Word document. Legacy .doc files must be saved as .docx or PDF.")
+
+    with zf:
+        refs: List[Tuple[str, str]] = []
+        parts: Dict[str, List[str]] = {"header": [], "footer": []}
+        try:
+            with _open_part(zf, "word/document.xml") as stream:
+                body = _part_lines(stream, refs)
+
+            rels = _relationships(zf) if refs else {}
+            seen = set()
+            for kind, rid in refs:
+                target = rels.get(rid)
+                if not target or target in seen:
+                    continue
+                seen.add(target)
+                with _open_part(zf, target) as stream:
+                    for line in _part_lines(stream):
+                        # First/even/default headers usually repeat the same name/contact line.
+                        if line not in parts[kind]:
+                            parts[kind].append(line)
+        except (ParseError, zipfile.BadZipFile, EOFError) as e:
+            raise DocxError(f"Word document is damaged: {e}") from e
+
+    yield from parts["header"]
+    yield from body
+    yield from parts["footer"]
+
+
+def extract_docx_text(data: ResumeData) -> str:
+    return "\n".join(iter_docx_lines(data))
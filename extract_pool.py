@@ -0,0 +1,365 @@
+# extract_pool.py
+from __future__ import annotations
+
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from uploads import ResumeData, buffer_of, close_buffer
+
+try:
+    import resource
+except ImportError:  # Windows: wall-clock limit only
+    resource = None  # type: ignore[assignment]
+
+# -------------------------------------------------------
+# Sandboxed resume extraction
+#
+# pypdf and the DOCX reader run on untrusted uploads; a crafted file can
+# make them spin or allocate without bound. Extraction, resume-to-PDF
+# conversion and PDF compression therefore run in a small pool of pre-started worker
+# processes, one job per worker at a time, each under:
+#
+#   EXTRACT_MEMORY_MB     RLIMIT_AS headroom over the warmed-up worker (MemoryError past it)
+#   EXTRACT_CPU_SECONDS   RLIMIT_CPU soft limit, re-armed per job (SIGXCPU)
+#   EXTRACT_TIMEOUT       wall clock; the parent kills the worker past it
+#
+# A worker that hit a limit, died, or ran EXTRACT_MAX_JOBS jobs is
+# replaced. Limit hits surface as ExtractionLimitExceeded (a ValueError:
+# the file is the problem, HTTP 422, never retried by the queue); a worker
+# that dies for other reasons surfaces as SandboxUnavailable.
+#
+# Replacements are started from the running server, which has queue, SMTP,
+# digest and readiness threads that may hold locks at that moment. A forked
+# child inherits those locks held and can deadlock on its first import or
+# print. Workers are therefore started with "forkserver" (a single-threaded
+# helper process, with the extraction modules preloaded so a new worker is
+# still cheap) or "spawn" where that is unavailable; EXTRACT_START_METHOD=fork
+# is an explicit opt-in.
+# -------------------------------------------------------
+_PRELOAD = ["services", "pdf_compress", "pypdf"]
+
+
+def default_start_method() -> str:
+    methods = multiprocessing.get_all_start_methods()
+    return "forkserver" if "forkserver" in methods else "spawn"
+
+
+def worker_context(start_method: str = ""):
+    """
+    Multiprocessing context for worker pools started from the running server
+    (also used by render_pool.py): `start_method`, or forkserver / spawn.
+    """
+    ctx = multiprocessing.get_context(start_method or default_start_method())
+    if ctx.get_start_method() == "forkserver":
+        ctx.set_forkserver_preload(_PRELOAD)
+    return ctx
+
+
+class ExtractionLimitExceeded(ValueError):
+    """The upload hit the sandbox's time or memory limit."""
+
+
+class SandboxUnavailable(RuntimeError):
+    """The extraction worker died or could not be started."""
+
+
+_LIMIT_EXITCODES = {-signal.SIGKILL, -signal.SIGXCPU} if resource is not None else set()
+
+
+class _CpuExceeded(BaseException):
+    # BaseException so library code catching Exception can't swallow it.
+    pass
+
+
+def _on_sigxcpu(signum, frame) -> None:
+    raise _CpuExceeded()
+
+
+def _op(name: str):
+    import pdf_compress
+    import services
+
+    return {
+        "text": services._extract_text_unsandboxed,
+        "pdf_prefix": services._extract_pdf_prefix,
+        "convert": services._convert_resume,
+        "compress": pdf_compress.compress_resume,
+    }[name]
+
+
+def _cpu_used() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _arm_cpu_limit(seconds: int) -> None:
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(_cpu_used()) + 1 + seconds
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _disarm_cpu_limit() -> None:
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def _address_space() -> int:
+    # Current virtual size; a forked worker inherits the server's mappings.
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _worker_main(conn, memory_bytes: int, cpu_seconds: int) -> None:
+    """
+    Worker loop: receive (op, filename, kwargs) then the upload bytes, reply
+    with (status, value). Exits after a limit hit so the parent replaces it.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl-C is the server's to handle
+
+    import services  # warm: pypdf and ReportLab are imported once per worker
+    import pdf_compress  # noqa: F401
+    import pypdf  # noqa: F401
+
+    services._styles()
+    if resource is not None:
+        if memory_bytes:
+            _, hard = resource.getrlimit(resource.RLIMIT_AS)
+            soft = _address_space() + memory_bytes
+            if hard != resource.RLIM_INFINITY:
+                soft = min(soft, hard)
+            resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+        if cpu_seconds:
+            signal.signal(signal.SIGXCPU, _on_sigxcpu)
+
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, OSError):
+            return
+        if request is None:
+            return
+        op, filename, kwargs = request
+        data = conn.recv_bytes()
+
+        limit_hit = False
+        try:
+            if resource is not None and cpu_seconds:
+                _arm_cpu_limit(cpu_seconds)
+            try:
+                reply: Tuple[str, Any] = ("ok", _op(op)(data, filename, **kwargs))
+            finally:
+                if resource is not None and cpu_seconds:
+                    _disarm_cpu_limit()
+        except _CpuExceeded:
+            reply, limit_hit = ("limit", "Resume took too long to process."), True
+        except MemoryError:
+            reply, limit_hit = ("limit", "Resume needs too much memory to process."), True
+        except ValueError as e:
+            reply = ("invalid", str(e))
+        except Exception as e:
+            reply = ("error", repr(e))
+
+        del data
+        try:
+            conn.send(reply)
+        except MemoryError:
+            conn.send(("limit", "Resume needs too much memory to process."))
+            limit_hit = True
+        if limit_hit:
+            return
+
+
+class _Worker:
+    def __init__(self, ctx, memory_bytes: int, cpu_seconds: int) -> None:
+        self.conn, child = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main, args=(child, memory_bytes, cpu_seconds), name="resume-extract", daemon=True
+        )
+        self.process.start()
+        child.close()
+        self.jobs = 0
+
+    def stop(self, kill: bool = False) -> None:
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except (OSError, ValueError):
+                self.process.kill()
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class SandboxPool:
+    def __init__(
+        self,
+        workers: int = 2,
+        memory_mb: int = 512,
+        cpu_seconds: int = 10,
+        timeout: float = 15.0,
+        max_jobs: int = 50,
+        start_method: str = "",
+    ) -> None:
+        self.workers = max(1, workers)
+        self.memory_bytes = max(0, memory_mb) * 1024 * 1024
+        self.cpu_seconds = max(0, cpu_seconds)
+        self.timeout = timeout
+        self.max_jobs = max(1, max_jobs)
+        self._ctx = worker_context(start_method)
+        self._idle: List[_Worker] = []
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _spawn(self) -> _Worker:
+        try:
+            return _Worker(self._ctx, self.memory_bytes, self.cpu_seconds)
+        except OSError as e:
+            raise SandboxUnavailable(f"Could not start extraction worker: {e}") from e
+
+    def start(self) -> None:
+        """Start every worker now so the first upload doesn't wait for one."""
+        with self._lock:
+            while len(self._idle) < self.workers:
+                self._idle.append(self._spawn())
+
+    def _checkout(self) -> _Worker:
+        with self._lock:
+            if self._closed:
+                raise SandboxUnavailable("Extraction pool is shut down.")
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.stop(kill=True)
+        return self._spawn()
+
+    def _checkin(self, worker: _Worker, count: bool = True) -> None:
+        if count:
+            worker.jobs += 1
+        if worker.jobs >= self.max_jobs:
+            worker.stop()
+            return
+        with self._lock:
+            if not self._closed:
+                self._idle.append(worker)
+                return
+        worker.stop()
+
+    def run(self, op: str, data: ResumeData, filename: str, **kwargs: Any) -> Any:
+        """Run one extraction op in a worker and return its result."""
+        return self._run(op, data, filename, kwargs)
+
+    def _run(self, op: str, data: ResumeData, filename: str, kwargs: Dict[str, Any], count: bool = True) -> Any:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise SandboxUnavailable("All extraction workers are busy.")
+        try:
+            worker = self._checkout()
+            deadline = time.monotonic() + self.timeout
+            try:
+                worker.conn.send((op, filename, kwargs))
+                buffer = buffer_of(data)
+                try:
+                    worker.conn.send_bytes(buffer)
+                finally:
+                    close_buffer(buffer)
+                if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                    worker.stop(kill=True)
+                    raise ExtractionLimitExceeded("Resume took too long to process.")
+                status, value = worker.conn.recv()
+            except (EOFError, OSError) as e:
+                worker.process.join(timeout=1)
+                exitcode = worker.process.exitcode
+                worker.stop(kill=True)
+                if exitcode in _LIMIT_EXITCODES:
+                    # Killed by the kernel at the hard CPU limit or by the OOM killer.
+                    raise ExtractionLimitExceeded("Resume could not be processed within limits.") from e
+                raise SandboxUnavailable(f"Extraction worker died (exit code {exitcode}).") from e
+
+            if status == "limit":
+                worker.stop()
+                raise ExtractionLimitExceeded(value)
+            self._checkin(worker, count)
+            if status == "invalid":
+                raise ValueError(value)
+            if status == "error":
+                raise RuntimeError(f"Resume extraction failed: {value}")
+            return value
+        finally:
+            self._slots.release()
+
+    def ping(self) -> bool:
+        """
+        Round-trip a trivial job through a worker. Returns False without
+        waiting when every worker is busy (which also means they are alive).
+        Pings don't count toward max_jobs: readiness probes alone would
+        otherwise recycle an idle server's warm workers every few minutes.
+        """
+        if not self._slots.acquire(blocking=False):
+            return False
+        self._slots.release()
+        self._run("text", b"", "ping.txt", {}, count=False)
+        return True
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.stop()
+
+
+# -------------------------------------------------------
+# Process-wide pool
+# -------------------------------------------------------
+_POOL: Optional[SandboxPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_extract_pool(cfg: Dict[str, Any]) -> Optional[SandboxPool]:
+    """The process-wide sandbox pool, or None when EXTRACT_MODE=inline."""
+    global _POOL
+
+    if (cfg.get("EXTRACT_MODE") or "process") != "process":
+        return None
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = SandboxPool(
+                workers=cfg["EXTRACT_WORKERS"],
+                memory_mb=cfg["EXTRACT_MEMORY_MB"],
+                cpu_seconds=cfg["EXTRACT_CPU_SECONDS"],
+                timeout=cfg["EXTRACT_TIMEOUT"],
+                max_jobs=cfg["EXTRACT_MAX_JOBS"],
+                start_method=cfg["EXTRACT_START_METHOD"],
+            )
+        return _POOL
+
+
+def run_extraction(cfg: Optional[Dict[str, Any]], op: str, data: ResumeData, filename: str, **kwargs: Any) -> Any:
+    """Run `op` in the sandbox pool, or on this thread without cfg or with EXTRACT_MODE=inline."""
+    pool = get_extract_pool(cfg) if cfg else None
+    if pool is None:
+        return _op(op)(data, filename, **kwargs)
+    return pool.run(op, data, filename, **kwargs)
+
+
+def shutdown_extract_pool() -> None:
+    global _POOL
+
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown()
+        _POOL = None
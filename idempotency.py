@@ -0,0 +1,146 @@
+# idempotency.py
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from uploads import ResumeData, iter_chunks
+
+# -------------------------------------------------------
+# Idempotent submissions
+#
+# A submission is identified by the client's Idempotency-Key header or,
+# without one, by a hash of the canonical payload plus the resume bytes.
+# A retry of a submission that already succeeded gets the stored response
+# back without rendering or sending anything. Concurrent duplicates wait
+# for the first one (single flight) instead of running in parallel.
+#
+# This in-process store covers the inline (SUBMIT_QUEUE_ENABLED=false)
+# path. The queue records keys in its SQLite spool instead, which also
+# dedups across server processes.
+# -------------------------------------------------------
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+_KEY_RE = re.compile(r"^[\x21-\x7e]{1,255}$")
+
+# Fields that differ between retries of the same submission.
+_VOLATILE_FIELDS = ("submittedAt",)
+
+
+class IdempotencyConflict(ValueError):
+    """The Idempotency-Key was already used for a different submission."""
+
+
+def fingerprint(
+    payload: Dict[str, Any],
+    resume_bytes: Optional[ResumeData] = None,
+    resume_filename: Optional[str] = None,
+) -> str:
+    stable = {k: v for k, v in payload.items() if k not in _VOLATILE_FIELDS}
+    h = hashlib.sha256()
+    h.update(json.dumps(stable, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+    h.update(b"\0" + (resume_filename or "").encode("utf-8") + b"\0")
+    if resume_bytes is not None:
+        for chunk in iter_chunks(resume_bytes):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def submission_key(header_value: Optional[str], fp: str) -> str:
+    if header_value:
+        header_value = header_value.strip()
+        if not _KEY_RE.match(header_value):
+            raise ValueError(f"Invalid {IDEMPOTENCY_HEADER} header.")
+        return f"key:{header_value}"
+    return f"sha256:{fp}"
+
+
+class _Flight:
+    def __init__(self, fp: str) -> None:
+        self.fp = fp
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class IdempotencyStore:
+    def __init__(self, max_entries: int = 10000, ttl: float = 86400.0) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._results: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+        self._inflight: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: str, fp: str, now: float) -> Optional[Tuple[str, Any]]:
+        entry = self._results.get(key)
+        if entry is None:
+            return None
+        expires_at, stored_fp, result = entry
+        if expires_at <= now:
+            del self._results[key]
+            return None
+        return stored_fp, result
+
+    def run(self, key: str, fp: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Return (result, replayed). Only successful results are stored; a
+        failed submission can be retried with the same key.
+        """
+        with self._lock:
+            hit = self._lookup(key, fp, time.time())
+            flight = self._inflight.get(key)
+            leader = hit is None and flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight(fp)
+
+        if hit is not None:
+            if hit[0] != fp:
+                raise IdempotencyConflict(f"{IDEMPOTENCY_HEADER} was already used for a different submission.")
+            return hit[1], True
+
+        assert flight is not None
+        if not leader:
+            if flight.fp != fp:
+                raise IdempotencyConflict(f"{IDEMPOTENCY_HEADER} was already used for a different submission.")
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        else:
+            with self._lock:
+                self._results[key] = (time.time() + self.ttl, fp, flight.result)
+                self._results.move_to_end(key)
+                while len(self._results) > self.max_entries:
+                    self._results.popitem(last=False)
+            return flight.result, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+
+# -------------------------------------------------------
+# Process-wide store
+# -------------------------------------------------------
+_STORE: Optional[IdempotencyStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_idempotency_store(cfg: Dict[str, Any]) -> IdempotencyStore:
+    global _STORE
+
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = IdempotencyStore(cfg["IDEMPOTENCY_MAX_ENTRIES"], cfg["IDEMPOTENCY_TTL"])
+        return _STORE
@@ -0,0 +1,145 @@
+# legal_registry.py
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# -------------------------------------------------------
+# Versioned legal text
+#
+# The EEO / CC-305 / VEVRAA / alcohol & drug texts live in
+# src/legal/legalTexts.js. Instead of uploading them with every
+# submission, the client sends `legalVersion: {key: sha256(text)}` and the
+# server looks the text up here. A version id is the SHA-256 hex of the
+# UTF-8 text, so the browser computes it with crypto.subtle and no build
+# step has to keep ids in sync.
+#
+# Every version the server has loaded is also written to LEGAL_TEXT_DIR, so
+# submissions queued before a deploy that changed the text still render
+# with the exact text the applicant saw.
+# -------------------------------------------------------
+LEGAL_KEYS = ("alcoholDrugProgram", "requiredNotice", "eeoNotice", "disabilityNotice", "veteranNotice")
+
+# export name in legalTexts.js -> payload key
+_JS_EXPORTS = {
+    "ALCOHOL_DRUG_PROGRAM_TEXT": "alcoholDrugProgram",
+    "REQUIRED_NOTICE_TEXT": "requiredNotice",
+    "EEO_NOTICE_TEXT": "eeoNotice",
+    "DISABILITY_NOTICE_TEXT": "disabilityNotice",
+    "VETERAN_NOTICE_TEXT": "veteranNotice",
+}
+_JS_EXPORT_RE = re.compile(r"export\s+const\s+([A-Z0-9_]+)\s*=\s*`([^`]*)`", re.S)
+_VERSION_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class UnknownLegalVersion(ValueError):
+    """The client referenced a legal text version this server does not have."""
+
+
+def text_version(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_js_texts(path: str | Path) -> Dict[str, str]:
+    """
+    Read the template literals exported by legalTexts.js. They are plain
+    text, so a literal containing ${...} or a backslash escape is rejected
+    rather than guessed at.
+    """
+    source = Path(path).read_text(encoding="utf-8")
+    texts: Dict[str, str] = {}
+    for name, body in _JS_EXPORT_RE.findall(source):
+        key = _JS_EXPORTS.get(name)
+        if key is None:
+            continue
+        if "${" in body or "\\" in body:
+            raise ValueError(f"{name} in {path} uses template escapes; the server can't reproduce it exactly.")
+        texts[key] = body.replace("\r\n", "\n")
+    return texts
+
+
+class LegalRegistry:
+    def __init__(self, directory: Optional[str | Path] = None) -> None:
+        self.directory = Path(directory) if directory else None
+        self._texts: Dict[str, str] = {}
+        self.current: Dict[str, str] = {}  # key -> version shipped with this build
+        self._lock = threading.Lock()
+
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for p in self.directory.glob("*.txt"):
+                if _VERSION_RE.match(p.stem):
+                    self._texts[p.stem] = p.read_text(encoding="utf-8")
+
+    def register(self, text: str) -> str:
+        version = text_version(text)
+        with self._lock:
+            if version in self._texts:
+                return version
+            self._texts[version] = text
+        if self.directory is not None:
+            path = self.directory / f"{version}.txt"
+            try:
+                tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+                tmp.write_text(text, encoding="utf-8")
+                os.replace(tmp, path)
+            except OSError as e:
+                print("⚠️ could not persist legal text version:", repr(e))
+        return version
+
+    def load_current(self, texts: Dict[str, str]) -> None:
+        self.current = {key: self.register(text) for key, text in texts.items()}
+
+    def get(self, version: str) -> Optional[str]:
+        with self._lock:
+            return self._texts.get(version)
+
+    def resolve(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Return a copy of the payload whose `legalText` holds the registered
+        text for every key in `legalVersion`. Keys without a version keep
+        whatever legalText the client sent (older clients).
+        """
+        versions = payload.get("legalVersion")
+        if not versions:
+            return payload
+        if not isinstance(versions, dict):
+            raise ValueError("Invalid legalVersion object.")
+
+        legal = dict(payload.get("legalText") or {})
+        resolved: Dict[str, str] = {}
+        for key, version in versions.items():
+            if key not in LEGAL_KEYS:
+                continue
+            text = self.get(str(version))
+            if text is None:
+                raise UnknownLegalVersion(f"Unknown legal text version for {key}.")
+            legal[key] = text
+            resolved[key] = str(version)
+        return {**payload, "legalText": legal, "legalVersion": resolved}
+
+
+# -------------------------------------------------------
+# Process-wide registry
+# -------------------------------------------------------
+_REGISTRY: Optional[LegalRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_legal_registry(cfg: Dict[str, Any]) -> LegalRegistry:
+    global _REGISTRY
+
+    with _REGISTRY_LOCK:
+        if _REGISTRY is None:
+            registry = LegalRegistry(cfg["LEGAL_TEXT_DIR"] or None)
+            source = cfg["LEGAL_TEXT_SOURCE"]
+            if source and Path(source).is_file():
+                registry.load_current(load_js_texts(source))
+            else:
+                print(f"⚠️ legal text source {source!r} not found; only previously stored versions are known.")
+            _REGISTRY = registry
+        return _REGISTRY
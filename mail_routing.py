@@ -0,0 +1,537 @@
+# mail_routing.py
+from __future__ import annotations
+
+import fnmatch
+import json
+import random
+import re
+import smtplib
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from contextlib import ExitStack, closing
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from metrics import ERRORS
+from uploads import ResumeData, data_size, iter_chunks
+
+# -------------------------------------------------------
+# Mailbox routing
+#
+# MAIL_ROUTES_PATH names a JSON list of routes. They are tried in order and
+# the first one whose patterns match the application's form.position and
+# form.location gets it:
+#
+#   [
+#     {"name": "oakland", "location": "Oakland*", "to": "ca-hiring@geolabs.net"},
+#     {"name": "field", "position": "*technician*", "to": ["field@geolabs.net"],
+#      "digest": {"window": 3600, "max_count": 20, "zip": true}},
+#     {"name": "maui", "location": "Maui*", "to": "maui@geolabs.net", "digest": true}
+#   ]
+#
+# Patterns are case-insensitive shell globs, and a missing pattern matches
+# anything. An application that no route matches goes to APPLICATION_MAIL_TO
+# (the "default" route). The default route is a digest route when
+# MAIL_DIGEST_ENABLED is on. Routes are read once per process.
+#
+# Digests
+#
+# A digest route does not send one message per application. The rendered
+# PDFs go into a SQLite spool (MAIL_DIGEST_SPOOL_PATH), and a flusher thread
+# sends one message for the route's pending applications when any of these
+# holds:
+#
+#   - the oldest one has waited `window` seconds,
+#   - `max_count` applications are pending,
+#   - their PDFs add up to `max_bytes`.
+#
+# The message carries every PDF, or with "zip" a single applications.zip
+# with one folder per applicant. Missing digest settings come from the
+# MAIL_DIGEST_* defaults.
+#
+# A batch is claimed with a lease (as in submission_queue.py), so the
+# flushers of several processes sharing the spool never send it twice. A
+# failed send puts the batch back with backoff. After `max_attempts`, or at
+# once when the relay refuses the sender or recipients with a 5xx (a
+# misconfigured route will not start working on retry), its applications
+# are marked failed instead: they keep their PDFs and error in the spool and
+# show up under "mail_digest_failed" in /api/health. The spool only deletes
+# an application after its digest has been accepted by the relay.
+# -------------------------------------------------------
+DEFAULT_ROUTE = "default"
+DIGEST_KEYS = ("window", "max_count", "max_bytes", "zip")
+
+
+def _glob(pattern: Optional[str]) -> Optional[re.Pattern]:
+    if pattern in (None, "", "*"):
+        return None
+    return re.compile(fnmatch.translate(pattern.strip()), re.I)
+
+
+class Route:
+    def __init__(
+        self,
+        name: str,
+        to: Sequence[str],
+        position: Optional[str] = None,
+        location: Optional[str] = None,
+        digest: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.name = name
+        self.to = list(to)
+        self.position = _glob(position)
+        self.location = _glob(location)
+        self.digest = digest  # None = one message per application
+
+    def matches(self, position: str, location: str) -> bool:
+        return (self.position is None or bool(self.position.match(position.strip()))) and (
+            self.location is None or bool(self.location.match(location.strip()))
+        )
+
+
+def _addresses(value: Any) -> List[str]:
+    if isinstance(value, str):
+        value = value.split(",")
+    return [a.strip() for a in value or () if isinstance(a, str) and a.strip()]
+
+
+def _digest_settings(value: Any, defaults: Dict[str, Any], where: str) -> Optional[Dict[str, Any]]:
+    if not value:
+        return None
+    if value is True:
+        value = {}
+    if not isinstance(value, dict) or set(value) - set(DIGEST_KEYS):
+        raise ValueError(f"{where}: digest must be true or an object with {', '.join(DIGEST_KEYS)}.")
+    settings = {**defaults, **value}
+    if settings["window"] <= 0 or settings["max_count"] < 1 or settings["max_bytes"] < 1:
+        raise ValueError(f"{where}: digest window, max_count and max_bytes must be positive.")
+    return settings
+
+
+def load_routes(path: str | Path, digest_defaults: Dict[str, Any]) -> List[Route]:
+    try:
+        entries = json.loads(Path(path).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"Could not read mail routes from {path}: {e}") from e
+    if not isinstance(entries, list):
+        raise ValueError(f"{path}: expected a JSON list of routes.")
+
+    routes: List[Route] = []
+    for i, entry in enumerate(entries):
+        where = f"{path} route {i + 1}"
+        if not isinstance(entry, dict):
+            raise ValueError(f"{where}: expected an object.")
+        name = str(entry.get("name") or f"route-{i + 1}")
+        if name == DEFAULT_ROUTE or any(r.name == name for r in routes):
+            raise ValueError(f"{where}: route name {name!r} is reserved or used twice.")
+        to = _addresses(entry.get("to"))
+        if not to:
+            raise ValueError(f"{where}: 'to' needs at least one address.")
+        routes.append(Route(
+            name,
+            to,
+            position=entry.get("position"),
+            location=entry.get("location"),
+            digest=_digest_settings(entry.get("digest"), digest_defaults, where),
+        ))
+    return routes
+
+
+class MailRouter:
+    def __init__(self, routes: Sequence[Route], default: Route) -> None:
+        self.routes = list(routes)
+        self.default = default
+        self._by_name = {r.name: r for r in (*self.routes, default)}
+
+    def route(self, form: Dict[str, Any]) -> Route:
+        position = str(form.get("position") or "")
+        location = str(form.get("location") or "")
+        return next((r for r in self.routes if r.matches(position, location)), self.default)
+
+    def get(self, name: str) -> Optional[Route]:
+        return self._by_name.get(name)
+
+    @property
+    def digests(self) -> bool:
+        return any(r.digest is not None for r in self._by_name.values())
+
+
+# -------------------------------------------------------
+# Digest spool
+# -------------------------------------------------------
+# sends (route, entries); each entry is {"summary": {...}, "documents": [(filename, data)]}
+DigestSender = Callable[[Route, List[Dict[str, Any]]], None]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending (
+    id              INTEGER PRIMARY KEY,
+    route           TEXT NOT NULL,
+    summary         TEXT NOT NULL,          -- JSON: name, position, location, email, ...
+    bytes           INTEGER NOT NULL,       -- total size of its PDFs
+    created_at      REAL NOT NULL,
+    status          TEXT NOT NULL DEFAULT 'pending',  -- pending | failed
+    batch           TEXT,                   -- set while a flusher is sending it
+    lease_until     REAL,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error      TEXT
+);
+CREATE INDEX IF NOT EXISTS pending_route ON pending (route, id);
+CREATE INDEX IF NOT EXISTS pending_batch ON pending (batch);
+CREATE TABLE IF NOT EXISTS pending_documents (
+    pending_id  INTEGER NOT NULL REFERENCES pending (id),
+    position    INTEGER NOT NULL,
+    filename    TEXT NOT NULL,
+    data        BLOB NOT NULL,
+    PRIMARY KEY (pending_id, position)
+);
+"""
+
+
+def _is_permanent(exc: BaseException) -> bool:
+    """The relay refused the message itself (5xx sender/recipients/data): the same batch will be refused again."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return bool(exc.recipients) and all(code >= 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)):
+        return exc.smtp_code >= 500
+    return isinstance(exc, ValueError)
+
+
+class DigestSpool:
+    def __init__(
+        self,
+        path: str | Path,
+        router: MailRouter,
+        sender: DigestSender,
+        poll_interval: float = 5.0,
+        lease_seconds: float = 300.0,
+        backoff_base: float = 30.0,
+        backoff_max: float = 900.0,
+        max_attempts: int = 8,
+    ) -> None:
+        self.path = Path(path)
+        self.router = router
+        self.sender = sender
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_attempts = max(1, max_attempts)
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        # The submission counts as delivered once add() commits.
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def add(self, route: Route, summary: Dict[str, Any], documents: Sequence[Tuple[str, ResumeData]]) -> int:
+        """Spool one application's PDFs for `route`'s next digest; returns its pending id."""
+        size = sum(data_size(d) for _, d in documents)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            cur = conn.execute(
+                "INSERT INTO pending (route, summary, bytes, created_at) VALUES (?, ?, ?, ?)",
+                (route.name, json.dumps(summary), size, time.time()),
+            )
+            pending_id = cur.lastrowid
+            conn.executemany(
+                "INSERT INTO pending_documents (pending_id, position, filename, data) VALUES (?, ?, ?, ?)",
+                [(pending_id, i, filename, data) for i, (filename, data) in enumerate(documents)],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        self._wake.set()  # the flusher decides whether the digest is due
+        return pending_id
+
+    def depth(self, status: str = "pending") -> Dict[str, int]:
+        """Applications per route that are waiting for a digest ("pending") or gave up ("failed")."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT route, COUNT(*) AS n FROM pending WHERE status = ? GROUP BY route", (status,)
+            ).fetchall()
+        return {r["route"]: r["n"] for r in rows}
+
+    # ---------------------------------------------------
+    # Flushing
+    # ---------------------------------------------------
+    def _settings(self, name: str) -> Tuple[Route, Dict[str, Any]]:
+        route = self.router.get(name)
+        if route is None or route.digest is None:
+            # Left over from a route that was removed or stopped digesting:
+            # deliver through the default route at the next poll.
+            route = route or self.router.default
+            return route, {"window": 0.0, "max_count": 1000, "max_bytes": 20 * 1024 * 1024, "zip": False}
+        return route, route.digest
+
+    def _due(self, now: float) -> Tuple[List[str], float]:
+        """Routes with a digest due now, and when the next one falls due by age."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT route, COUNT(*) AS n, SUM(bytes) AS size, MIN(created_at) AS oldest FROM pending"
+                " WHERE status = 'pending' AND ((batch IS NULL AND next_attempt_at <= ?) OR lease_until < ?)"
+                " GROUP BY route",
+                (now, now),
+            ).fetchall()
+        due, next_due = [], now + self.poll_interval
+        for r in rows:
+            _, digest = self._settings(r["route"])
+            if r["n"] >= digest["max_count"] or r["size"] >= digest["max_bytes"] or now - r["oldest"] >= digest["window"]:
+                due.append(r["route"])
+            else:
+                next_due = min(next_due, r["oldest"] + digest["window"])
+        return due, next_due
+
+    def _claim(self, name: str, digest: Dict[str, Any]) -> Tuple[str, List[sqlite3.Row]]:
+        batch = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT id, summary, bytes, attempts FROM pending"
+                " WHERE route = ? AND status = 'pending'"
+                " AND ((batch IS NULL AND next_attempt_at <= ?) OR lease_until < ?)"
+                " ORDER BY id LIMIT ?",
+                (name, now, now, digest["max_count"]),
+            ).fetchall()
+            claimed, size = [], 0
+            for row in rows:
+                if claimed and size + row["bytes"] > digest["max_bytes"]:
+                    break  # the rest go in the next digest
+                claimed.append(row)
+                size += row["bytes"]
+            conn.executemany(
+                "UPDATE pending SET batch = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                [(batch, now + self.lease_seconds, row["id"]) for row in claimed],
+            )
+            conn.execute("COMMIT")
+            return batch, claimed
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _send_batch(self, route: Route, rows: List[sqlite3.Row]) -> None:
+        # PDFs are read straight from SQLite blobs while the message streams
+        # out; a digest is never held in memory as a whole.
+        with closing(self._connect()) as conn, ExitStack() as stack:
+            entries = []
+            for row in rows:
+                documents = []
+                for doc in conn.execute(
+                    "SELECT rowid, filename FROM pending_documents WHERE pending_id = ? ORDER BY position",
+                    (row["id"],),
+                ):
+                    blob = stack.enter_context(conn.blobopen("pending_documents", "data", doc["rowid"], readonly=True))
+                    documents.append((doc["filename"], blob))
+                entries.append({"summary": json.loads(row["summary"]), "documents": documents})
+            self.sender(route, entries)
+
+    def _finish(self, batch: str, status: str, error: Optional[str] = None, delay: float = 0.0) -> None:
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if status == "sent":
+                conn.execute(
+                    "DELETE FROM pending_documents WHERE pending_id IN (SELECT id FROM pending WHERE batch = ?)",
+                    (batch,),
+                )
+                conn.execute("DELETE FROM pending WHERE batch = ?", (batch,))
+            else:
+                conn.execute(
+                    "UPDATE pending SET status = ?, batch = NULL, lease_until = NULL, last_error = ?,"
+                    " next_attempt_at = ? WHERE batch = ?",
+                    (status, error, time.time() + delay, batch),
+                )
+            conn.execute("COMMIT")
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def flush(self, force: bool = False) -> int:
+        """Send every digest that is due (all pending ones with `force`); returns applications sent."""
+        sent = 0
+        names = self._due(time.time())[0] if not force else list(self.depth())
+        for name in names:
+            route, digest = self._settings(name)
+            while True:
+                batch, rows = self._claim(name, digest)
+                if not rows:
+                    break
+                try:
+                    self._send_batch(route, rows)
+                except Exception as e:
+                    ERRORS.inc(route="mail-digest", type=type(e).__name__)
+                    attempts = max(r["attempts"] for r in rows) + 1
+                    if _is_permanent(e) or attempts >= self.max_attempts:
+                        print(
+                            f"❌ digest for {name} ({len(rows)} applications) failed permanently"
+                            f" after {attempts} attempts:",
+                            repr(e),
+                        )
+                        self._finish(batch, "failed", error=repr(e))
+                    else:
+                        delay = self._backoff(attempts)
+                        print(
+                            f"⚠️ digest for {name} ({len(rows)} applications) attempt {attempts} failed;"
+                            f" retrying in {delay:.0f}s:",
+                            repr(e),
+                        )
+                        self._finish(batch, "pending", error=repr(e), delay=delay)
+                    break
+                self._finish(batch, "sent")
+                sent += len(rows)
+                if not force and name not in self._due(time.time())[0]:
+                    break
+        return sent
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            wait = self.poll_interval
+            try:
+                self.flush()
+                wait = self._due(time.time())[1] - time.time()
+            except sqlite3.Error as e:
+                print("⚠️ digest spool error:", repr(e))
+            self._wake.wait(max(0.2, wait))
+            self._wake.clear()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="mail-digest", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        with self._start_lock:
+            thread, self._thread = self._thread, None
+            self._stop.set()
+            self._wake.set()
+        if thread is not None:
+            thread.join(timeout)
+
+
+# -------------------------------------------------------
+# Digest message
+# -------------------------------------------------------
+def digest_subject(route: Route, entries: List[Dict[str, Any]]) -> str:
+    label = "" if route.name == DEFAULT_ROUTE else f" ({route.name})"
+    return f"New Employment Applications{label}: {len(entries)} received"
+
+
+def digest_body(route: Route, entries: List[Dict[str, Any]], zipped: bool) -> str:
+    def when(ts: float) -> str:
+        return time.strftime("%Y-%m-%d %H:%M", time.localtime(ts))
+
+    lines = [
+        f"{len(entries)} employment application(s) were submitted from the web form"
+        f" between {when(entries[0]['summary']['submitted_at'])} and {when(entries[-1]['summary']['submitted_at'])}.",
+        "",
+    ]
+    for n, entry in enumerate(entries, 1):
+        s = entry["summary"]
+        lines += [
+            f"{n}. {s['name']} — {s['position']}",
+            f"   Location: {s.get('location') or 'Not specified'}",
+            f"   Applicant Email: {s['email']}",
+            f"   Submitted: {when(s['submitted_at'])}",
+            f"   PDFs: {entry_folder(n, s) + '/' if zipped else f'{n:02d}_*.pdf'}",
+            "",
+        ]
+    lines.append("The PDFs are in the attached applications.zip, one folder per applicant." if zipped
+                 else "Attachments are prefixed with the applicant's number above.")
+    return "\n".join(lines)
+
+
+def entry_folder(n: int, summary: Dict[str, Any]) -> str:
+    return f"{n:02d}_{summary.get('label') or 'Applicant'}"
+
+
+def digest_attachments(entries: List[Dict[str, Any]], zipped: bool) -> List[Tuple[str, ResumeData]]:
+    if not zipped:
+        return [
+            (f"{n:02d}_{filename}", data)
+            for n, entry in enumerate(entries, 1)
+            for filename, data in entry["documents"]
+        ]
+    # PDF streams are already deflated, so the zip just stores them. It is
+    # built in a temp file (spilled to disk past 8 MB) and streamed from there.
+    bundle = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    with zipfile.ZipFile(bundle, "w", zipfile.ZIP_STORED) as zf:
+        for n, entry in enumerate(entries, 1):
+            folder = entry_folder(n, entry["summary"])
+            for filename, data in entry["documents"]:
+                with zf.open(f"{folder}/{filename}", "w", force_zip64=True) as out:
+                    for chunk in iter_chunks(data):
+                        out.write(chunk)
+    return [("applications.zip", bundle)]
+
+
+# -------------------------------------------------------
+# Process-wide router and spool
+# -------------------------------------------------------
+_ROUTER: Optional[MailRouter] = None
+_SPOOL: Optional[DigestSpool] = None
+_LOCK = threading.Lock()
+
+
+def digest_defaults(cfg: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "window": cfg["MAIL_DIGEST_WINDOW"],
+        "max_count": cfg["MAIL_DIGEST_MAX_COUNT"],
+        "max_bytes": cfg["MAIL_DIGEST_MAX_BYTES"],
+        "zip": cfg["MAIL_DIGEST_ZIP"],
+    }
+
+
+def get_mail_router(cfg: Dict[str, Any]) -> MailRouter:
+    global _ROUTER
+
+    with _LOCK:
+        if _ROUTER is None:
+            defaults = digest_defaults(cfg)
+            routes = load_routes(cfg["MAIL_ROUTES_PATH"], defaults) if cfg.get("MAIL_ROUTES_PATH") else []
+            default = Route(
+                DEFAULT_ROUTE,
+                _addresses(cfg["APPLICATION_MAIL_TO"]),
+                digest=_digest_settings(cfg.get("MAIL_DIGEST_ENABLED"), defaults, "MAIL_DIGEST_ENABLED"),
+            )
+            _ROUTER = MailRouter(routes, default)
+        return _ROUTER
+
+
+def get_digest_spool(cfg: Dict[str, Any], sender: DigestSender) -> DigestSpool:
+    """The process-wide spool; its flusher thread starts on first use (after a fork)."""
+    global _SPOOL
+
+    router = get_mail_router(cfg)
+    with _LOCK:
+        if _SPOOL is None:
+            _SPOOL = DigestSpool(
+                cfg["MAIL_DIGEST_SPOOL_PATH"], router, sender, max_attempts=cfg["MAIL_DIGEST_MAX_ATTEMPTS"]
+            )
+            _SPOOL.start()
+        return _SPOOL
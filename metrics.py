@@ -0,0 +1,225 @@
+# metrics.py
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# -------------------------------------------------------
+# Minimal Prometheus metrics
+#
+# Counters and histograms with labels, rendered in the Prometheus text
+# exposition format by /api/metrics. An observation is one lock, a bisect
+# and two additions (a few hundred ns), which keeps instrumentation far
+# below 1% of a request. Values are per process; scrape each worker or
+# aggregate in Prometheus.
+# -------------------------------------------------------
+LabelValues = Tuple[str, ...]
+
+# Seconds. Fine resolution at the low end for per-stage timings, up to the
+# 20 s SMTP timeout at the top.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 60.0)
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, doc, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_label_str(self.label_names, k)} {_fmt(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, doc, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [f"{self.name}{_label_str(self.label_names, k)} {_fmt(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        doc: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][i] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(c), s[0])) for k, (c, s) in self._values.items())
+        lines = self.header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="' + _fmt(bound) + '"'
+                lines.append(f"{self.name}_bucket{_label_str(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_str(self.label_names, key)} {_fmt(total)}")
+            lines.append(f"{self.name}_count{_label_str(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def counter(name: str, doc: str, labels: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, doc, labels))  # type: ignore[return-value]
+
+
+def gauge(name: str, doc: str, labels: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.register(Gauge(name, doc, labels))  # type: ignore[return-value]
+
+
+def histogram(name: str, doc: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, doc, labels, buckets))  # type: ignore[return-value]
+
+
+# -------------------------------------------------------
+# Application metrics
+# -------------------------------------------------------
+REQUEST_SECONDS = histogram(
+    "geolabs_http_request_duration_seconds", "HTTP request latency by route.", ("route", "method", "status")
+)
+STAGE_SECONDS = histogram(
+    "geolabs_stage_duration_seconds",
+    "Time spent in each resume/submission stage (upload_read, extract, pdf_build, mime_assembly, smtp_connect, smtp_send).",
+    ("stage", "detail"),
+)
+ERRORS = counter("geolabs_errors_total", "Errors by route and exception type.", ("route", "type"))
+ATTACHMENT_BYTES = counter("geolabs_attachment_bytes_total", "Bytes of PDF attachments sent, by document.", ("document",))
+RESUME_PDF_BYTES = counter(
+    "geolabs_resume_pdf_bytes_total", "Bytes of over-budget PDF resumes before and after compression.", ("stage",)
+)
+RESUME_UPLOADS = counter("geolabs_resume_uploads_total", "Resume uploads by endpoint and file type.", ("endpoint", "ext"))
+
+ADMISSION_IN_FLIGHT = gauge("geolabs_admission_in_flight", "Requests holding an admission slot, by endpoint.", ("endpoint",))
+ADMISSION_QUEUED = gauge("geolabs_admission_queue_depth", "Requests waiting for an admission slot, by endpoint.", ("endpoint",))
+ADMISSION_REJECTED = counter(
+    "geolabs_admission_rejected_total",
+    "Requests turned away, by endpoint and reason (rate_limited, queue_full, queue_timeout).",
+    ("endpoint", "reason"),
+)
+
+MAIL_MESSAGES = counter(
+    "geolabs_mail_messages_total", "Application emails sent, by route and kind (single | digest).", ("route", "kind")
+)
+MAIL_APPLICATIONS = counter(
+    "geolabs_mail_applications_total", "Applications handed to mail, by route and kind (single | digest).", ("route", "kind")
+)
+
+READY = gauge("geolabs_ready", "1 when the last run of a readiness check passed, else 0.", ("check",))
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,174 @@
+# mime_stream.py
+from __future__ import annotations
+
+import base64
+import mimetypes
+import re
+import smtplib
+import uuid
+from email import policy
+from email.message import MIMEPart
+from email.utils import formatdate, getaddresses, make_msgid
+from typing import Dict, Iterator, List, Sequence, Tuple, Union
+
+from uploads import ResumeData, iter_chunks
+
+# -------------------------------------------------------
+# Streaming MIME writer
+#
+# EmailMessage.add_attachment keeps a base64 copy of every PDF, and
+# send_message flattens the whole message into one more string (and then
+# smtplib makes a CRLF-fixed, dot-stuffed copy of that). For six PDFs that
+# is several copies of a multi-megabyte message per request.
+#
+# StreamingMessage only holds references to the attachment buffers (bytes,
+# an mmapped upload, or a file). send_streaming() speaks MAIL/RCPT/DATA
+# itself and writes the message to the socket as it is encoded: headers and
+# the text part come from the email package, each attachment is base64'd
+# B64_CHUNK bytes at a time into whole 76-character lines. Memory per send is
+# a couple of chunks regardless of attachment size.
+# -------------------------------------------------------
+B64_CHUNK = 57 * 1024  # 57 input bytes = one 76-char base64 line
+WRITE_SIZE = 64 * 1024
+
+_POLICY = policy.SMTP
+_TEXT_POLICY = policy.SMTP.clone(cte_type="7bit")  # no 8BITMIME needed for the text part
+_LEADING_DOT = re.compile(rb"^\.", re.M)
+
+
+def _header(name: str, value: str) -> bytes:
+    return _POLICY.fold(*_POLICY.header_store_parse(name, value)).encode("ascii")
+
+
+class StreamingMessage:
+    def __init__(
+        self,
+        from_addr: str,
+        to_addrs: Union[str, Sequence[str]],
+        subject: str,
+        text: str,
+        attachments: Sequence[Tuple[str, ResumeData]] = (),
+    ) -> None:
+        """`attachments` are (filename, data); the type comes from the extension, data is not copied."""
+        self.from_addr = from_addr
+        self.to = to_addrs if isinstance(to_addrs, str) else ", ".join(to_addrs)
+        self.subject = subject
+        self.text = text
+        self.attachments = list(attachments)
+        self.boundary = f"=_{uuid.uuid4().hex}"
+        self.headers: Dict[str, str] = {
+            "From": from_addr,
+            "To": self.to,
+            "Subject": subject,
+            "Date": formatdate(localtime=True),
+            "Message-ID": make_msgid(),
+            "MIME-Version": "1.0",
+        }
+
+    def recipients(self) -> List[str]:
+        return [addr for _, addr in getaddresses([self.to]) if addr]
+
+    def _head(self) -> bytes:
+        lines = [_header(name, value) for name, value in self.headers.items()]
+        lines.append(f'Content-Type: multipart/mixed; boundary="{self.boundary}"\r\n'.encode("ascii"))
+        text = MIMEPart(policy=_TEXT_POLICY)
+        text.set_content(self.text)
+        return (
+            b"".join(lines)
+            + b"\r\n"
+            + f"--{self.boundary}\r\n".encode("ascii")
+            + text.as_bytes(policy=_TEXT_POLICY)
+            + b"\r\n"
+        )
+
+    def _attachment_head(self, filename: str) -> bytes:
+        return (
+            f"--{self.boundary}\r\n".encode("ascii")
+            + f"Content-Type: {mimetypes.guess_type(filename)[0] or 'application/octet-stream'}\r\n".encode("ascii")
+            + _header("Content-Disposition", f'attachment; filename="{filename}"')
+            + b"Content-Transfer-Encoding: base64\r\n\r\n"
+        )
+
+    def iter_bytes(self) -> Iterator[bytes]:
+        """
+        The message as CRLF-terminated, dot-stuffed DATA segments. Can be
+        iterated again (file attachments are re-read from the start).
+        """
+        yield _LEADING_DOT.sub(b"..", self._head())
+        for filename, data in self.attachments:
+            yield _LEADING_DOT.sub(b"..", self._attachment_head(filename))
+            # base64 lines never start with '.', so no stuffing needed here.
+            for chunk in iter_chunks(data, B64_CHUNK):
+                yield base64.encodebytes(chunk).replace(b"\n", b"\r\n")
+        yield f"--{self.boundary}--\r\n".encode("ascii")
+
+    def as_bytes(self) -> bytes:
+        """The whole message in memory, without dot-stuffing; for debugging only."""
+        data = b"".join(self.iter_bytes())
+        data = data[1:] if data.startswith(b"..") else data
+        return data.replace(b"\r\n..", b"\r\n.")
+
+
+def _reset(smtp: smtplib.SMTP) -> None:
+    try:
+        smtp.rset()
+    except smtplib.SMTPServerDisconnected:
+        pass
+
+
+def send_streaming(smtp: smtplib.SMTP, message: StreamingMessage) -> Dict[str, Tuple[int, bytes]]:
+    """
+    Send `message` on an open session, writing DATA as it is encoded.
+    Raises like SMTP.sendmail; returns the refused recipients (if some were accepted).
+    """
+    smtp.ehlo_or_helo_if_needed()
+    code, resp = smtp.mail(message.from_addr)
+    if code != 250:
+        if code == 421:
+            smtp.close()
+        else:
+            _reset(smtp)
+        raise smtplib.SMTPSenderRefused(code, resp, message.from_addr)
+
+    recipients = message.recipients()
+    refused: Dict[str, Tuple[int, bytes]] = {}
+    for addr in recipients:
+        code, resp = smtp.rcpt(addr)
+        if code not in (250, 251):
+            refused[addr] = (code, resp)
+        if code == 421:
+            smtp.close()
+            raise smtplib.SMTPRecipientsRefused(refused)
+    if len(refused) == len(recipients):
+        _reset(smtp)
+        raise smtplib.SMTPRecipientsRefused(refused)
+
+    smtp.putcmd("data")
+    code, resp = smtp.getreply()
+    if code != 354:
+        if code == 421:
+            smtp.close()
+        else:
+            _reset(smtp)  # the transaction is still open; the next MAIL would get 503
+        raise smtplib.SMTPDataError(code, resp)
+
+    pending = bytearray()
+    for segment in message.iter_bytes():
+        if len(pending) + len(segment) > WRITE_SIZE and pending:
+            smtp.send(bytes(pending))
+            pending.clear()
+        if len(segment) >= WRITE_SIZE:
+            smtp.send(segment)
+        else:
+            pending += segment
+    pending += b".\r\n"
+    smtp.send(bytes(pending))
+
+    code, resp = smtp.getreply()
+    if code != 250:
+        if code == 421:
+            smtp.close()
+        else:
+            _reset(smtp)
+        raise smtplib.SMTPDataError(code, resp)
+    return refused
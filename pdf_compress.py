@@ -0,0 +1,206 @@
+# pdf_compress.py
+from __future__ import annotations
+
+import io
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ArrayObject, NameObject, NumberObject
+
+from uploads import ResumeData, data_size, open_binary
+
+try:
+    from PIL import Image
+except ImportError:  # lossless passes only
+    Image = None  # type: ignore[assignment]
+
+# -------------------------------------------------------
+# Size-budgeted PDF resume compression
+#
+# Uploaded PDF resumes are attached as-is, so a scanned 10 MB resume is
+# ~13.5 MB of base64 in the message. When an upload is over
+# RESUME_PDF_BUDGET_BYTES it goes through increasingly lossy passes until
+# one fits:
+#
+#   lossless       content streams deflated at level 9, identical objects
+#                  merged and orphans dropped
+#   2000px / q80   + images longer than 2000px downsampled, re-encoded as JPEG
+#   1600px / q70
+#   1200px / q60   (~140 dpi on a letter page; still readable)
+#
+# An image is only replaced when its JPEG is smaller than the original
+# stream. Only JPEGs and 8-bit gray/RGB samples are touched; bilevel scans
+# (CCITT/JBIG2), JPEG 2000, masks and other color spaces are left alone.
+# A re-encoded image keeps its ICCBased color space (the samples are still
+# in that profile); other images are tagged DeviceGray / DeviceRGB.
+# The smallest result wins, and the original is kept when nothing is
+# smaller. Without Pillow only the lossless pass runs.
+#
+# Runs in the extraction sandbox (extract_pool.py) since the PDF is untrusted.
+# -------------------------------------------------------
+IMAGE_STEPS = ((2000, 80), (1600, 70), (1200, 60))
+
+_JPEG_MODES = {"RGB": "/DeviceRGB", "L": "/DeviceGray"}
+_RAW_MODES = {1: "L", 3: "RGB"}
+_SKIP_FILTERS = {"/CCITTFaxDecode", "/JBIG2Decode", "/JPXDecode", "/RunLengthDecode"}
+
+
+def _filters(obj) -> Tuple[str, ...]:
+    f = obj.get("/Filter")
+    if f is None:
+        return ()
+    return tuple(str(x) for x in f) if isinstance(f, ArrayObject) else (str(f),)
+
+
+def _components(colorspace) -> Optional[int]:
+    colorspace = colorspace.get_object() if colorspace is not None else None
+    if colorspace == "/DeviceGray":
+        return 1
+    if colorspace == "/DeviceRGB":
+        return 3
+    if isinstance(colorspace, ArrayObject) and colorspace and colorspace[0] == "/ICCBased":
+        return int(colorspace[1].get_object().get("/N", 0)) or None
+    return None
+
+
+def _decode(obj):
+    """
+    PIL image for an image XObject we know how to re-encode, else None.
+    Only JPEGs and 8-bit gray/RGB pixel data; pypdf's generic image
+    extraction round-trips every image through PNG, which costs seconds a page.
+    """
+    if obj.get("/ImageMask") or isinstance(obj.get("/Mask"), ArrayObject) or "/Decode" in obj:
+        return None  # stencil masks, color-keyed images and remapped samples
+    filters = _filters(obj)
+    if _SKIP_FILTERS.intersection(filters):
+        return None  # bilevel and JPEG 2000 codecs are already compact
+    if filters == ("/DCTDecode",):
+        image = Image.open(io.BytesIO(obj._data))
+        return image if image.mode in _JPEG_MODES else None
+    if "/DCTDecode" in filters or obj.get("/BitsPerComponent") != 8:
+        return None
+    mode = _RAW_MODES.get(_components(obj.get("/ColorSpace")) or 0)
+    if mode is None:
+        return None
+    size = (int(obj["/Width"]), int(obj["/Height"]))
+    return Image.frombytes(mode, size, obj.get_data())
+
+
+def _image_objects(writer: PdfWriter):
+    """Every image XObject reachable from the pages (through form XObjects), once."""
+    seen = set()
+    stack = [page.get("/Resources") for page in writer.pages]
+    while stack:
+        resources = stack.pop()
+        resources = resources.get_object() if resources is not None else None
+        xobjects = resources.get("/XObject") if resources else None
+        if not xobjects:
+            continue
+        for ref in xobjects.get_object().values():
+            if not hasattr(ref, "idnum") or ref.idnum in seen:
+                continue
+            seen.add(ref.idnum)
+            obj = ref.get_object()
+            if obj.get("/Subtype") == "/Image":
+                yield obj
+            elif obj.get("/Subtype") == "/Form":
+                stack.append(obj.get("/Resources"))
+
+
+def _target_colorspace(obj, image):
+    """The /ColorSpace for `image` re-encoded: the original ICC profile when it fits the mode."""
+    original = obj.get("/ColorSpace")
+    resolved = original.get_object() if original is not None else None
+    if (
+        isinstance(resolved, ArrayObject) and resolved and resolved[0] == "/ICCBased"
+        and _components(original) == len(image.getbands())
+    ):
+        return original
+    return NameObject(_JPEG_MODES[image.mode])
+
+
+def _replace_image(obj, image, jpeg: bytes, colorspace) -> None:
+    for key in ("/DecodeParms", "/Filter"):
+        obj.pop(key, None)
+    obj[NameObject("/Filter")] = NameObject("/DCTDecode")
+    obj[NameObject("/Width")] = NumberObject(image.width)
+    obj[NameObject("/Height")] = NumberObject(image.height)
+    obj[NameObject("/BitsPerComponent")] = NumberObject(8)
+    obj[NameObject("/ColorSpace")] = colorspace
+    obj._data = jpeg
+    if hasattr(obj, "decoded_self"):
+        obj.decoded_self = None
+
+
+def _write(writer: PdfWriter) -> bytes:
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+def compress_pdf(data: ResumeData, budget: int) -> Tuple[Optional[bytes], Dict[str, Any]]:
+    """
+    Shrink a PDF towards `budget` bytes. Returns (smaller pdf or None, report);
+    None means the original should be kept.
+    """
+    t0 = time.perf_counter()
+    before = data_size(data)
+    reader = PdfReader(open_binary(data))
+    if reader.is_encrypted and not reader.decrypt(""):
+        raise ValueError("PDF is password protected.")
+
+    writer = PdfWriter(clone_from=reader)
+    for page in writer.pages:
+        page.compress_content_streams(level=9)
+    writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+    best = _write(writer)
+    report: Dict[str, Any] = {"before": before, "after": len(best), "pass": "lossless", "images": 0}
+
+    if len(best) > budget and Image is not None:
+        # Each image is decoded once and scaled down to the first step's size;
+        # later steps start from that. Images only ever get smaller, so an
+        # image replaced at one step is replaced again at the next.
+        first_px = IMAGE_STEPS[0][0]
+        images = []
+        for obj in _image_objects(writer):
+            image = _decode(obj)
+            if image is None:
+                continue
+            if max(image.size) > first_px:
+                image.thumbnail((first_px, first_px), Image.LANCZOS)
+            else:
+                image.load()
+            # Taken now: _replace_image overwrites it at the first step.
+            images.append((obj, image, len(obj._data), _target_colorspace(obj, image)))
+
+        for max_px, quality in IMAGE_STEPS if images else ():
+            replaced = 0
+            for i, (obj, image, original_size, colorspace) in enumerate(images):
+                if max(image.size) > max_px:
+                    image = image.copy()
+                    image.thumbnail((max_px, max_px), Image.LANCZOS)
+                    images[i] = (obj, image, original_size, colorspace)
+                buf = io.BytesIO()
+                image.save(buf, "JPEG", quality=quality, optimize=True)
+                if buf.tell() < original_size:
+                    _replace_image(obj, image, buf.getvalue(), colorspace)
+                    replaced += 1
+            pdf = _write(writer)
+            if len(pdf) < len(best):
+                best = pdf
+                report.update({"after": len(pdf), "images": replaced, "pass": f"{max_px}px/q{quality}"})
+            if len(best) <= budget:
+                break
+
+    keep_original = report["after"] >= before
+    if keep_original:
+        report.update({"after": before, "pass": "original", "images": 0})
+    report["seconds"] = round(time.perf_counter() - t0, 3)
+    report["within_budget"] = report["after"] <= budget
+    return (None if keep_original else best), report
+
+
+def compress_resume(data: ResumeData, filename: str, budget: int) -> Tuple[Optional[bytes], Dict[str, Any]]:
+    # extract_pool op signature: (data, filename, **kwargs)
+    return compress_pdf(data, budget)
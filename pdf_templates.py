@@ -0,0 +1,61 @@
+# pdf_templates.py
+from __future__ import annotations
+
+from typing import Any, Dict, Optional, Tuple
+
+from reportlab.platypus import Paragraph
+
+# -------------------------------------------------------
+# Pre-laid-out static text
+#
+# Labels, section headings, document headers and the "exact text"
+# disclaimers are identical in every submission. A StaticText holds the
+# parsed markup once per process plus the result of line-breaking it at
+# each width it has been laid out at; StaticParagraph is a normal
+# Paragraph flowable that copies that state in instead of recomputing it.
+#
+# Paragraph.breakLines() never mutates the fragments it is given (it
+# rebinds self.frags to a new list), so the cached objects are shared
+# read-only between documents and render threads.
+# -------------------------------------------------------
+# Everything Paragraph.wrap()/breakLines() set on the flowable.
+WRAP_STATE = ("frags", "blPara", "_wrapWidths", "_width_max", "_hyphenations", "_splitLongWordCount", "height")
+
+
+class StaticText:
+    def __init__(self, text: str, style: Any) -> None:
+        self.text = text
+        self.style = style
+        self.frags = Paragraph(text, style).frags
+        self.wraps: Dict[float, Tuple[float, Dict[str, Any]]] = {}
+
+
+class StaticParagraph(Paragraph):
+    # Paragraph.split() builds the two halves with self.__class__(text, style,
+    # bulletText=..., frags=...), so the constructor keeps Paragraph's
+    # signature; those halves have no StaticText and wrap normally.
+    _static: Optional[StaticText] = None
+
+    @classmethod
+    def of(cls, static: StaticText) -> "StaticParagraph":
+        p = cls(static.text, static.style, frags=static.frags)
+        p._static = static
+        return p
+
+    def wrap(self, availWidth: float, availHeight: float):
+        static = self._static
+        if static is None:
+            return super().wrap(availWidth, availHeight)
+
+        hit = static.wraps.get(availWidth)
+        if hit is not None:
+            width, state = hit
+            self.width = width
+            self.__dict__.update(state)
+            return width, self.height
+
+        width, height = super().wrap(availWidth, availHeight)
+        if availWidth > 0:
+            state = {k: getattr(self, k) for k in WRAP_STATE if hasattr(self, k)}
+            static.wraps[availWidth] = (width, state)
+        return width, height
@@ -0,0 +1,284 @@
+# profiling.py
+from __future__ import annotations
+
+import argparse
+import cProfile
+import ipaddress
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# -------------------------------------------------------
+# Opt-in request profiling
+#
+# With PROFILE_ENABLED, /api/parse-resume and /api/submit-application are
+# profiled with cProfile when
+#
+#   - the request carries "X-Profile: 1" from a client in PROFILE_ALLOWLIST
+#     (comma-separated IPs / CIDRs, matched like admission.py's client
+#     address), or
+#   - it is picked at random at PROFILE_SAMPLE_RATE (0..1).
+#
+# When it is off, create_app() does not wrap the views at all, so there is
+# no per-request cost. A profiled response carries X-Profile-Id. When a
+# profiled submission is spooled, the background render + send of that job
+# is profiled under the same id (endpoint "submit-job").
+#
+# While a profile is active, the application PDFs are rendered on the
+# profiled thread instead of the render pool, so _kv_block / _card_box /
+# reportlab time is in the profile and not hidden behind future.result().
+# Resume extraction stays in its sandbox and shows up as the wait for it.
+#
+# Each profile writes two files to PROFILE_DIR:
+#
+#   <time>-<endpoint>-<id>.prof        cProfile stats (pstats, snakeviz)
+#   <time>-<endpoint>-<id>.collapsed   collapsed stacks in microseconds, for
+#                                      flamegraph.pl / speedscope
+#
+# Only the newest PROFILE_MAX_DUMPS profiles are kept. cProfile keeps
+# caller -> callee totals, not stacks. So each function's time is split
+# over its callers in proportion to the time each call edge accounts for
+# (the flameprof approach). Recursion is cut at the first repeat.
+#
+#   python profiling.py list
+#   python profiling.py top -n 25 --sort tottime -k submit
+#   python profiling.py collapse -k parse-resume > parse.collapsed
+# -------------------------------------------------------
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_MARKER = "_profile"  # key a spooled payload carries when its job should be profiled
+MAX_STACK_DEPTH = 64
+_PROFILE_ID_RE = re.compile(r"^[0-9a-f]{12}$")
+
+_ACTIVE = threading.local()
+
+Func = Tuple[str, int, str]
+
+
+def _after_fork_in_child() -> None:
+    # A worker pool started lazily from a profiled thread (the extraction
+    # sandbox, say) would otherwise run forever with cProfile's hook installed.
+    if active_profile() is not None:
+        sys.setprofile(None)
+        _ACTIVE.profile_id = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def active_profile() -> Optional[str]:
+    """Id of the profile running on this thread, if any."""
+    return getattr(_ACTIVE, "profile_id", None)
+
+
+def valid_profile_id(value: Any) -> bool:
+    """Ids are ours (uuid4 hex prefixes); anything else must not reach a file name."""
+    return isinstance(value, str) and bool(_PROFILE_ID_RE.match(value))
+
+
+def _label(func: Func) -> str:
+    filename, line, name = func
+    if filename == "~":
+        return name  # builtins, e.g. <built-in method zlib.compress>
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def collapsed_stacks(stats: pstats.Stats) -> Dict[str, int]:
+    """{"root;caller;callee": self microseconds} reconstructed from a cProfile call graph."""
+    raw = stats.stats  # type: ignore[attr-defined]
+    children: Dict[Func, Dict[Func, float]] = {}
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, edge in callers.items():
+            children.setdefault(caller, {})[func] = edge[3]
+    roots = [f for f, (_, _, _, _, callers) in raw.items() if not callers]
+
+    out: Dict[str, int] = {}
+
+    def walk(func: Func, stack: List[str], seen: set, share: float) -> None:
+        _, _, tottime, cumtime, _ = raw[func]
+        frac = share / cumtime if cumtime else 0.0
+        path = stack + [_label(func)]
+        key = ";".join(path)
+        out[key] = out.get(key, 0) + int(tottime * frac * 1e6)
+        if len(path) >= MAX_STACK_DEPTH:
+            return
+        for callee, edge_time in children.get(func, {}).items():
+            if callee not in seen and edge_time * frac > 1e-6:
+                walk(callee, path, seen | {callee}, edge_time * frac)
+
+    for root in roots:
+        walk(root, [], {root}, raw[root][3])
+    return {k: v for k, v in out.items() if v > 0}
+
+
+class RequestProfiler:
+    def __init__(
+        self,
+        directory: str | Path,
+        max_dumps: int = 200,
+        sample_rate: float = 0.0,
+        allowlist: str = "",
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_dumps = max(1, max_dumps)
+        self.sample_rate = sample_rate
+        self.allowlist = [ipaddress.ip_network(n.strip(), strict=False) for n in allowlist.split(",") if n.strip()]
+        self._rotate_lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def allowed(self, client: str) -> bool:
+        try:
+            addr = ipaddress.ip_address(client)
+        except ValueError:
+            return False
+        return any(addr in net for net in self.allowlist)
+
+    def wanted(self, client: str, header: Optional[str]) -> bool:
+        if header and header.strip().lower() in {"1", "true", "yes"} and self.allowed(client):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def profile(self, endpoint: str, profile_id: Optional[str] = None) -> Iterator[Optional[str]]:
+        """
+        Profile the block on this thread and dump it. Yields the profile id,
+        or None (and does not profile) when this thread is already being profiled.
+        """
+        if active_profile() is not None:
+            yield None
+            return
+        if profile_id is not None and not valid_profile_id(profile_id):
+            raise ValueError(f"Invalid profile id {profile_id!r}.")
+        profile_id = profile_id or uuid.uuid4().hex[:12]
+        prof = cProfile.Profile()
+        _ACTIVE.profile_id = profile_id
+        t0 = time.perf_counter()
+        prof.enable()
+        try:
+            yield profile_id
+        finally:
+            prof.disable()
+            _ACTIVE.profile_id = None
+            # Folding the call graph takes ~100 ms for a full submission; not on the request's time.
+            elapsed = time.perf_counter() - t0
+            threading.Thread(
+                target=self._dump, args=(prof, endpoint, profile_id, elapsed), name="profile-dump", daemon=True
+            ).start()
+
+    def _dump(self, prof: cProfile.Profile, endpoint: str, profile_id: str, elapsed: float) -> None:
+        try:
+            path = self._write(prof, endpoint, profile_id)
+            print(f"⏱ profiled {endpoint} in {elapsed * 1000:.0f} ms -> {path}")
+        except Exception as e:  # a failed dump must not fail anything else
+            print("⚠️ could not write profile:", repr(e))
+
+    def _write(self, prof: cProfile.Profile, endpoint: str, profile_id: str) -> Path:
+        now = time.time()
+        stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}{int(now % 1 * 1000):03d}"  # sorts by time
+        base = self.directory / f"{stamp}-{endpoint}-{profile_id}"
+        stats = pstats.Stats(prof)
+        lines = "".join(f"{stack} {us}\n" for stack, us in collapsed_stacks(stats).items())
+        for suffix, write in ((".collapsed", lambda p: p.write_text(lines, encoding="utf-8")),
+                              (".prof", lambda p: stats.dump_stats(p))):
+            tmp = base.with_suffix(suffix + ".tmp")
+            write(tmp)
+            os.replace(tmp, base.with_suffix(suffix))
+        self._rotate()
+        return base.with_suffix(".prof")
+
+    def _rotate(self) -> None:
+        with self._rotate_lock:
+            dumps = sorted(self.directory.glob("*.prof"))
+            for old in dumps[:-self.max_dumps]:
+                old.unlink(missing_ok=True)
+                old.with_suffix(".collapsed").unlink(missing_ok=True)
+
+
+# -------------------------------------------------------
+# Process-wide profiler
+# -------------------------------------------------------
+_PROFILER: Optional[RequestProfiler] = None
+_PROFILER_LOCK = threading.Lock()
+
+
+def get_request_profiler(cfg: Dict[str, Any]) -> Optional[RequestProfiler]:
+    """The profiler, or None when PROFILE_ENABLED is off."""
+    global _PROFILER
+
+    if not cfg.get("PROFILE_ENABLED"):
+        return None
+    with _PROFILER_LOCK:
+        if _PROFILER is None:
+            _PROFILER = RequestProfiler(
+                cfg["PROFILE_DIR"],
+                max_dumps=cfg["PROFILE_MAX_DUMPS"],
+                sample_rate=cfg["PROFILE_SAMPLE_RATE"],
+                allowlist=cfg["PROFILE_ALLOWLIST"],
+            )
+        return _PROFILER
+
+
+# -------------------------------------------------------
+# CLI
+# -------------------------------------------------------
+def _dumps(directory: Path, pattern: str, limit: int) -> List[Path]:
+    dumps = [p for p in sorted(directory.glob("*.prof")) if pattern in p.stem]
+    return dumps[-limit:] if limit else dumps
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    default_dir = os.getenv("PROFILE_DIR", str(Path(__file__).resolve().parent / "spool" / "profiles"))
+    ap = argparse.ArgumentParser(description="Aggregate request profiles written by profiling.py.")
+    ap.add_argument("--dir", default=default_dir, help=f"profile directory (default {default_dir})")
+    ap.add_argument("-k", dest="pattern", default="", help="only dumps whose name contains this (e.g. submit)")
+    ap.add_argument("--last", type=int, default=0, help="only the newest N dumps")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="list dumps with their total time")
+    top = sub.add_parser("top", help="top functions across dumps")
+    top.add_argument("-n", type=int, default=30)
+    top.add_argument("--sort", choices=("tottime", "cumtime", "ncalls"), default="tottime")
+    sub.add_parser("collapse", help="merge collapsed stacks (for flamegraph.pl) to stdout")
+    args = ap.parse_args(argv)
+
+    dumps = _dumps(Path(args.dir), args.pattern, args.last)
+    if not dumps:
+        print(f"no profiles in {args.dir}", file=sys.stderr)
+        return 1
+
+    if args.cmd == "list":
+        for path in dumps:
+            total = pstats.Stats(str(path)).total_tt  # type: ignore[attr-defined]
+            print(f"{path.stem:<64} {total * 1000:9.1f} ms")
+    elif args.cmd == "top":
+        stats = pstats.Stats(*(str(p) for p in dumps))
+        print(f"{len(dumps)} profiles, {stats.total_tt * 1000 / len(dumps):.1f} ms average")  # type: ignore[attr-defined]
+        rows = sorted(stats.stats.items(), key=lambda kv: {  # type: ignore[attr-defined]
+            "tottime": kv[1][2], "cumtime": kv[1][3], "ncalls": kv[1][1]}[args.sort], reverse=True)
+        print(f"{'ms/profile (self)':>18} {'ms/profile (cum)':>17} {'calls/profile':>14}  function")
+        for func, (_, ncalls, tottime, cumtime, _) in rows[:args.n]:
+            per = 1000 / len(dumps)
+            print(f"{tottime * per:18.2f} {cumtime * per:17.2f} {ncalls / len(dumps):14.1f}  {_label(func)}")
+    else:
+        merged: Dict[str, int] = {}
+        for path in dumps:
+            collapsed = path.with_suffix(".collapsed")
+            if not collapsed.exists():
+                continue
+            for line in collapsed.read_text(encoding="utf-8").splitlines():
+                stack, _, us = line.rpartition(" ")
+                merged[stack] = merged.get(stack, 0) + int(us)
+        sys.stdout.writelines(f"{stack} {us}\n" for stack, us in merged.items())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+# readiness.py
+from __future__ import annotations
+
+import json
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from metrics import READY
+
+# -------------------------------------------------------
+# Readiness probe
+#
+# /api/ready tells the load balancer whether this node can take
+# submissions right now. The checks run on a background thread, each on its
+# own schedule, and /api/ready only returns the last result (JSON encoded
+# once per round), so a request never waits on a probe and a flood of
+# probes never reaches the relay:
+#
+#   smtp          connect, STARTTLS, AUTH, NOOP on a fresh connection   READY_SMTP_INTERVAL
+#   extraction    a no-op job round-trips through a sandbox worker      READY_PROBE_INTERVAL
+#   queue         spool readable, worker threads alive,
+#                 queued jobs <= READY_MAX_QUEUED                        READY_PROBE_INTERVAL
+#   disk          >= READY_MIN_FREE_MB free where spool/archive/cache
+#                 write                                                  READY_PROBE_INTERVAL
+#
+# The node is ready when every check passed on its last run. Until the
+# first round finishes, or when the prober thread stops updating, the
+# answer is 503.
+# -------------------------------------------------------
+Check = Callable[[], str]  # returns a short detail; raises when not ready
+
+
+class ReadinessProber:
+    def __init__(self) -> None:
+        self._checks: List[Tuple[str, Check, float]] = []
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._due: Dict[str, float] = {}
+        self._body = b""
+        self._ready = False
+        self._updated = 0.0  # monotonic time of the last round
+        self._stale_after = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def add_check(self, name: str, check: Check, interval: float) -> None:
+        self._checks.append((name, check, max(0.5, interval)))
+        self._stale_after = max(self._stale_after, 3 * max(0.5, interval))
+
+    def _run(self, name: str, check: Check) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        try:
+            detail, ok = check(), True
+        except Exception as e:
+            detail, ok = f"{type(e).__name__}: {e}", False
+        READY.set(1 if ok else 0, check=name)
+        return {
+            "ok": ok,
+            "detail": detail,
+            "latency_ms": round((time.perf_counter() - t0) * 1000, 1),
+            "checked_at": time.time(),
+        }
+
+    def run_once(self) -> None:
+        """Run every check that is due and publish the result."""
+        now = time.monotonic()
+        for name, check, interval in self._checks:
+            if now >= self._due.get(name, 0.0):
+                self._results[name] = self._run(name, check)
+                self._due[name] = time.monotonic() + interval
+        ready = bool(self._results) and all(r["ok"] for r in self._results.values())
+        body = json.dumps({"ready": ready, "checks": self._results}, separators=(",", ":")).encode("utf-8")
+        with self._lock:
+            self._body, self._ready, self._updated = body, ready, time.monotonic()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:  # a check bug must not kill the prober
+                print("⚠️ readiness probe error:", repr(e))
+            next_due = min(self._due.values(), default=time.monotonic() + 1.0)
+            self._stop.wait(max(0.2, next_due - time.monotonic()))
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="readiness-probe", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        self._stop.set()
+        if thread is not None:
+            thread.join(timeout=10)
+
+    def snapshot(self) -> Tuple[bool, bytes]:
+        """(ready, JSON body) from the last round; never runs a check."""
+        with self._lock:
+            body, ready, updated = self._body, self._ready, self._updated
+        if not updated:
+            return False, b'{"ready":false,"detail":"first probe round has not finished"}'
+        if time.monotonic() - updated > self._stale_after:
+            return False, b'{"ready":false,"detail":"readiness probes are not running"}'
+        return ready, body
+
+
+# -------------------------------------------------------
+# Checks
+# -------------------------------------------------------
+def _smtp_check(cfg: Dict[str, Any]) -> Check:
+    def check() -> str:
+        from smtp_pool import get_smtp_pool
+
+        if not cfg.get("SMTP_HOST"):
+            raise RuntimeError("SMTP_HOST is not configured.")
+        get_smtp_pool(cfg).probe(timeout=cfg["READY_SMTP_TIMEOUT"])
+        return f"{cfg['SMTP_HOST']}:{cfg['SMTP_PORT']} answered NOOP"
+    return check
+
+
+def _extraction_check(cfg: Dict[str, Any]) -> Check:
+    def check() -> str:
+        from extract_pool import get_extract_pool
+
+        pool = get_extract_pool(cfg)
+        if pool is None:
+            return "inline (no sandbox pool)"
+        return "worker answered" if pool.ping() else "all workers busy"
+    return check
+
+
+def _queue_check(cfg: Dict[str, Any]) -> Check:
+    def check() -> str:
+        from services import get_application_queue
+
+        queue = get_application_queue(cfg)
+        depth = queue.depth()
+        alive = queue.workers_alive()
+        if alive < queue.workers:
+            raise RuntimeError(f"{alive}/{queue.workers} submission workers running")
+        if depth["queued"] > cfg["READY_MAX_QUEUED"]:
+            raise RuntimeError(f"{depth['queued']} submissions queued (limit {cfg['READY_MAX_QUEUED']})")
+        return f"{depth['queued']} queued, {depth['running']} running"
+    return check
+
+
+def _disk_check(cfg: Dict[str, Any]) -> Check:
+    paths = [Path(cfg["SUBMIT_SPOOL_PATH"]).parent]
+    if cfg.get("ARCHIVE_ENABLED"):
+        paths.append(Path(cfg["ARCHIVE_DIR"]))
+    if cfg.get("RESUME_CACHE_DIR"):
+        paths.append(Path(cfg["RESUME_CACHE_DIR"]))
+    min_free = cfg["READY_MIN_FREE_MB"] * 1024 * 1024
+
+    def check() -> str:
+        free: Dict[str, int] = {}
+        for path in paths:
+            existing = next((p for p in (path, *path.parents) if p.exists()), path)
+            free[str(path)] = shutil.disk_usage(existing).free
+        low = {p: n for p, n in free.items() if n < min_free}
+        if low:
+            raise RuntimeError(", ".join(f"{p}: {n // 1048576} MB free" for p, n in low.items()))
+        return f"{min(free.values()) // 1048576} MB free"
+    return check
+
+
+# -------------------------------------------------------
+# Process-wide prober
+# -------------------------------------------------------
+_PROBER: Optional[ReadinessProber] = None
+_PROBER_LOCK = threading.Lock()
+
+
+def get_readiness_prober(cfg: Dict[str, Any]) -> ReadinessProber:
+    """The process-wide prober, started on first use (its thread must start after a fork)."""
+    global _PROBER
+
+    with _PROBER_LOCK:
+        if _PROBER is None:
+            interval = cfg["READY_PROBE_INTERVAL"]
+            prober = ReadinessProber()
+            prober.add_check("smtp", _smtp_check(cfg), cfg["READY_SMTP_INTERVAL"])
+            prober.add_check("extraction", _extraction_check(cfg), interval)
+            if cfg.get("SUBMIT_QUEUE_ENABLED"):
+                prober.add_check("queue", _queue_check(cfg), interval)
+            prober.add_check("disk", _disk_check(cfg), interval)
+            prober.start()
+            _PROBER = prober
+        return _PROBER
+
+
+def stop_readiness_prober() -> None:
+    global _PROBER
+
+    with _PROBER_LOCK:
+        if _PROBER is not None:
+            _PROBER.stop()
+        _PROBER = None
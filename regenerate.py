@@ -0,0 +1,333 @@
+# regenerate.py
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from render_pool import RENDER_JOBS
+
+# -------------------------------------------------------
+# Batch PDF regeneration
+#
+# Re-renders the application PDFs for stored payloads after a template or
+# legal-text change, without going through the HTTP submit:
+#
+#   python archive.py dump > payloads.jsonl
+#   python regenerate.py payloads.jsonl -o out/            # texts the applicant saw
+#   python regenerate.py payloads.jsonl -o out/ --legal current
+#   python regenerate.py exports/ -o out/ --documents main,drug --workers 4
+#
+# Input is a JSONL file, or a directory of *.jsonl / *.json files read in
+# name order. A line is either a payload or an `archive.py dump` record
+# ({"id": ..., "payload": {...}}); output goes to OUT/<id>/<document>.pdf,
+# numbered by input position when a record has no id. Resumes are not
+# regenerated: they are the applicant's file, not one of our templates.
+#
+# Payloads are read lazily and at most WORKERS x 4 are in flight, each
+# worker writes its own PDFs, and the parent only sees counts, so memory
+# stays flat however large the input is. OUT/.checkpoint.json records how
+# many leading records are finished; a rerun after a crash or Ctrl-C skips
+# them (--restart starts over). Records that finished out of order past
+# that point are rendered again, which is harmless since every file is
+# replaced atomically. Records that fail are listed in OUT/errors.jsonl.
+# -------------------------------------------------------
+CHECKPOINT_NAME = ".checkpoint.json"
+ERRORS_NAME = "errors.jsonl"
+IN_FLIGHT_PER_WORKER = 4
+
+_KEY_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+_CFG: Dict[str, Any] = {}
+
+
+# -------------------------------------------------------
+# Input
+# -------------------------------------------------------
+def input_files(source: str | Path) -> List[Path]:
+    source = Path(source)
+    if source.is_dir():
+        return sorted(p for p in source.iterdir() if p.suffix in {".jsonl", ".json"} and p.is_file())
+    if not source.is_file():
+        raise SystemExit(f"❌ no such file or directory: {source}")
+    return [source]
+
+
+def iter_records(files: List[Path]) -> Iterator[Tuple[str, Optional[Dict[str, Any]], Optional[str]]]:
+    """
+    (key, payload, error) per input record, in order. Bad JSON is reported as
+    an error for that record rather than stopping the run.
+    """
+    n = 0
+    for path in files:
+        with open(path, encoding="utf-8") as f:
+            lines = [f.read()] if path.suffix == ".json" else f
+            for line in lines:
+                if not line.strip():
+                    continue
+                n += 1
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield f"{n:08d}", None, f"{path.name}: invalid JSON: {e}"
+                    continue
+                if not isinstance(record, dict):
+                    yield f"{n:08d}", None, f"{path.name}: expected a JSON object"
+                    continue
+                if isinstance(record.get("payload"), dict):
+                    key = str(record.get("id") or record.get("submission_id") or f"{n:08d}")
+                    yield _KEY_RE.sub("_", key), record["payload"], None
+                else:
+                    yield f"{n:08d}", record, None
+
+
+# -------------------------------------------------------
+# Rendering (runs in the pool workers)
+# -------------------------------------------------------
+def _on_sigterm(signum, frame) -> None:
+    raise KeyboardInterrupt()
+
+
+def _init_worker(cfg: Dict[str, Any]) -> None:
+    from render_pool import _warm_worker
+
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent checkpoints and stops the pool
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    _CFG.update(cfg)
+    _warm_worker()
+
+
+def _legal(payload: Dict[str, Any], mode: str) -> Dict[str, Any]:
+    from legal_registry import get_legal_registry
+
+    registry = get_legal_registry(_CFG)
+    if mode == "current":
+        payload = {k: v for k, v in payload.items() if k != "legalText"}
+        payload["legalVersion"] = dict(registry.current)
+    return registry.resolve(payload)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def render_record(key: str, payload: Dict[str, Any], out_dir: str, documents: Tuple[str, ...], legal: str) -> int:
+    """Render and write one record's PDFs; returns the number of documents written."""
+    from render_pool import _builder
+
+    payload = _legal(payload, legal)
+    target = Path(out_dir) / key
+    target.mkdir(parents=True, exist_ok=True)
+    for name in documents:
+        _write_atomic(target / f"{name}.pdf", _builder(name)(payload))
+    return len(documents)
+
+
+# -------------------------------------------------------
+# Checkpoint
+# -------------------------------------------------------
+class Checkpoint:
+    def __init__(self, out_dir: Path, source: List[str], restart: bool = False) -> None:
+        self.path = out_dir / CHECKPOINT_NAME
+        self.source = source
+        self.done = 0        # leading input records that are finished (rendered or failed)
+        self.documents = 0
+        self.errors = 0
+        if self.path.exists() and not restart:
+            state = json.loads(self.path.read_text(encoding="utf-8"))
+            if state.get("source") != source:
+                raise SystemExit(f"❌ {self.path} belongs to another input ({state.get('source')}); use --restart.")
+            self.done = int(state["done"])
+            self.documents = int(state.get("documents", 0))
+            self.errors = int(state.get("errors", 0))
+
+    def save(self) -> None:
+        state = {
+            "source": self.source,
+            "done": self.done,
+            "documents": self.documents,
+            "errors": self.errors,
+            "updated_at": time.time(),
+        }
+        _write_atomic(self.path, json.dumps(state, indent=2).encode("utf-8"))
+
+
+# -------------------------------------------------------
+# Driver
+# -------------------------------------------------------
+class _Progress:
+    def __init__(self, every: float) -> None:
+        self.every = every
+        self.t0 = self.last = time.perf_counter()
+        self.records = 0
+        self.documents = 0
+
+    def report(self, checkpoint: Checkpoint, force: bool = False) -> None:
+        now = time.perf_counter()
+        if not force and now - self.last < self.every:
+            return
+        self.last = now
+        elapsed = max(now - self.t0, 1e-9)
+        print(
+            f"➡ {checkpoint.done} records done, {checkpoint.documents} documents, {checkpoint.errors} errors"
+            f" | this run: {self.documents / elapsed:.1f} docs/s, {self.records / elapsed:.1f} records/s"
+        )
+
+
+def regenerate(
+    source: str | Path,
+    out_dir: str | Path,
+    cfg: Dict[str, Any],
+    documents: Tuple[str, ...] = RENDER_JOBS,
+    legal: str = "as-submitted",
+    workers: int = 0,
+    restart: bool = False,
+    progress_every: float = 5.0,
+    checkpoint_every: float = 2.0,
+) -> Dict[str, Any]:
+    if legal == "current":
+        from legal_registry import get_legal_registry
+
+        if not get_legal_registry(cfg).current:
+            raise SystemExit("❌ --legal current needs LEGAL_TEXT_SOURCE (legalTexts.js).")
+
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    files = input_files(source)
+    checkpoint = Checkpoint(out, [str(p.resolve()) for p in files], restart=restart)
+    workers = workers or os.cpu_count() or 1
+    progress = _Progress(progress_every)
+    if checkpoint.done:
+        print(f"➡ resuming after record {checkpoint.done}")
+
+    errors = open(out / ERRORS_NAME, "w" if restart or not checkpoint.done else "a", encoding="utf-8")
+    finished: Set[int] = set()  # completed records past checkpoint.done (bounded by the in-flight window)
+    last_saved = time.perf_counter()
+
+    def complete(index: int, key: str, written: int, error: Optional[str]) -> None:
+        nonlocal last_saved
+        progress.records += 1
+        progress.documents += written
+        checkpoint.documents += written
+        if error is not None:
+            checkpoint.errors += 1
+            errors.write(json.dumps({"record": index + 1, "key": key, "error": error}) + "\n")
+        finished.add(index)
+        while checkpoint.done in finished:
+            finished.discard(checkpoint.done)
+            checkpoint.done += 1
+        if time.perf_counter() - last_saved >= checkpoint_every:
+            errors.flush()
+            checkpoint.save()
+            last_saved = time.perf_counter()
+        progress.report(checkpoint)
+
+    records = iter_records(files)
+    pending = ((i, key, payload, error) for i, (key, payload, error) in enumerate(records) if i >= checkpoint.done)
+    pool: Optional[ProcessPoolExecutor] = None
+    try:
+        if workers <= 1:
+            _init_worker(cfg)
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            for i, key, payload, error in pending:
+                written = 0
+                if error is None:
+                    try:
+                        written = render_record(key, payload, str(out), documents, legal)
+                    except Exception as e:
+                        error = repr(e)
+                complete(i, key, written, error)
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(cfg,))
+            in_flight: Dict[Future, Tuple[int, str]] = {}
+            for i, key, payload, error in pending:
+                if error is not None:
+                    complete(i, key, 0, error)
+                    continue
+                in_flight[pool.submit(render_record, key, payload, str(out), documents, legal)] = (i, key)
+                while len(in_flight) >= workers * IN_FLIGHT_PER_WORKER:
+                    _collect(in_flight, complete)
+            while in_flight:
+                _collect(in_flight, complete)
+    except BrokenProcessPool as e:
+        print("❌ a render worker died; rerun to resume from the checkpoint:", repr(e))
+        raise SystemExit(1)
+    except KeyboardInterrupt:
+        print("⚠️ interrupted; rerun to resume from the checkpoint")
+        raise SystemExit(130)
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        errors.close()
+        checkpoint.save()
+        progress.report(checkpoint, force=True)
+
+    elapsed = time.perf_counter() - progress.t0
+    return {
+        "records": checkpoint.done,
+        "documents": checkpoint.documents,
+        "errors": checkpoint.errors,
+        "seconds": round(elapsed, 3),
+        "docs_per_second": round(progress.documents / max(elapsed, 1e-9), 1),
+    }
+
+
+def _collect(in_flight: Dict[Future, Tuple[int, str]], complete) -> None:
+    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+    for f in done:
+        i, key = in_flight.pop(f)
+        try:
+            complete(i, key, f.result(), None)
+        except BrokenProcessPool:
+            raise
+        except Exception as e:
+            complete(i, key, 0, repr(e))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from services import load_env_and_config
+
+    cfg = load_env_and_config()
+    ap = argparse.ArgumentParser(description="Regenerate application PDFs for stored payloads.")
+    ap.add_argument("source", help="JSONL file, or a directory of .jsonl/.json files")
+    ap.add_argument("-o", "--output", required=True, help="output directory (also holds the checkpoint)")
+    ap.add_argument("--documents", default=",".join(RENDER_JOBS), help=f"comma-separated subset of {','.join(RENDER_JOBS)}")
+    ap.add_argument(
+        "--legal", choices=("as-submitted", "current"), default="as-submitted",
+        help="legal texts the applicant saw (from LEGAL_TEXT_DIR), or the ones in LEGAL_TEXT_SOURCE now",
+    )
+    ap.add_argument("--workers", type=int, default=0, help="render processes; 0 = cpu_count, 1 = no pool")
+    ap.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    ap.add_argument("--progress", type=float, default=5.0, help="seconds between progress lines")
+    args = ap.parse_args(argv)
+
+    signal.signal(signal.SIGTERM, _on_sigterm)  # checkpoint on kill/timeout like on Ctrl-C
+    documents = tuple(d.strip() for d in args.documents.split(",") if d.strip())
+    unknown = [d for d in documents if d not in RENDER_JOBS]
+    if unknown or not documents:
+        ap.error(f"unknown documents: {', '.join(unknown) or '(none)'}")
+
+    summary = regenerate(
+        args.source, args.output, cfg,
+        documents=documents, legal=args.legal, workers=args.workers,
+        restart=args.restart, progress_every=args.progress,
+    )
+    print(
+        f"⏱ {summary['records']} records, {summary['documents']} documents, {summary['errors']} errors"
+        f" in {summary['seconds']:.1f}s ({summary['docs_per_second']} docs/s)"
+    )
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+# render_pool.py
+from __future__ import annotations
+
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional, Tuple
+
+from extract_pool import worker_context
+from profiling import active_profile
+
+# -------------------------------------------------------
+# Render executor
+#
+# The five application PDFs are independent ReportLab builds. ReportLab is
+# pure Python and holds the GIL, so real parallelism needs processes; a
+# thread pool is kept as an option for hosts where forking is not allowed.
+# The resume is converted on the calling thread while the pool is busy.
+#
+# The pool is created lazily (and again after BrokenProcessPool) from the
+# threaded server, so its workers come from forkserver or spawn like the
+# extraction sandbox's; RENDER_START_METHOD=fork is an explicit opt-in.
+# -------------------------------------------------------
+RENDER_JOBS = ("main", "eeo", "disability", "veteran", "drug")
+
+_EXECUTOR: Optional[Executor] = None
+_EXECUTOR_KEY: Optional[Tuple[str, int, str]] = None
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _builder(name: str):
+    import services
+
+    return {
+        "main": services.build_main_application_pdf,
+        "eeo": services.build_eeo_pdf,
+        "disability": services.build_disability_pdf,
+        "veteran": services.build_veteran_pdf,
+        "drug": services.build_alcohol_drug_pdf,
+    }[name]
+
+
+def _warm_worker() -> None:
+    """Pool initializer: import ReportLab and build the stylesheet once per worker."""
+    import services
+
+    services._styles()
+
+
+def _noop() -> int:
+    return os.getpid()
+
+
+def _render_one(
+    name: str,
+    payload: Dict[str, Any],
+    resume_bytes: Optional[Any] = None,
+    resume_filename: Optional[str] = None,
+    cfg: Optional[Dict[str, Any]] = None,
+) -> Tuple[str, bytes, float]:
+    t0 = time.perf_counter()
+    if name == "resume":
+        import services
+
+        pdf, _ = services.resume_to_pdf(resume_bytes or b"", resume_filename or "", cfg)
+    else:
+        pdf = _builder(name)(payload)
+    return name, pdf, time.perf_counter() - t0
+
+
+def _render_serial(
+    payload: Dict[str, Any],
+    resume_bytes: Optional[Any],
+    resume_filename: Optional[str],
+    jobs: Tuple[str, ...],
+    cfg: Optional[Dict[str, Any]] = None,
+) -> Tuple[Dict[str, bytes], Dict[str, float]]:
+    docs: Dict[str, bytes] = {}
+    timings: Dict[str, float] = {}
+    for name in jobs:
+        _, pdf, elapsed = _render_one(name, payload, resume_bytes, resume_filename, cfg)
+        docs[name] = pdf
+        timings[name] = elapsed
+    return docs, timings
+
+
+def _executor_settings(cfg: Dict[str, Any]) -> Tuple[str, int, str]:
+    mode = (cfg.get("RENDER_MODE") or "process").lower()
+    workers = int(cfg.get("RENDER_WORKERS") or 0) or min(len(RENDER_JOBS) + 1, os.cpu_count() or 1)
+    start_method = cfg.get("RENDER_START_METHOD") or ""
+    if mode not in {"process", "thread", "serial"}:
+        print(f"⚠️ Unknown RENDER_MODE={mode!r}; rendering serially.")
+        mode = "serial"
+    if workers <= 1:
+        mode = "serial"
+    return mode, workers, start_method
+
+
+def get_render_executor(cfg: Dict[str, Any]) -> Optional[Executor]:
+    """
+    Return the process-wide render executor, creating and warming it on first use.
+    Returns None when rendering should happen serially on the calling thread.
+    """
+    global _EXECUTOR, _EXECUTOR_KEY
+
+    key = _executor_settings(cfg)
+    mode, workers, start_method = key
+    if mode == "serial":
+        return None
+
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is not None and _EXECUTOR_KEY == key:
+            return _EXECUTOR
+        if _EXECUTOR is not None:
+            _EXECUTOR.shutdown(wait=False, cancel_futures=True)
+            _EXECUTOR = None
+
+        if mode == "thread":
+            executor: Executor = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix="pdf-render",
+                initializer=_warm_worker,
+            )
+        else:
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=worker_context(start_method),
+                initializer=_warm_worker,
+            )
+            # Spin every worker up now so the first submission doesn't pay for it.
+            for f in [executor.submit(_noop) for _ in range(workers)]:
+                f.result()
+
+        _EXECUTOR = executor
+        _EXECUTOR_KEY = key
+        return executor
+
+
+def shutdown_render_executor() -> None:
+    global _EXECUTOR, _EXECUTOR_KEY
+
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is not None:
+            _EXECUTOR.shutdown(wait=True, cancel_futures=True)
+        _EXECUTOR = None
+        _EXECUTOR_KEY = None
+
+
+def render_application_pdfs(
+    payload: Dict[str, Any],
+    cfg: Dict[str, Any],
+    resume_bytes: Optional[Any] = None,
+    resume_filename: Optional[str] = None,
+) -> Tuple[Dict[str, bytes], Dict[str, float]]:
+    """
+    Render all application PDFs, concurrently when an executor is configured.
+
+    Returns ({job name: pdf bytes}, {job name: seconds}). The "resume" entry is
+    only present when a resume was uploaded. Timings are measured inside the
+    worker, so they reflect the build itself and not queueing.
+    """
+    jobs: Tuple[str, ...] = RENDER_JOBS
+    if resume_bytes and resume_filename:
+        jobs = jobs + ("resume",)
+
+    try:
+        executor = get_render_executor(cfg)
+    except Exception as e:
+        print("⚠️ Render pool unavailable, rendering serially:", repr(e))
+        executor = None
+
+    if executor is None or active_profile() is not None:
+        # A profiled request renders on its own thread so the builders show up in the profile.
+        return _render_serial(payload, resume_bytes, resume_filename, jobs, cfg)
+
+    docs: Dict[str, bytes] = {}
+    timings: Dict[str, float] = {}
+    try:
+        futures = [executor.submit(_render_one, name, payload) for name in RENDER_JOBS]
+        if "resume" in jobs:
+            # The resume may be a spooled upload file (not picklable) and PDFs
+            # pass straight through, so it is handled on this thread while the
+            # pool works on the five forms.
+            _, docs["resume"], timings["resume"] = _render_one("resume", payload, resume_bytes, resume_filename, cfg)
+        for f in futures:
+            name, pdf, elapsed = f.result()
+            docs[name] = pdf
+            timings[name] = elapsed
+        return docs, timings
+    except BrokenProcessPool as e:
+        print("⚠️ Render pool broke, rendering serially:", repr(e))
+        shutdown_render_executor()
+        remaining = tuple(name for name in jobs if name not in docs)
+        more_docs, more_timings = _render_serial(payload, resume_bytes, resume_filename, remaining, cfg)
+        docs.update(more_docs)
+        timings.update(more_timings)
+        return docs, timings
@@ -0,0 +1,197 @@
+# resume_cache.py
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from uploads import ResumeData, iter_chunks
+
+# -------------------------------------------------------
+# Content-addressed resume cache
+#
+# Applicants upload the same file to /api/parse-resume and again with the
+# submission. Everything derived from a resume (extracted text, parsed
+# fields, the converted PDF) is keyed on the SHA-256 of its bytes, so the
+# second upload costs a hash. LLM autofill results are keyed on the hash of
+# the extracted text plus the model name. Two tiers: a per-process LRU bounded by
+# bytes, and an optional on-disk tier shared by all workers on the host.
+# -------------------------------------------------------
+KINDS = ("text", "parsed", "pdf", "autofill")
+
+
+def sha256_of(data: ResumeData) -> str:
+    h = hashlib.sha256()
+    for chunk in iter_chunks(data):
+        h.update(chunk)
+    return h.hexdigest()
+
+
+class ResumeCache:
+    def __init__(
+        self,
+        memory_bytes: int = 64 * 1024 * 1024,
+        disk_dir: Optional[str | Path] = None,
+        disk_bytes: int = 512 * 1024 * 1024,
+        ttl: float = 86400.0,
+    ) -> None:
+        self.memory_bytes = memory_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_bytes = disk_bytes
+        self.ttl = ttl
+
+        self._lru: "OrderedDict[Tuple[str, str], Tuple[float, bytes]]" = OrderedDict()
+        self._lru_size = 0
+        self._lock = threading.Lock()
+        self._disk_size = 0
+        self.counters: Dict[str, int] = {
+            f"{kind}_{event}": 0
+            for kind in KINDS
+            for event in ("memory_hits", "disk_hits", "misses")
+        }
+
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_size = sum(p.stat().st_size for p in self._disk_files())
+
+    # ---------------------------------------------------
+    # Public API
+    # ---------------------------------------------------
+    def get(self, kind: str, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            entry = self._lru.get((kind, key))
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._lru.move_to_end((kind, key))
+                    self.counters[f"{kind}_memory_hits"] += 1
+                    return value
+                self._drop((kind, key))
+
+        value = self._disk_get(kind, key, now)
+        if value is not None:
+            self._memory_put(kind, key, value, now)
+        with self._lock:
+            self.counters[f"{kind}_disk_hits" if value is not None else f"{kind}_misses"] += 1
+        return value
+
+    def put(self, kind: str, key: str, value: bytes) -> None:
+        now = time.time()
+        self._memory_put(kind, key, value, now)
+        self._disk_put(kind, key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self.counters)
+            out["memory_entries"] = len(self._lru)
+            out["memory_bytes"] = self._lru_size
+        out["disk_bytes"] = self._disk_size
+        return out
+
+    # ---------------------------------------------------
+    # Memory tier
+    # ---------------------------------------------------
+    def _drop(self, k: Tuple[str, str]) -> None:
+        _, value = self._lru.pop(k)
+        self._lru_size -= len(value)
+
+    def _memory_put(self, kind: str, key: str, value: bytes, now: float) -> None:
+        if len(value) > self.memory_bytes:
+            return
+        with self._lock:
+            if (kind, key) in self._lru:
+                self._drop((kind, key))
+            self._lru[(kind, key)] = (now + self.ttl, value)
+            self._lru_size += len(value)
+            while self._lru_size > self.memory_bytes:
+                self._drop(next(iter(self._lru)))
+
+    # ---------------------------------------------------
+    # Disk tier
+    # ---------------------------------------------------
+    def _path(self, kind: str, key: str) -> Path:
+        assert self.disk_dir is not None
+        return self.disk_dir / kind / key[:2] / key
+
+    def _disk_files(self):
+        assert self.disk_dir is not None
+        return (p for p in self.disk_dir.glob("*/*/*") if p.is_file() and not p.name.endswith(".tmp"))
+
+    def _disk_get(self, kind: str, key: str, now: float) -> Optional[bytes]:
+        if self.disk_dir is None:
+            return None
+        path = self._path(kind, key)
+        try:
+            st = path.stat()
+            if st.st_mtime + self.ttl <= now:
+                path.unlink(missing_ok=True)
+                self._disk_size -= st.st_size
+                return None
+            return path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _disk_put(self, kind: str, key: str, value: bytes) -> None:
+        if self.disk_dir is None or len(value) > self.disk_bytes:
+            return
+        path = self._path(kind, key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(value)
+            os.replace(tmp, path)  # atomic; concurrent writers of the same key write identical bytes
+        except OSError as e:
+            print("⚠️ resume cache disk write failed:", repr(e))
+            return
+        self._disk_size += len(value)
+        if self._disk_size > self.disk_bytes:
+            self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        # Other workers write to the same directory, so re-measure before evicting.
+        now = time.time()
+        entries = []
+        for p in self._disk_files():
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, p))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        target = int(self.disk_bytes * 0.9)
+        for mtime, size, p in entries:
+            if total <= target and mtime + self.ttl > now:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+        self._disk_size = total
+
+
+# -------------------------------------------------------
+# Process-wide cache
+# -------------------------------------------------------
+_CACHE: Optional[ResumeCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_resume_cache(cfg: Dict[str, Any]) -> Optional[ResumeCache]:
+    global _CACHE
+
+    if not cfg.get("RESUME_CACHE_ENABLED"):
+        return None
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ResumeCache(
+                memory_bytes=cfg["RESUME_CACHE_MEMORY_MB"] * 1024 * 1024,
+                disk_dir=cfg["RESUME_CACHE_DIR"] or None,
+                disk_bytes=cfg["RESUME_CACHE_DISK_MB"] * 1024 * 1024,
+                ttl=cfg["RESUME_CACHE_TTL"],
+            )
+        return _CACHE
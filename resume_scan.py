@@ -0,0 +1,387 @@
+# resume_scan.py
+from __future__ import annotations
+
+import re
+from typing import Any, Dict, List, Optional
+
+from autofill import normalize_autofill
+
+# -------------------------------------------------------
+# Rule-based resume scanner
+#
+# The fallback when LLM autofill is off or unavailable. One pass over the
+# text, line by line: a line is either a section heading (Experience,
+# Education, Skills, Certifications, References, ...) or is run once
+# through a single combined pattern (email | URL | phone | date range |
+# street | city, ST ZIP) and the hits are filed according to the current
+# section. The result has the same shape as normalize_autofill(), so
+# StepResume.applyAllToForm handles both paths the same way, plus `links`
+# and `certifications` lists.
+#
+# ResumeScanner.feed() takes the text in chunks (PDF pages), so lazy
+# extraction can stop as soon as `done` says later pages can't add much.
+# -------------------------------------------------------
+_STATES = (
+    "AL AK AZ AR CA CO CT DE DC FL GA HI ID IL IN IA KS KY LA ME MD MA MI MN MS MO MT NE NV NH NJ NM NY "
+    "NC ND OH OK OR PA RI SC SD TN TX UT VT VA WA WV WI WY GU PR VI AS MP"
+)
+_MONTH = r"(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)[a-z]*\.?"
+_WHEN = rf"(?:{_MONTH}\s+\d{{4}}|\d{{1,2}}/\d{{4}}|\d{{4}})"
+
+# The email and phone alternatives are the contact-only parser's patterns.
+_FIELD_RE = re.compile(
+    r"(?P<email>\b[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}\b)"
+    r"|(?P<url>\b(?:https?://|www\.)[^\s<>()\"']+|\b(?:linkedin\.com|github\.com)/[^\s<>()\"']+)"
+    rf"|(?P<dates>\b{_WHEN}\s*(?:-|–|—|to|thru|through)\s*(?:{_WHEN}|present|current|now)\b)"
+    r"|(?P<phone>(?:(?:\+?1[\s\-\.])?\(?\d{3}\)?[\s\-\.]?\d{3}[\s\-\.]?\d{4})(?:\s*(?:x|ext\.?)\s*\d+)?)"
+    r"|(?P<street>\b\d{1,6}\s+(?:[A-Za-z0-9'.-]+\s+){0,4}"
+    r"(?:St|Street|Ave|Avenue|Rd|Road|Blvd|Boulevard|Dr|Drive|Ln|Lane|Way|Pl|Place|Ct|Court|Hwy|Highway"
+    r"|Pkwy|Parkway|Loop|Cir|Circle|Ter|Terrace)\b\.?(?:,?\s*(?:#|Apt\.?|Suite|Ste\.?|Unit)\s*[\w-]+)?)"
+    rf"|(?P<place>\b(?-i:(?P<city>[A-Z][a-z'-]+(?:\s+[A-Z][a-z'-]+){{0,2}}),\s*(?P<state>{_STATES.replace(' ', '|')}))"
+    r"\b(?:\s+(?P<zip>\d{5}(?:-\d{4})?))?)"
+    r"|(?P<license>\bdriver'?’?s?\s+licen[cs]e\b)"
+    r"|(?P<year>\b(?:19|20)\d{2}\b)",
+    re.I,
+)
+
+# Most lines are prose with nothing _FIELD_RE can match. These checks each
+# scan for a single literal or character class, which the regex engine does
+# far faster than trying all of _FIELD_RE's alternatives at every position.
+_DIGIT_AT_RE = re.compile(r"[\d@]")
+_STATE_GATE_RE = re.compile(r",\s*[A-Z]{2}\b")
+
+
+def _may_have_fields(line: str) -> bool:
+    return bool(
+        _DIGIT_AT_RE.search(line) or "/" in line or "www." in line or "icen" in line or _STATE_GATE_RE.search(line)
+    )
+
+
+_HEADINGS = {
+    "experience": "experience", "work experience": "experience", "professional experience": "experience",
+    "employment": "experience", "employment history": "experience", "work history": "experience",
+    "relevant experience": "experience",
+    "education": "education", "education and training": "education", "academic background": "education",
+    "training": "education",
+    "skills": "skills", "technical skills": "skills", "computer skills": "skills", "core competencies": "skills",
+    "skills and abilities": "skills", "qualifications": "skills",
+    "certifications": "certifications", "certificates": "certifications", "licenses": "certifications",
+    "licenses and certifications": "certifications", "certifications and licenses": "certifications",
+    "references": "references", "professional references": "references",
+    "summary": "summary", "professional summary": "summary", "objective": "summary",
+    "career objective": "summary", "profile": "summary",
+}
+_SECTIONS = ("experience", "education", "skills", "certifications", "references")
+
+_BULLET_RE = re.compile(r"^\s*(?:[•\-\*▪◦·●‣]|o\s)\s*")
+_LABEL_RE = re.compile(r"^\s*(supervisor|manager|reason for leaving|cell|mobile)\s*[:\-]\s*(.+)$", re.I)
+_NAME_RE = re.compile(r"^[A-Z][A-Za-z'.-]*(?:\s+[A-Z][A-Za-z'.-]*){1,3}$")
+# "Geolabs, Inc." is one part; "Geolabs | Honolulu" and "Engineer, Geolabs" are two.
+_SPLIT_RE = re.compile(r"\s+(?:\||—|–|-|at|@)\s+|,\s+(?!(?:Inc|LLC|L\.L\.C|Ltd|LLP|Corp|Co)\b)|\t+")
+_SCHOOL_SPLIT_RE = re.compile(r"\s+[|—–-]\s+|\s*,\s*|\t+")
+_DEGREE_RE = re.compile(
+    r"(?:\b(?:B\.S\.|B\.A\.|M\.S\.|M\.A\.|A\.A\.S?\.?|A\.S\.)|\b(?:BS|BA|MS|MBA|Ph\.?D\.?|Bachelor|Master|Associate|Doctor)"
+    r"(?:'?s)?\b(?:\s+(?:of|in)\s+(?:Science|Arts))?)"
+    r"(?:(?:\s+(?:in|of)\s+|\s*[,\-–:]\s*|\s+)(?P<major>[A-Za-z&/ ]{3,60}))?"
+)
+_COMPANY_HINT = re.compile(
+    r"\b(?:Inc|LLC|L\.L\.C|Corp|Corporation|Company|Co|Ltd|LLP|Group|Associates|Partners|Consultants"
+    r"|Services|Department|Dept|County|City of|State of|University|Hospital|Laboratories|Labs)\b\.?",
+    re.I,
+)
+_TITLE_HINT = re.compile(
+    r"\b(?:Engineer|Manager|Technician|Assistant|Intern|Analyst|Specialist|Director|Coordinator|Supervisor"
+    r"|Clerk|Developer|Geologist|Driller|Operator|Lead|Representative|Consultant|Officer|Administrator"
+    r"|Inspector|Scientist|Drafter|Designer|Accountant|Receptionist|Helper|Laborer|Foreman|Estimator)s?\b",
+    re.I,
+)
+_SCHOOL_HINT = re.compile(r"\b(?:University|College|School|Institute|Academy|GED)\b", re.I)
+_HIGH_HINT = re.compile(r"\b(?:High School|GED|Secondary)\b", re.I)
+_TRADE_HINT = re.compile(
+    r"\b(?:Community College|Technical|Vocational|Trade|Apprentice\w*|Certificate|Institute|Academy)\b", re.I
+)
+
+_MAX_JOBS = 3
+_MAX_REFS = 3
+_MAX_SKILLS_CHARS = 500
+
+
+def _heading(line: str) -> Optional[str]:
+    if len(line) > 40:
+        return None
+    key = re.sub(r"[^a-z& ]+", "", line.lower().replace("&", "and")).strip()
+    return _HEADINGS.get(" ".join(key.split()))
+
+
+def _parts(text: str) -> List[str]:
+    return [p.strip(" .,;:|–—-") for p in _SPLIT_RE.split(text) if p and p.strip(" .,;:|–—-")]
+
+
+def _split_dates(dates: str) -> List[str]:
+    halves = re.split(r"\s*(?:-|–|—|\bto\b|\bthru\b|\bthrough\b)\s*", dates, maxsplit=1, flags=re.I)
+    return [h.strip() for h in halves] + [""] * (2 - len(halves))
+
+
+class ResumeScanner:
+    def __init__(self) -> None:
+        self.section = "header"
+        self.seen: set = set()
+        self.contact: Dict[str, Optional[str]] = {}
+        self.first_phone: Optional[str] = None  # fallback when no header/summary line has one
+        self.target_role: Optional[str] = None
+        self.jobs: List[Dict[str, Any]] = []
+        self.schools: List[Dict[str, Any]] = []
+        self.skills: List[str] = []
+        self.license: Optional[str] = None
+        self.certifications: List[str] = []
+        self.refs: List[Dict[str, Optional[str]]] = []
+        self.links: List[str] = []
+        self.jobs_full = False
+
+    @property
+    def done(self) -> bool:
+        """Contact is complete and every section has started; only the last one can still grow."""
+        return (
+            all(self.contact.get(k) for k in ("name", "email", "phone"))
+            and self.seen.issuperset(_SECTIONS)
+        )
+
+    def feed(self, text: str) -> bool:
+        for line in (text or "").splitlines():
+            self._line(line.strip())
+        return self.done
+
+    # -- per line ----------------------------------------------------------
+    def _line(self, line: str) -> None:
+        if not line:
+            if self.section == "experience" and self.jobs:
+                self.jobs[-1]["_closed"] = True
+            return
+        section = _heading(line)
+        if section is not None:
+            self.section = section
+            self.seen.add(section)
+            return
+
+        hits: Dict[str, str] = {}
+        if not _may_have_fields(line):
+            getattr(self, "_" + self.section)(line, line, hits)
+            return
+
+        rest = []
+        pos = 0
+        for m in _FIELD_RE.finditer(line):
+            kind = m.lastgroup if m.lastgroup not in ("city", "state", "zip") else "place"
+            if kind == "place":
+                hits.setdefault("city", m.group("city"))
+                hits.setdefault("state", m.group("state"))
+                if m.group("zip"):
+                    hits.setdefault("zip", m.group("zip"))
+            elif kind == "phone" and "phone" in hits:
+                hits.setdefault("phone2", m.group(0))
+            elif kind == "url":
+                if m.group(0) not in self.links:
+                    self.links.append(m.group(0).rstrip(".,;"))
+            hits.setdefault(kind, m.group(0))
+            if kind not in ("year", "license"):
+                rest.append(line[pos:m.start()])
+                pos = m.end()
+        rest.append(line[pos:])
+        plain = " ".join(" ".join(rest).split()).strip(" ,;:|–—-")
+
+        if "email" in hits and not self.contact.get("email"):
+            self.contact["email"] = hits["email"]
+        if "phone" in hits and self.first_phone is None:
+            self.first_phone = hits["phone"]
+        if "license" in hits and self.license is None:
+            self.license = _BULLET_RE.sub("", line)
+
+        getattr(self, "_" + self.section)(line, plain, hits)
+
+    def _header(self, line: str, plain: str, hits: Dict[str, str]) -> None:
+        label = _LABEL_RE.match(line)
+        if label and label.group(1).lower() in ("cell", "mobile") and "phone" in hits:
+            self.contact.setdefault("cell", hits["phone"])
+        elif "phone" in hits:
+            if not self.contact.get("phone"):
+                self.contact["phone"] = hits["phone"]
+                if "phone2" in hits:
+                    self.contact.setdefault("cell", hits["phone2"])
+            elif hits["phone"] != self.contact["phone"]:
+                self.contact.setdefault("cell", hits["phone"])
+        if "street" in hits:
+            self.contact.setdefault("address", hits["street"])
+        if "city" in hits:
+            for k in ("city", "state", "zip"):
+                if k in hits:
+                    self.contact.setdefault(k, hits[k])
+        if hits or not plain:
+            return
+        if not self.contact.get("name"):
+            if _NAME_RE.match(plain) and not _COMPANY_HINT.search(plain):
+                self.contact["name"] = plain
+        elif self.target_role is None and len(plain.split()) <= 6 and not any(c.isdigit() for c in plain):
+            self.target_role = plain
+
+    def _summary(self, line: str, plain: str, hits: Dict[str, str]) -> None:
+        if "phone" in hits and not self.contact.get("phone"):
+            self.contact["phone"] = hits["phone"]
+
+    def _experience(self, line: str, plain: str, hits: Dict[str, str]) -> None:
+        if self.jobs_full:
+            return
+        job = self.jobs[-1] if self.jobs else None
+        label = _LABEL_RE.match(line)
+        if job is not None and label and label.group(1).lower() in ("supervisor", "manager", "reason for leaving"):
+            key = "reasonForLeaving" if label.group(1).lower() == "reason for leaving" else "supervisor"
+            job.setdefault(key, label.group(2).strip())
+            return
+
+        bullet = _BULLET_RE.match(line)
+        if bullet and job is not None:
+            job["duties"].append(line[bullet.end():].strip())
+            return
+        if job is not None and not plain and "dates" not in hits:
+            # Only a place and/or phone: it belongs to the current job.
+            self._job_contact(job, hits)
+            return
+        if job is not None and not job.get("_closed") and "dates" not in hits and (
+            job.get("_para") or (not job["duties"] and job.get("company") and job.get("position"))
+        ):
+            # Duties written as a paragraph under a complete job header.
+            job["duties"].append(plain)
+            job["_para"] = True
+            return
+
+        # Otherwise a line of company / title / dates / place: it starts a new
+        # job unless the current one is still collecting its header lines.
+        if job is None or job["duties"] or job.get("_closed") or ("dates" in hits and job.get("dateFrom")):
+            if len(self.jobs) >= _MAX_JOBS:
+                self.jobs_full = True
+                return
+            job = {"duties": []}
+            self.jobs.append(job)
+        if "dates" in hits:
+            job["dateFrom"], job["dateTo"] = _split_dates(hits["dates"])
+        self._job_contact(job, hits)
+        for part in _parts(plain):
+            if "company" not in job and _COMPANY_HINT.search(part):
+                job["company"] = part
+            elif "position" not in job and _TITLE_HINT.search(part):
+                job["position"] = part
+            elif "company" not in job:
+                job["company"] = part
+            elif "position" not in job:
+                job["position"] = part
+
+    @staticmethod
+    def _job_contact(job: Dict[str, Any], hits: Dict[str, str]) -> None:
+        if "phone" in hits:
+            job.setdefault("phone", hits["phone"])
+        if "city" in hits:
+            job.setdefault("address", ", ".join(hits[k] for k in ("street", "city", "state") if k in hits))
+
+    def _education(self, line: str, plain: str, hits: Dict[str, str]) -> None:
+        school = self.schools[-1] if self.schools else None
+        is_school = bool(_SCHOOL_HINT.search(plain))
+        if school is None or (is_school and school.get("school")):
+            school = {}
+            self.schools.append(school)
+        text = _BULLET_RE.sub("", plain)
+        degree = _DEGREE_RE.search(text)
+        if degree:
+            school.setdefault("degree", degree.group(0))
+            if degree.group("major"):
+                school.setdefault("major", degree.group("major").strip())
+        if is_school:
+            name = next((p for p in _SCHOOL_SPLIT_RE.split(text) if _SCHOOL_HINT.search(p)), text)
+            school.setdefault("school", name)
+        if "dates" in hits:
+            school.setdefault("years", hits["dates"])
+        elif "year" in hits:
+            school.setdefault("years", hits["year"])
+
+    def _skills(self, line: str, plain: str, hits: Dict[str, str]) -> None:
+        if "license" in hits:
+            return
+        self.skills.extend(p for p in (s.strip() for s in re.split(r"[,;•|]", _BULLET_RE.sub("", line))) if p)
+
+    def _certifications(self, line: str, plain: str, hits: Dict[str, str]) -> None:
+        if "license" not in hits:
+            self.certifications.append(_BULLET_RE.sub("", line))
+
+    def _references(self, line: str, plain: str, hits: Dict[str, str]) -> None:
+        text = _BULLET_RE.sub("", plain)
+        if not self.refs and "upon request" in line.lower():
+            return
+        parts = _parts(text)
+        ref = self.refs[-1] if self.refs else None
+        if parts and _NAME_RE.match(parts[0]) and not _COMPANY_HINT.search(parts[0]) and (
+            ref is None or ref.get("company") or ref.get("phone")
+        ):
+            if len(self.refs) >= _MAX_REFS:
+                return
+            ref = {"name": parts.pop(0)}
+            self.refs.append(ref)
+        if ref is None:
+            return
+        if "phone" in hits:
+            ref.setdefault("phone", hits["phone"])
+        if parts and "company" not in ref:
+            ref["company"] = (
+                next((p for p in parts if _COMPANY_HINT.search(p)), None)
+                or next((p for p in parts if not _TITLE_HINT.search(p)), parts[0])
+            )
+
+    # -- result ------------------------------------------------------------
+    def _education_fields(self) -> Dict[str, Optional[str]]:
+        out: Dict[str, Optional[str]] = {}
+        for s in self.schools:
+            name = s.get("school") or s.get("degree")
+            if not name:
+                continue
+            if _HIGH_HINT.search(name):
+                kind = "high"
+            elif _TRADE_HINT.search(name) and not s.get("degree"):
+                kind = "trade"
+            else:
+                kind = "graduate"
+            if out.get(kind):
+                continue
+            out[kind] = name
+            out[kind + "Years"] = s.get("years")
+            out[kind + "Major"] = s.get("major") or (s.get("degree") if s.get("school") else None)
+        return out
+
+    def result(self) -> Dict[str, Any]:
+        contact = dict(self.contact)
+        if not contact.get("phone") and self.first_phone:
+            contact["phone"] = self.first_phone
+        if contact.get("city") and contact.get("state"):
+            contact["location"] = f"{contact['city']}, {contact['state']}"
+        jobs = [
+            {**{k: v for k, v in j.items() if not k.startswith("_")}, "duties": "\n".join(j["duties"]) or None}
+            for j in self.jobs
+        ]
+        parsed = normalize_autofill(
+            {
+                "contact": contact,
+                "targetRole": self.target_role,
+                "employment": jobs,
+                "education": self._education_fields(),
+                "skills": {
+                    "computerSkills": ", ".join(self.skills)[:_MAX_SKILLS_CHARS] or None,
+                    "driverLicense": self.license,
+                },
+                "references": self.refs,
+            }
+        )
+        parsed["certifications"] = self.certifications
+        parsed["links"] = self.links
+        return parsed
+
+
+def scan_resume(text: str) -> Dict[str, Any]:
+    scanner = ResumeScanner()
+    scanner.feed(text)
+    return scanner.result()
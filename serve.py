@@ -0,0 +1,124 @@
+# serve.py
+from __future__ import annotations
+
+import argparse
+import gc
+import os
+import time
+from typing import Any, Dict
+
+# -------------------------------------------------------
+# Production entry point
+#
+#   python serve.py                       # WEB_SERVER (gunicorn on POSIX, else waitress)
+#   python serve.py --server waitress --threads 16
+#   python serve.py --workers 4 --threads 8 --port 8000
+#
+# gunicorn runs pre-forked gthread workers. The app is built and warmed
+# (ReportLab styles and fonts, pypdf) once in the master before
+# forking, then gc.freeze() moves everything allocated so far out of the
+# collector's reach so workers keep sharing those pages copy-on-write.
+# Anything that owns threads or child processes (render pool, extraction
+# sandbox, submission queue, SMTP sessions) is started per worker after the fork.
+#
+# Each gunicorn worker has its own render pool, so the PDF processes on a
+# host are WEB_WORKERS x RENDER_WORKERS; size them together.
+#
+# waitress is single-process and multi-threaded (also runs on Windows).
+# `python app.py` is still the Flask debug server for development.
+# -------------------------------------------------------
+
+
+def _workers(cfg: Dict[str, Any]) -> int:
+    return cfg["WEB_WORKERS"] or min(4, os.cpu_count() or 1)
+
+
+def preload(cfg: Dict[str, Any]):
+    from app import create_app
+    from services import warm_up
+
+    t0 = time.perf_counter()
+    application = create_app(cfg)
+    warm_up(cfg)
+    gc.collect()
+    gc.freeze()
+    print(f"⏱ preload: app built and warmed in {(time.perf_counter() - t0) * 1000:.0f}ms")
+    return application
+
+
+def serve_gunicorn(application, cfg: Dict[str, Any]) -> None:
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        raise SystemExit("❌ gunicorn is not installed (pip install gunicorn), or use --server waitress.")
+
+    from services import init_worker
+
+    def post_worker_init(worker) -> None:
+        init_worker(cfg)
+
+    options = {
+        "bind": f"{cfg['WEB_HOST']}:{cfg['WEB_PORT']}",
+        "workers": _workers(cfg),
+        "worker_class": "gthread",
+        "threads": cfg["WEB_THREADS"],
+        "timeout": cfg["WEB_TIMEOUT"],
+        "preload_app": True,
+        "post_worker_init": post_worker_init,
+    }
+
+    class _Server(BaseApplication):
+        def load_config(self) -> None:
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return application
+
+    _Server().run()
+
+
+def serve_waitress(application, cfg: Dict[str, Any]) -> None:
+    try:
+        from waitress import serve
+    except ImportError:
+        raise SystemExit("❌ waitress is not installed (pip install waitress).")
+
+    from services import init_worker
+
+    init_worker(cfg)
+    serve(application, host=cfg["WEB_HOST"], port=cfg["WEB_PORT"], threads=cfg["WEB_THREADS"])
+
+
+def main() -> None:
+    from services import load_env_and_config
+
+    cfg = load_env_and_config()
+
+    ap = argparse.ArgumentParser(description="Run the Geolabs employment API.")
+    ap.add_argument("--server", choices=("gunicorn", "waitress"), default=cfg["WEB_SERVER"])
+    ap.add_argument("--host", default=cfg["WEB_HOST"])
+    ap.add_argument("--port", type=int, default=cfg["WEB_PORT"])
+    ap.add_argument("--workers", type=int, default=cfg["WEB_WORKERS"], help="gunicorn only; 0 = min(4, cpu_count)")
+    ap.add_argument("--threads", type=int, default=cfg["WEB_THREADS"])
+    ap.add_argument("--timeout", type=int, default=cfg["WEB_TIMEOUT"], help="gunicorn worker timeout (s)")
+    args = ap.parse_args()
+
+    cfg.update(
+        WEB_SERVER=args.server,
+        WEB_HOST=args.host,
+        WEB_PORT=args.port,
+        WEB_WORKERS=args.workers,
+        WEB_THREADS=args.threads,
+        WEB_TIMEOUT=args.timeout,
+    )
+
+    application = preload(cfg)
+    if cfg["WEB_SERVER"] == "waitress":
+        serve_waitress(application, cfg)
+    else:
+        serve_gunicorn(application, cfg)
+
+
+if __name__ == "__main__":
+    main()
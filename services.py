@@ -3,30 +3,39 @@ from __future__ import annotations
 
 import io
 import json
+import mimetypes
 import os
 import re
 import smtplib
+import threading
+import time
 from email.message import EmailMessage
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
 
-import docx
-from pypdf import PdfReader
-from reportlab.lib.pagesizes import LETTER
 from reportlab.lib.units import inch
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.platypus import (
-    SimpleDocTemplate,
-    Paragraph,
-    Spacer,
-    Table,
-    TableStyle,
-    PageBreak,
-)
 
-import google.generativeai as genai
-from google.api_core.exceptions import PermissionDenied
+from archive import get_archive
+from autofill import AutofillUnavailable, get_autofill
+from docx_text import extract_docx_text
+from extract_pool import get_extract_pool, run_extraction
+from idempotency import fingerprint, get_idempotency_store, submission_key
+from legal_registry import get_legal_registry, text_version
+from mail_routing import (
+    DigestSpool, Route, digest_attachments, digest_body, digest_subject, get_digest_spool, get_mail_router,
+)
+from metrics import ATTACHMENT_BYTES, ERRORS, MAIL_APPLICATIONS, MAIL_MESSAGES, RESUME_PDF_BYTES, STAGE_SECONDS
+from mime_stream import StreamingMessage
+from profiling import PROFILE_MARKER, active_profile, get_request_profiler, valid_profile_id
+from readiness import get_readiness_prober
+from render_pool import get_render_executor, render_application_pdfs
+from resume_cache import ResumeCache, get_resume_cache, sha256_of
+from resume_scan import ResumeScanner, scan_resume
+from smtp_pool import get_smtp_pool
+from uploads import ResumeData, buffer_of, close_buffer, data_size, open_binary, read_text
+from submission_queue import PermanentJobError, SubmissionQueue, get_submission_queue
 
 # -------------------------------------------------------
 # Env loading + config
@@ -42,9 +51,7 @@ def load_env_and_config() -> Dict[str, Any]:
     gemini_key = os.getenv("GEMINI_API_KEY", "")
     gemini_model = os.getenv("GEMINI_MODEL", "gemini-2.5-pro")
 
-    if gemini_key:
-        genai.configure(api_key=gemini_key)
-    else:
+    if not gemini_key:
         print("⚠️ GEMINI_API_KEY not set – resume autofill will use regex fallback.")
 
     return {
@@ -58,6 +65,123 @@ def load_env_and_config() -> Dict[str, Any]:
         "SMTP_USER": os.getenv("SMTP_USER", ""),
         "SMTP_PASS": os.getenv("SMTP_PASS", ""),
         "SMTP_USE_TLS": os.getenv("SMTP_USE_TLS", "true").lower() in {"1", "true", "yes"},
+        # PDF rendering: "process" (default), "thread" or "serial"
+        "RENDER_MODE": os.getenv("RENDER_MODE", "process").lower(),
+        "RENDER_WORKERS": int(os.getenv("RENDER_WORKERS", "0")),  # 0 = min(6, cpu_count)
+        "RENDER_START_METHOD": os.getenv("RENDER_START_METHOD", ""),  # empty = forkserver (else spawn); "fork" opt-in
+        # LLM autofill (Gemini); falls back to regex when off, slow or failing
+        "AUTOFILL_ENABLED": os.getenv("AUTOFILL_ENABLED", "true").lower() in {"1", "true", "yes"},
+        "AUTOFILL_TIMEOUT": float(os.getenv("AUTOFILL_TIMEOUT", "8")),
+        "AUTOFILL_MAX_CHARS": int(os.getenv("AUTOFILL_MAX_CHARS", "30000")),
+        "AUTOFILL_MAX_CONCURRENCY": int(os.getenv("AUTOFILL_MAX_CONCURRENCY", "4")),
+        "AUTOFILL_BREAKER_FAILURES": int(os.getenv("AUTOFILL_BREAKER_FAILURES", "3")),
+        "AUTOFILL_BREAKER_RESET": float(os.getenv("AUTOFILL_BREAKER_RESET", "60")),
+        # Async submission spool (202 + background send)
+        "SUBMIT_QUEUE_ENABLED": os.getenv("SUBMIT_QUEUE_ENABLED", "true").lower() in {"1", "true", "yes"},
+        "SUBMIT_SPOOL_PATH": os.getenv(
+            "SUBMIT_SPOOL_PATH", str(Path(__file__).resolve().parent / "spool" / "submissions.db")
+        ),
+        "SUBMIT_QUEUE_WORKERS": int(os.getenv("SUBMIT_QUEUE_WORKERS", "2")),
+        "SUBMIT_MAX_ATTEMPTS": int(os.getenv("SUBMIT_MAX_ATTEMPTS", "8")),
+        "SUBMIT_BACKOFF_BASE": float(os.getenv("SUBMIT_BACKOFF_BASE", "5")),
+        "SUBMIT_BACKOFF_MAX": float(os.getenv("SUBMIT_BACKOFF_MAX", "900")),
+        # Uploads: whole-request cap, per-type caps enforced while streaming, spill-to-disk threshold
+        "MAX_CONTENT_LENGTH": int(os.getenv("MAX_CONTENT_LENGTH", str(16 * 1024 * 1024))),
+        "UPLOAD_MAX_BYTES": {
+            ".pdf": int(os.getenv("UPLOAD_MAX_BYTES_PDF", str(10 * 1024 * 1024))),
+            ".doc": int(os.getenv("UPLOAD_MAX_BYTES_DOC", str(10 * 1024 * 1024))),
+            ".docx": int(os.getenv("UPLOAD_MAX_BYTES_DOC", str(10 * 1024 * 1024))),
+            ".txt": int(os.getenv("UPLOAD_MAX_BYTES_TXT", str(2 * 1024 * 1024))),
+        },
+        "UPLOAD_SPOOL_THRESHOLD": int(os.getenv("UPLOAD_SPOOL_THRESHOLD", str(512 * 1024))),
+        # Content-addressed resume cache (text / parsed fields / converted PDF)
+        "RESUME_CACHE_ENABLED": os.getenv("RESUME_CACHE_ENABLED", "true").lower() in {"1", "true", "yes"},
+        "RESUME_CACHE_MEMORY_MB": int(os.getenv("RESUME_CACHE_MEMORY_MB", "64")),
+        "RESUME_CACHE_DIR": os.getenv("RESUME_CACHE_DIR", ""),  # empty = memory tier only
+        "RESUME_CACHE_DISK_MB": int(os.getenv("RESUME_CACHE_DISK_MB", "512")),
+        "RESUME_CACHE_TTL": float(os.getenv("RESUME_CACHE_TTL", "86400")),
+        # Pooled SMTP sessions
+        "SMTP_POOL_SIZE": int(os.getenv("SMTP_POOL_SIZE", "4")),
+        "SMTP_IDLE_TIMEOUT": float(os.getenv("SMTP_IDLE_TIMEOUT", "60")),
+        "SMTP_MAX_MESSAGES_PER_SESSION": int(os.getenv("SMTP_MAX_MESSAGES_PER_SESSION", "100")),
+        # Stream attachments to DATA as they are base64'd (mime_stream.py) instead of building an EmailMessage
+        "SMTP_STREAM_MIME": os.getenv("SMTP_STREAM_MIME", "true").lower() in {"1", "true", "yes"},
+        # Mailbox routing by position/location and digest batching (mail_routing.py).
+        # The MAIL_DIGEST_* values are the defaults for routes with "digest": true,
+        # and MAIL_DIGEST_ENABLED makes the default route (APPLICATION_MAIL_TO) a digest route
+        "MAIL_ROUTES_PATH": os.getenv("MAIL_ROUTES_PATH", ""),  # empty = everything to APPLICATION_MAIL_TO
+        "MAIL_DIGEST_ENABLED": os.getenv("MAIL_DIGEST_ENABLED", "false").lower() in {"1", "true", "yes"},
+        "MAIL_DIGEST_WINDOW": float(os.getenv("MAIL_DIGEST_WINDOW", "3600")),
+        "MAIL_DIGEST_MAX_COUNT": int(os.getenv("MAIL_DIGEST_MAX_COUNT", "25")),
+        "MAIL_DIGEST_MAX_BYTES": int(os.getenv("MAIL_DIGEST_MAX_BYTES", str(20 * 1024 * 1024))),
+        "MAIL_DIGEST_ZIP": os.getenv("MAIL_DIGEST_ZIP", "false").lower() in {"1", "true", "yes"},
+        "MAIL_DIGEST_SPOOL_PATH": os.getenv(
+            "MAIL_DIGEST_SPOOL_PATH", str(Path(__file__).resolve().parent / "spool" / "digests.db")
+        ),
+        "MAIL_DIGEST_MAX_ATTEMPTS": int(os.getenv("MAIL_DIGEST_MAX_ATTEMPTS", "8")),  # then the batch is marked failed
+        # Opt-in cProfile of parse-resume / submit-application (profiling.py): X-Profile: 1
+        # from an allowlisted client, or a random sample; off = the views are not even wrapped
+        "PROFILE_ENABLED": os.getenv("PROFILE_ENABLED", "false").lower() in {"1", "true", "yes"},
+        "PROFILE_ALLOWLIST": os.getenv("PROFILE_ALLOWLIST", "127.0.0.1,::1"),  # IPs / CIDRs
+        "PROFILE_SAMPLE_RATE": float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+        "PROFILE_DIR": os.getenv("PROFILE_DIR", str(Path(__file__).resolve().parent / "spool" / "profiles")),
+        "PROFILE_MAX_DUMPS": int(os.getenv("PROFILE_MAX_DUMPS", "200")),
+        # Production server (serve.py): "gunicorn" (pre-fork) or "waitress" (threads only)
+        "WEB_SERVER": os.getenv("WEB_SERVER", "gunicorn" if os.name == "posix" else "waitress").lower(),
+        "WEB_HOST": os.getenv("WEB_HOST", "0.0.0.0"),
+        "WEB_PORT": int(os.getenv("WEB_PORT", "5001")),
+        "WEB_WORKERS": int(os.getenv("WEB_WORKERS", "0")),  # 0 = min(4, cpu_count)
+        "WEB_THREADS": int(os.getenv("WEB_THREADS", "8")),
+        "WEB_TIMEOUT": int(os.getenv("WEB_TIMEOUT", "120")),
+        # Resume extraction/conversion sandbox (extract_pool.py): "process" or "inline"
+        "EXTRACT_MODE": os.getenv("EXTRACT_MODE", "process").lower(),
+        "EXTRACT_WORKERS": int(os.getenv("EXTRACT_WORKERS", "2")),
+        "EXTRACT_MEMORY_MB": int(os.getenv("EXTRACT_MEMORY_MB", "512")),
+        "EXTRACT_CPU_SECONDS": int(os.getenv("EXTRACT_CPU_SECONDS", "10")),
+        "EXTRACT_TIMEOUT": float(os.getenv("EXTRACT_TIMEOUT", "15")),
+        "EXTRACT_MAX_JOBS": int(os.getenv("EXTRACT_MAX_JOBS", "50")),
+        # Worker start method; empty = forkserver (spawn where unavailable). "fork" only when set explicitly
+        "EXTRACT_START_METHOD": os.getenv("EXTRACT_START_METHOD", ""),
+        # /api/parse-resume on PDFs: "lazy" stops reading pages once the resume
+        # scanner has every section or a budget is spent; "full" extracts every page
+        "PARSE_PDF_MODE": os.getenv("PARSE_PDF_MODE", "lazy").lower(),
+        "PARSE_PDF_MAX_PAGES": int(os.getenv("PARSE_PDF_MAX_PAGES", "3")),
+        "PARSE_MAX_CHARS": int(os.getenv("PARSE_MAX_CHARS", "20000")),
+        # Uploaded PDF resumes over this size are compressed (pdf_compress.py); 0 = attach as-is
+        "RESUME_PDF_BUDGET_BYTES": int(os.getenv("RESUME_PDF_BUDGET_BYTES", str(5 * 1024 * 1024))),
+        # Admission control for parse-resume / submit-application (admission.py):
+        # running requests per process (0 = cpu_count), waiters, and per-IP rate
+        "ADMISSION_ENABLED": os.getenv("ADMISSION_ENABLED", "true").lower() in {"1", "true", "yes"},
+        "ADMISSION_MAX_WAIT": float(os.getenv("ADMISSION_MAX_WAIT", "10")),
+        "PARSE_MAX_CONCURRENCY": int(os.getenv("PARSE_MAX_CONCURRENCY", "0")),
+        "PARSE_MAX_QUEUE": int(os.getenv("PARSE_MAX_QUEUE", "16")),
+        "PARSE_RATE_PER_MINUTE": float(os.getenv("PARSE_RATE_PER_MINUTE", "20")),  # 0 = no per-IP limit
+        "PARSE_RATE_BURST": int(os.getenv("PARSE_RATE_BURST", "5")),
+        "SUBMIT_MAX_CONCURRENCY": int(os.getenv("SUBMIT_MAX_CONCURRENCY", "0")),
+        "SUBMIT_MAX_QUEUE": int(os.getenv("SUBMIT_MAX_QUEUE", "16")),
+        "SUBMIT_RATE_PER_MINUTE": float(os.getenv("SUBMIT_RATE_PER_MINUTE", "6")),
+        "SUBMIT_RATE_BURST": int(os.getenv("SUBMIT_RATE_BURST", "3")),
+        "TRUSTED_PROXY_COUNT": int(os.getenv("TRUSTED_PROXY_COUNT", "0")),  # proxies appending X-Forwarded-For
+        # /api/ready background probes (readiness.py)
+        "READY_PROBE_INTERVAL": float(os.getenv("READY_PROBE_INTERVAL", "10")),
+        "READY_SMTP_INTERVAL": float(os.getenv("READY_SMTP_INTERVAL", "60")),
+        "READY_SMTP_TIMEOUT": float(os.getenv("READY_SMTP_TIMEOUT", "5")),
+        "READY_MAX_QUEUED": int(os.getenv("READY_MAX_QUEUED", "100")),
+        "READY_MIN_FREE_MB": int(os.getenv("READY_MIN_FREE_MB", "256")),
+        # Dedup of retried submissions (Idempotency-Key header or payload hash)
+        "IDEMPOTENCY_TTL": float(os.getenv("IDEMPOTENCY_TTL", "86400")),
+        "IDEMPOTENCY_MAX_ENTRIES": int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000")),
+        # Local archive of sent applications (archive.py), opt-in; ARCHIVE_API_TOKEN
+        # enables the /api/archive endpoints (Authorization: Bearer <token>)
+        "ARCHIVE_ENABLED": os.getenv("ARCHIVE_ENABLED", "false").lower() in {"1", "true", "yes"},
+        "ARCHIVE_DIR": os.getenv("ARCHIVE_DIR", str(Path(__file__).resolve().parent / "spool" / "archive")),
+        "ARCHIVE_API_TOKEN": os.getenv("ARCHIVE_API_TOKEN", ""),
+        "ARCHIVE_RETENTION_DAYS": float(os.getenv("ARCHIVE_RETENTION_DAYS", "365")),  # 0 = keep indefinitely
+        # Legal text registry: clients send legalVersion ids instead of the full text
+        "LEGAL_TEXT_SOURCE": os.getenv(
+            "LEGAL_TEXT_SOURCE", str(Path(__file__).resolve().parent / "src" / "legal" / "legalTexts.js")
+        ),
+        "LEGAL_TEXT_DIR": os.getenv("LEGAL_TEXT_DIR", str(Path(__file__).resolve().parent / "spool" / "legal")),
         "CORS_ORIGINS": [
             "https://www.geolabs-employment.net",
             "https://geolabs-employment.net",
@@ -66,6 +190,40 @@ def load_env_and_config() -> Dict[str, Any]:
         ],
     }
 
+# -------------------------------------------------------
+# Warm-up (optional; for pre-fork servers)
+# -------------------------------------------------------
+def warm_up(cfg: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Import the heavy dependencies that are otherwise loaded on first use.
+    Call once in the master of a pre-fork server so workers share the pages.
+    """
+    _styles()
+    import pypdf  # noqa: F401
+
+    if cfg:
+        get_legal_registry(cfg)
+    if cfg and cfg.get("GEMINI_API_KEY") and cfg.get("AUTOFILL_ENABLED"):
+        import google.generativeai  # noqa: F401
+
+def init_worker(cfg: Dict[str, Any]) -> None:
+    """
+    Start the per-process pieces that must not exist before a fork (render
+    pool processes, submission queue threads, readiness probes). Call in
+    each server worker after forking; otherwise they are created on first use.
+    """
+    get_render_executor(cfg)
+    pool = get_extract_pool(cfg)
+    if pool is not None:
+        pool.start()
+    if cfg.get("SUBMIT_QUEUE_ENABLED"):
+        # Also resumes jobs spooled before a restart without waiting for a new submission.
+        get_application_queue(cfg)
+    if get_mail_router(cfg).digests:
+        # Likewise flushes digests left pending by the previous process.
+        _digest_spool(cfg)
+    get_readiness_prober(cfg)
+
 # -------------------------------------------------------
 # Constants
 # -------------------------------------------------------
@@ -80,66 +238,158 @@ def get_extension(filename: str) -> str:
         return ""
     return "." + filename.rsplit(".", 1)[-1].lower()
 
-def extract_text_from_pdf(file_storage) -> str:
-    reader = PdfReader(file_storage.stream)
-    pages: List[str] = []
+def iter_pdf_pages(data: ResumeData) -> Iterator[str]:
+    """Page texts in order; each page is parsed only when the consumer asks for it."""
+    from pypdf import PdfReader
+
+    reader = PdfReader(open_binary(data))
     for page in reader.pages:
-        pages.append(page.extract_text() or "")
-    return "\n\n".join(pages)
+        yield page.extract_text() or ""
+
+def extract_text_from_pdf(file_storage) -> str:
+    return "\n\n".join(iter_pdf_pages(file_storage.stream))
 
 def extract_text_from_docx(file_storage) -> str:
-    file_bytes = file_storage.read()
-    stream = io.BytesIO(file_bytes)
-    document = docx.Document(stream)
-    paragraphs = [p.text for p in document.paragraphs if p.text.strip()]
-    return "\n".join(paragraphs)
+    return extract_docx_text(file_storage.stream)
 
 def extract_text_from_txt(file_storage) -> str:
-    data = file_storage.read()
-    try:
-        return data.decode("utf-8", errors="ignore")
-    except Exception:
-        return data.decode("latin-1", errors="ignore")
+    return read_text(file_storage.stream)
 
-def extract_text_from_file(file_storage) -> str:
-    ext = get_extension(file_storage.filename)
+def _extract_text_unsandboxed(data: ResumeData, filename: str) -> str:
+    ext = get_extension(filename)
     if ext == ".pdf":
-        return extract_text_from_pdf(file_storage)
+        return "\n\n".join(iter_pdf_pages(data))
     if ext in {".doc", ".docx"}:
-        return extract_text_from_docx(file_storage)
+        return extract_docx_text(data)
     if ext == ".txt":
-        return extract_text_from_txt(file_storage)
+        return read_text(data)
     raise ValueError(f"Unsupported file type: {ext or 'unknown'}")
 
+def extract_text_from_file(file_storage, cfg: Optional[Dict[str, Any]] = None) -> str:
+    """With cfg, PDF/DOCX parsing runs in the extraction sandbox (see extract_pool.py)."""
+    if get_extension(file_storage.filename) == ".txt":
+        return extract_text_from_txt(file_storage)
+    return run_extraction(cfg, "text", file_storage.stream, file_storage.filename)
+
+def _resume_key(data: ResumeData, ext: str) -> str:
+    # Same bytes under a different extension extract differently.
+    return f"{sha256_of(data)}{ext}"
+
+def _extract_text_cached(
+    file_storage, cfg: Dict[str, Any], cache: Optional[ResumeCache], key: Optional[str]
+) -> str:
+    if cache is not None and key is not None:
+        hit = cache.get("text", key)
+        if hit is not None:
+            return hit.decode("utf-8")
+    with STAGE_SECONDS.time(stage="extract", detail=get_extension(file_storage.filename)):
+        text = extract_text_from_file(file_storage, cfg)
+    if cache is not None and key is not None:
+        cache.put("text", key, text.encode("utf-8"))
+    return text
+
+def resume_cache_stats(cfg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    cache = get_resume_cache(cfg)
+    return cache.stats() if cache is not None else None
+
+def autofill_state(cfg: Dict[str, Any]) -> Optional[str]:
+    """Circuit-breaker state of the LLM autofill client, or None when it is off."""
+    client = get_autofill(cfg, get_resume_cache(cfg))
+    return client.breaker.state if client is not None else None
+
 # -------------------------------------------------------
-# Minimal resume parsing kept (unchanged from your current version)
+# Resume parsing: LLM autofill when available, rule-based scan otherwise (resume_scan.py)
 # -------------------------------------------------------
-_EMAIL_RE = re.compile(r"\b[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}\b", re.I)
-_PHONE_RE = re.compile(
-    r"(?:(?:\+?1[\s\-\.])?\(?\d{3}\)?[\s\-\.]?\d{3}[\s\-\.]?\d{4})(?:\s*(?:x|ext\.?)\s*\d+)?",
-    re.I,
-)
+def _extract_pdf_prefix(
+    data: ResumeData,
+    filename: str,
+    max_chars: int,
+    max_pages: Optional[int] = None,
+    stop_when_found: bool = True,
+) -> Tuple[str, int, Dict[str, Any]]:
+    """
+    Read PDF pages only as far as needed: until the resume scanner is done
+    (when stop_when_found), `max_pages` pages, or `max_chars` characters.
+    Leading pages without text (cover images) don't count against the budget.
+    Returns (text so far, pages read, scan result for that text).
+    """
+    scan = ResumeScanner()
+    pages: List[str] = []
+    chars = 0
+    for page_text in iter_pdf_pages(data):
+        # The blank line the pages are joined with below (it closes an open job).
+        done = scan.feed("\n\n" + page_text if pages else page_text)
+        pages.append(page_text)
+        chars += len(page_text.strip())
+        if not chars:
+            continue
+        if (stop_when_found and done) or chars >= max_chars or (max_pages and len(pages) >= max_pages):
+            break
+    return "\n\n".join(pages), len(pages), scan.result()
+
+def _extract_pdf_lazy(
+    file_storage, cfg: Dict[str, Any], max_chars: int, **kwargs: Any
+) -> Tuple[str, int, Dict[str, Any]]:
+    with STAGE_SECONDS.time(stage="extract", detail=".pdf-lazy"):
+        return run_extraction(
+            cfg, "pdf_prefix", file_storage.stream, file_storage.filename, max_chars=max_chars, **kwargs
+        )
 
 def parse_resume_file(file_storage, cfg: Dict[str, Any]) -> Dict[str, Any]:
     ext = get_extension(file_storage.filename)
     if ext not in ALLOWED_EXTENSIONS:
         raise ValueError(f"Unsupported file type: {ext}")
 
-    text = extract_text_from_file(file_storage)
+    cache = get_resume_cache(cfg)
+    autofill = get_autofill(cfg, cache)
+    # Only the regex result is stable enough to cache per file; LLM results
+    # are cached inside Autofill on (text hash, model).
+    key = _resume_key(file_storage.stream, ext) if cache is not None else None
+    if cache is not None and autofill is None:
+        hit = cache.get("parsed", f"{key}-scan")
+        if hit is not None:
+            result = json.loads(hit)
+            result["meta"]["filename"] = file_storage.filename
+            return result
+
+    pages_read: Optional[int] = None
+    if ext == ".pdf" and cfg["PARSE_PDF_MODE"] == "lazy":
+        # Not stored in the text cache: it may be a prefix of the document.
+        # The worker already scanned the pages it read; that result is reused.
+        if autofill is not None:
+            # The model wants as much of the resume as it is sent, no more.
+            text, pages_read, simple = _extract_pdf_lazy(
+                file_storage, cfg, cfg["AUTOFILL_MAX_CHARS"], stop_when_found=False
+            )
+        else:
+            text, pages_read, simple = _extract_pdf_lazy(
+                file_storage, cfg, cfg["PARSE_MAX_CHARS"], max_pages=cfg["PARSE_PDF_MAX_PAGES"]
+            )
+    else:
+        text = _extract_text_cached(file_storage, cfg, cache, key)
+        simple = scan_resume(text)
     if not text.strip():
         raise ValueError("Could not extract text from resume.")
 
-    # Keep this endpoint behavior stable for now
-    email = _EMAIL_RE.search(text or "")
-    phone = _PHONE_RE.search(text or "")
-    parsed = {
-        "contact": {
-            "email": email.group(0) if email else None,
-            "phone": phone.group(0) if phone else None,
-        }
-    }
-
-    return {"parsed": parsed, "meta": {"filename": file_storage.filename, "mode": "simple"}}
+    meta_extra = {"pages_read": pages_read} if pages_read is not None else {}
+    if autofill is not None:
+        try:
+            parsed = autofill.parse(text)
+        except AutofillUnavailable as e:
+            print("⚠️ autofill unavailable, using regex fallback:", e)
+        else:
+            # The regex hits are reliable; keep them when the model missed.
+            for field in ("email", "phone"):
+                parsed["contact"][field] = parsed["contact"].get(field) or simple["contact"][field]
+            return {
+                "parsed": parsed,
+                "meta": {"filename": file_storage.filename, "mode": "llm", "model": autofill.model_name, **meta_extra},
+            }
+
+    result = {"parsed": simple, "meta": {"filename": file_storage.filename, "mode": "simple", **meta_extra}}
+    if cache is not None and autofill is None:
+        cache.put("parsed", f"{key}-scan", json.dumps(result).encode("utf-8"))
+    return result
 
 # -------------------------------------------------------
 # PDF styling (professional “form” look)
@@ -152,7 +402,32 @@ def _safe(v: Any) -> str:
     s = str(v).strip()
     return s
 
-def _styles():
+def _load_reportlab() -> None:
+    """
+    Bind the ReportLab names the builders use. Deferred to the first PDF build
+    (every builder starts with _styles()) so importing this module stays cheap.
+    """
+    global LETTER, getSampleStyleSheet, ParagraphStyle, colors
+    global SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+    global StaticParagraph, StaticText
+
+    if "Paragraph" in globals():
+        return
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import LETTER
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.platypus import (
+        PageBreak,
+        Paragraph,
+        SimpleDocTemplate,
+        Spacer,
+        Table,
+        TableStyle,
+    )
+
+    from pdf_templates import StaticParagraph, StaticText
+
+def _build_styles() -> Dict[str, Any]:
     styles = getSampleStyleSheet()
 
     styles.add(ParagraphStyle(
@@ -214,7 +489,59 @@ def _styles():
         leading=12.5,
         textColor=colors.HexColor("#7c2d12"),
     ))
-    return styles
+    out = dict(styles.byAlias)
+    out.update(styles.byName)
+    return out
+
+# Built once per process and shared by every builder (and render thread).
+# Read-only: a builder that needs a variant should derive a new ParagraphStyle.
+_STYLES: Optional[Mapping[str, Any]] = None
+_STYLES_LOCK = threading.Lock()
+_KV_TABLE_STYLE = None
+_CARD_TABLE_STYLE = None
+
+def _styles() -> Mapping[str, Any]:
+    global _STYLES, _KV_TABLE_STYLE, _CARD_TABLE_STYLE
+
+    if _STYLES is not None:
+        return _STYLES
+    with _STYLES_LOCK:
+        if _STYLES is None:
+            _load_reportlab()
+            _KV_TABLE_STYLE = TableStyle([
+                ("VALIGN", (0,0), (-1,-1), "TOP"),
+                ("LINEBELOW", (1,0), (1,-1), 0.6, colors.HexColor("#e5e7eb")),
+                ("BOTTOMPADDING", (0,0), (-1,-1), 8),
+                ("TOPPADDING", (0,0), (-1,-1), 2),
+            ])
+            _CARD_TABLE_STYLE = TableStyle([
+                ("BOX", (0,0), (-1,-1), 0.8, colors.HexColor("#e5e7eb")),
+                ("BACKGROUND", (0,0), (-1,-1), colors.white),
+                ("LEFTPADDING", (0,0), (-1,-1), 10),
+                ("RIGHTPADDING", (0,0), (-1,-1), 10),
+                ("TOPPADDING", (0,0), (-1,-1), 10),
+                ("BOTTOMPADDING", (0,0), (-1,-1), 10),
+            ])
+            _STYLES = MappingProxyType(_build_styles())
+    return _STYLES
+
+# -------------------------------------------------------
+# Static text (labels, headers, disclaimers); see pdf_templates.py
+# -------------------------------------------------------
+EXACT_TEXT_HEADING = "Exact Text Shown to Applicant"
+EXACT_TEXT_DISCLAIMER = (
+    "This document reproduces the exact text presented to the applicant during the application process. "
+    "Content has not been altered, summarized, or paraphrased."
+)
+TYPED_SIGNATURE_NOTE = "Typed signature serves as electronic signature."
+
+@lru_cache(maxsize=1024)
+def _static_text(text: str, style_name: str):
+    return StaticText(text, _styles()[style_name])
+
+def _static(text: str, style_name: str):
+    """Paragraph for a fixed string; must not be used for applicant-supplied text."""
+    return StaticParagraph.of(_static_text(text, style_name))
 
 def _kv_block(rows: List[Tuple[str, Any]], styles, cols=(2.0*inch, 4.8*inch)) -> Table:
     """
@@ -226,17 +553,12 @@ def _kv_block(rows: List[Tuple[str, Any]], styles, cols=(2.0*inch, 4.8*inch)) ->
     for label, value in rows:
         v = _safe(value) or "—"
         data.append([
-            Paragraph(f"<b>{label}</b>", styles["Label"]),
+            _static(f"<b>{label}</b>", "Label"),
             Paragraph(v.replace("\n", "<br/>"), styles["Value"]),
         ])
 
     t = Table(data, colWidths=list(cols))
-    t.setStyle(TableStyle([
-        ("VALIGN", (0,0), (-1,-1), "TOP"),
-        ("LINEBELOW", (1,0), (1,-1), 0.6, colors.HexColor("#e5e7eb")),
-        ("BOTTOMPADDING", (0,0), (-1,-1), 8),
-        ("TOPPADDING", (0,0), (-1,-1), 2),
-    ]))
+    t.setStyle(_KV_TABLE_STYLE)
     return t
 
 def _card_box(flowables: List[Any]) -> Table:
@@ -244,14 +566,7 @@ def _card_box(flowables: List[Any]) -> Table:
     Wrap a section in a subtle bordered “card” so it looks like a real form.
     """
     t = Table([[flowables]], colWidths=[6.8*inch])
-    t.setStyle(TableStyle([
-        ("BOX", (0,0), (-1,-1), 0.8, colors.HexColor("#e5e7eb")),
-        ("BACKGROUND", (0,0), (-1,-1), colors.white),
-        ("LEFTPADDING", (0,0), (-1,-1), 10),
-        ("RIGHTPADDING", (0,0), (-1,-1), 10),
-        ("TOPPADDING", (0,0), (-1,-1), 10),
-        ("BOTTOMPADDING", (0,0), (-1,-1), 10),
-    ]))
+    t.setStyle(_CARD_TABLE_STYLE)
     return t
 
 def _build_doc(title: str, subtitle: str, story: List[Any]) -> bytes:
@@ -271,9 +586,9 @@ def _build_doc(title: str, subtitle: str, story: List[Any]) -> bytes:
 
 def _header_block(styles, title: str, subtitle: str) -> List[Any]:
     return [
-        Paragraph("GEOLABS, INC.", styles["DocTitle"]),
-        Paragraph(title, styles["SectionH"]),
-        Paragraph(subtitle, styles["DocSub"]),
+        _static("GEOLABS, INC.", "DocTitle"),
+        _static(title, "SectionH"),
+        _static(subtitle, "DocSub"),
         Spacer(1, 6),
     ]
 
@@ -285,6 +600,32 @@ def _split_paragraphs(text: str) -> List[str]:
     parts = [p.strip() for p in text.split("\n\n") if p.strip()]
     return parts
 
+@lru_cache(maxsize=64)
+def _registered_paragraphs(version: str, text: str) -> Tuple[str, ...]:
+    return tuple(_split_paragraphs(text))
+
+def _legal_block(payload: Dict[str, Any], key: str, style_for=lambda p: "Legal") -> List[Any]:
+    """
+    Paragraphs of one legal text, each followed by a small spacer. Text that
+    came from the legal registry (payload resolved by LegalRegistry.resolve)
+    is laid out once per process; text sent inline by older clients is
+    treated like any other applicant-supplied value.
+    """
+    styles = _styles()
+    text = (payload.get("legalText") or {}).get(key) or ""
+    version = (payload.get("legalVersion") or {}).get(key)
+
+    out: List[Any] = []
+    if version:
+        for p in _registered_paragraphs(version, text):
+            out.append(_static(p, style_for(p)))
+            out.append(Spacer(1, 6))
+    else:
+        for p in _split_paragraphs(text):
+            out.append(Paragraph(p, styles[style_for(p)]))
+            out.append(Spacer(1, 6))
+    return out
+
 # -------------------------------------------------------
 # PDF builders (6 PDFs total with resume)
 # -------------------------------------------------------
@@ -305,7 +646,7 @@ def build_main_application_pdf(payload: Dict[str, Any]) -> bytes:
     )
 
     summary_card = [
-        Paragraph("<b>Submission Summary</b>", styles["SectionH"]),
+        _static("<b>Submission Summary</b>", "SectionH"),
         _kv_block([
             ("Submitted At", submitted_at),
             ("Client Timezone", tz),
@@ -319,7 +660,7 @@ def build_main_application_pdf(payload: Dict[str, Any]) -> bytes:
 
     # Application info
     app_card = [
-        Paragraph("Application Information", styles["SectionH"]),
+        _static("Application Information", "SectionH"),
         _kv_block([
             ("Date", form.get("date")),
             ("Position Applying For", form.get("position")),
@@ -332,7 +673,7 @@ def build_main_application_pdf(payload: Dict[str, Any]) -> bytes:
 
     # Contact info
     contact_card = [
-        Paragraph("General Information", styles["SectionH"]),
+        _static("General Information", "SectionH"),
         _kv_block([
             ("Full Name", form.get("name")),
             ("Email", form.get("email")),
@@ -353,7 +694,7 @@ def build_main_application_pdf(payload: Dict[str, Any]) -> bytes:
         if not isinstance(job, dict):
             continue
         job_card = [
-            Paragraph(f"Employment Record — Employer #{i+1}", styles["SectionH"]),
+            _static(f"Employment Record — Employer #{i+1}", "SectionH"),
             _kv_block([
                 ("Company Name / Address", job.get("company")),
                 ("Phone", job.get("phone")),
@@ -370,7 +711,7 @@ def build_main_application_pdf(payload: Dict[str, Any]) -> bytes:
 
     # Education
     edu_card = [
-        Paragraph("Education", styles["SectionH"]),
+        _static("Education", "SectionH"),
         _kv_block([
             ("Highest Level Completed", form.get("highestEducationLevel")),
             ("School Name", form.get("educationSchoolName")),
@@ -386,7 +727,7 @@ def build_main_application_pdf(payload: Dict[str, Any]) -> bytes:
 
     # Skills
     skills_card = [
-        Paragraph("Skills & Qualifications", styles["SectionH"]),
+        _static("Skills & Qualifications", "SectionH"),
         _kv_block([
             ("Years of Relevant Experience", form.get("skillsYearsExperience")),
             ("Primary Area(s) of Focus", form.get("skillsPrimaryFocus")),
@@ -402,11 +743,11 @@ def build_main_application_pdf(payload: Dict[str, Any]) -> bytes:
 
     # References
     refs = form.get("references") if isinstance(form.get("references"), list) else []
-    ref_rows: List[Any] = [Paragraph("References", styles["SectionH"])]
+    ref_rows: List[Any] = [_static("References", "SectionH")]
     for idx, r in enumerate(refs[:3]):
         if not isinstance(r, dict):
             continue
-        ref_rows.append(Paragraph(f"<b>Reference #{idx+1}</b>", styles["Label"]))
+        ref_rows.append(_static(f"<b>Reference #{idx+1}</b>", "Label"))
         ref_rows.append(_kv_block([
             ("Name / Title", r.get("name")),
             ("Company / Relationship", r.get("company")),
@@ -414,7 +755,7 @@ def build_main_application_pdf(payload: Dict[str, Any]) -> bytes:
         ], styles))
         ref_rows.append(Spacer(1, 6))
 
-    ref_rows.append(Paragraph("<b>Authorization to Contact References</b>", styles["Label"]))
+    ref_rows.append(_static("<b>Authorization to Contact References</b>", "Label"))
     ref_rows.append(_kv_block([
         ("Applicant’s Initials", form.get("certifyInitials")),
     ], styles))
@@ -424,14 +765,14 @@ def build_main_application_pdf(payload: Dict[str, Any]) -> bytes:
 
     # Medical
     med_card = [
-        Paragraph("Medical Information & Authorization", styles["SectionH"]),
+        _static("Medical Information & Authorization", "SectionH"),
         _kv_block([
             ("Applicant’s Initials (acknowledgment)", form.get("medInitials")),
             ("Able to perform essential functions (with/without accommodation)", form.get("ableToPerformJob")),
         ], styles),
-        Paragraph(
+        _static(
             "Note: Applicants should not provide medical diagnoses or detailed health history in this field.",
-            styles["Fine"],
+            "Fine",
         )
     ]
     story.append(_card_box(med_card))
@@ -439,7 +780,7 @@ def build_main_application_pdf(payload: Dict[str, Any]) -> bytes:
 
     # Affiliations
     aff_card = [
-        Paragraph("Professional Affiliations", styles["SectionH"]),
+        _static("Professional Affiliations", "SectionH"),
         _kv_block([
             ("Affiliations / Licenses / Memberships", form.get("affiliations")),
         ], styles),
@@ -449,7 +790,7 @@ def build_main_application_pdf(payload: Dict[str, Any]) -> bytes:
 
     # Certification & Disclosures
     cert_card = [
-        Paragraph("Employment Certification & Disclosures", styles["SectionH"]),
+        _static("Employment Certification & Disclosures", "SectionH"),
         _kv_block([
             ("FCRA Initials", form.get("fcrInitials")),
             ("Do you know anyone presently working for Geolabs?", form.get("knowEmployee")),
@@ -457,7 +798,7 @@ def build_main_application_pdf(payload: Dict[str, Any]) -> bytes:
             ("Application Certification Date", form.get("applicationCertificationDate")),
             ("Application Certification Signature (typed)", form.get("applicationCertificationSignature")),
         ], styles),
-        Paragraph("Typed signature serves as electronic signature.", styles["Fine"]),
+        _static(TYPED_SIGNATURE_NOTE, "Fine"),
     ]
     story.append(_card_box(cert_card))
 
@@ -470,7 +811,6 @@ def build_main_application_pdf(payload: Dict[str, Any]) -> bytes:
 def build_eeo_pdf(payload: Dict[str, Any]) -> bytes:
     styles = _styles()
     form = payload.get("form") or {}
-    legal = payload.get("legalText") or {}
 
     story: List[Any] = []
     story += _header_block(
@@ -480,16 +820,14 @@ def build_eeo_pdf(payload: Dict[str, Any]) -> bytes:
     )
 
     # --- LEGAL TEXT FIRST (TOP) ---
-    story.append(Paragraph("Exact Text Shown to Applicant", styles["SectionH"]))
-    for p in _split_paragraphs(legal.get("eeoNotice") or ""):
-        story.append(Paragraph(p, styles["Legal"]))
-        story.append(Spacer(1, 6))
+    story.append(_static(EXACT_TEXT_HEADING, "SectionH"))
+    story += _legal_block(payload, "eeoNotice")
 
     story.append(Spacer(1, 14))
 
     # --- SIGNATURE / RESPONSES BELOW ---
     card = [
-        Paragraph("Applicant Responses", styles["SectionH"]),
+        _static("Applicant Responses", "SectionH"),
         _kv_block([
             ("Name (optional)", form.get("eeoName")),
             ("Date (optional)", form.get("eeoDate")),
@@ -501,18 +839,13 @@ def build_eeo_pdf(payload: Dict[str, Any]) -> bytes:
     story.append(Spacer(1, 14))
 
     # --- FOOTER DISCLAIMER ---
-    story.append(Paragraph(
-        "This document reproduces the exact text presented to the applicant during the application process. "
-        "Content has not been altered, summarized, or paraphrased.",
-        styles["Fine"],
-    ))
+    story.append(_static(EXACT_TEXT_DISCLAIMER, "Fine"))
 
     return _build_doc("EEO Voluntary Self-Identification", "", story)
 
 def build_disability_pdf(payload: Dict[str, Any]) -> bytes:
     styles = _styles()
     form = payload.get("form") or {}
-    legal = payload.get("legalText") or {}
 
     story: List[Any] = []
     story += _header_block(
@@ -522,16 +855,14 @@ def build_disability_pdf(payload: Dict[str, Any]) -> bytes:
     )
 
     # Legal text (TOP)
-    story.append(Paragraph("Exact Text Shown to Applicant", styles["SectionH"]))
-    for p in _split_paragraphs(legal.get("disabilityNotice") or ""):
-        story.append(Paragraph(p, styles["Legal"]))
-        story.append(Spacer(1, 6))
+    story.append(_static(EXACT_TEXT_HEADING, "SectionH"))
+    story += _legal_block(payload, "disabilityNotice")
 
     story.append(Spacer(1, 14))
 
     # Applicant responses / signature (BELOW)
     card = [
-        Paragraph("Applicant Responses", styles["SectionH"]),
+        _static("Applicant Responses", "SectionH"),
         _kv_block([
             ("Name (optional)", form.get("disabilityName")),
             ("Date (optional)", form.get("disabilityDate")),
@@ -540,24 +871,19 @@ def build_disability_pdf(payload: Dict[str, Any]) -> bytes:
             ("Signature (typed)", form.get("disabilitySignature")),
             ("Signature date", form.get("disabilitySignatureDate")),
         ], styles),
-        Paragraph("Typed signature serves as electronic signature.", styles["Fine"]),
+        _static(TYPED_SIGNATURE_NOTE, "Fine"),
     ]
     story.append(_card_box(card))
     story.append(Spacer(1, 14))
 
     # Footer disclaimer
-    story.append(Paragraph(
-        "This document reproduces the exact text presented to the applicant during the application process. "
-        "Content has not been altered, summarized, or paraphrased.",
-        styles["Fine"],
-    ))
+    story.append(_static(EXACT_TEXT_DISCLAIMER, "Fine"))
 
     return _build_doc("Disability Self-Identification (CC-305)", "", story)
 
 def build_veteran_pdf(payload: Dict[str, Any]) -> bytes:
     styles = _styles()
     form = payload.get("form") or {}
-    legal = payload.get("legalText") or {}
 
     story: List[Any] = []
     story += _header_block(
@@ -567,39 +893,32 @@ def build_veteran_pdf(payload: Dict[str, Any]) -> bytes:
     )
 
     # Legal text (TOP)
-    story.append(Paragraph("Exact Text Shown to Applicant", styles["SectionH"]))
-    for p in _split_paragraphs(legal.get("veteranNotice") or ""):
-        story.append(Paragraph(p, styles["Legal"]))
-        story.append(Spacer(1, 6))
+    story.append(_static(EXACT_TEXT_HEADING, "SectionH"))
+    story += _legal_block(payload, "veteranNotice")
 
     story.append(Spacer(1, 14))
 
     # Applicant responses / signature (BELOW)
     card = [
-        Paragraph("Applicant Responses", styles["SectionH"]),
+        _static("Applicant Responses", "SectionH"),
         _kv_block([
             ("Veteran status (voluntary)", form.get("vetStatus")),
             ("Signature (typed)", form.get("vetName")),
             ("Date", form.get("vetDate")),
         ], styles),
-        Paragraph("Typed signature serves as electronic signature.", styles["Fine"]),
+        _static(TYPED_SIGNATURE_NOTE, "Fine"),
     ]
     story.append(_card_box(card))
     story.append(Spacer(1, 14))
 
     # Footer disclaimer
-    story.append(Paragraph(
-        "This document reproduces the exact text presented to the applicant during the application process. "
-        "Content has not been altered, summarized, or paraphrased.",
-        styles["Fine"],
-    ))
+    story.append(_static(EXACT_TEXT_DISCLAIMER, "Fine"))
 
     return _build_doc("Protected Veteran Self-Identification (VEVRAA)", "", story)
 
 def build_alcohol_drug_pdf(payload: Dict[str, Any]) -> bytes:
     styles = _styles()
     form = payload.get("form") or {}
-    legal = payload.get("legalText") or {}
 
     story: List[Any] = []
     story += _header_block(
@@ -609,103 +928,189 @@ def build_alcohol_drug_pdf(payload: Dict[str, Any]) -> bytes:
     )
 
     # Legal text (TOP)
-    story.append(Paragraph("Exact Text Shown to Applicant", styles["SectionH"]))
-    for p in _split_paragraphs(legal.get("alcoholDrugProgram") or ""):
-        if "ANY APPLICANT WHO IS UNWILLING" in p:
-            story.append(Paragraph(p, styles["Warning"]))
-        else:
-            story.append(Paragraph(p, styles["Legal"]))
-        story.append(Spacer(1, 6))
+    story.append(_static(EXACT_TEXT_HEADING, "SectionH"))
+    story += _legal_block(
+        payload,
+        "alcoholDrugProgram",
+        lambda p: "Warning" if "ANY APPLICANT WHO IS UNWILLING" in p else "Legal",
+    )
 
     story.append(Spacer(1, 14))
 
     # Applicant acknowledgment / signature (BELOW)
     card = [
-        Paragraph("Applicant Attestation", styles["SectionH"]),
+        _static("Applicant Attestation", "SectionH"),
         _kv_block([
             ("Acknowledged", form.get("drugAgreementAcknowledge")),
             ("Signature (typed)", form.get("drugAgreementSignature")),
             ("Date", form.get("drugAgreementDate")),
         ], styles),
-        Paragraph("Typed signature serves as electronic signature.", styles["Fine"]),
+        _static(TYPED_SIGNATURE_NOTE, "Fine"),
     ]
     story.append(_card_box(card))
     story.append(Spacer(1, 14))
 
     # Footer disclaimer
-    story.append(Paragraph(
-        "This document reproduces the exact text presented to the applicant during the application process. "
-        "Content has not been altered, summarized, or paraphrased.",
-        styles["Fine"],
-    ))
+    story.append(_static(EXACT_TEXT_DISCLAIMER, "Fine"))
 
     return _build_doc("Alcohol & Drug Testing Program Agreement", "", story)
 
 
-def resume_to_pdf(resume_bytes: bytes, resume_filename: str) -> Tuple[bytes, str]:
+def _resume_text_pdf(text: str) -> bytes:
+    styles = _styles()
+    story: List[Any] = []
+    story += _header_block(styles, "Resume (Converted to PDF)", "Original resume was not a PDF; converted for department review.")
+    for p in _split_paragraphs(text.replace("\r\n", "\n")):
+        story.append(Paragraph(p.replace("\n", "<br/>"), styles["Legal"]))
+        story.append(Spacer(1, 6))
+    return _build_doc("Resume", "", story)
+
+def _convert_resume(data: ResumeData, filename: str) -> Tuple[bytes, str]:
+    text = _extract_text_unsandboxed(data, filename)
+    return _resume_text_pdf(text), text
+
+def _budgeted_pdf(resume_bytes: ResumeData, resume_filename: str, cfg: Optional[Dict[str, Any]]):
+    """The uploaded PDF, or a compressed copy when it is over RESUME_PDF_BUDGET_BYTES."""
+    budget = cfg.get("RESUME_PDF_BUDGET_BYTES", 0) if cfg else 0
+    if not budget or data_size(resume_bytes) <= budget:
+        return buffer_of(resume_bytes)
+
+    cache = get_resume_cache(cfg)
+    key = _resume_key(resume_bytes, f".pdf-{budget}") if cache is not None else None
+    if cache is not None:
+        hit = cache.get("pdf", key)
+        if hit is not None:
+            return hit
+
+    try:
+        with STAGE_SECONDS.time(stage="pdf_compress"):
+            pdf, report = run_extraction(cfg, "compress", resume_bytes, resume_filename, budget=budget)
+    except (ValueError, RuntimeError) as e:
+        # Compression is best effort; the original still goes out.
+        print("⚠️ resume PDF not compressed, attaching the original:", e)
+        return buffer_of(resume_bytes)
+
+    RESUME_PDF_BYTES.inc(report["before"], stage="before")
+    RESUME_PDF_BYTES.inc(report["after"], stage="after")
+    print(
+        f"⏱ resume PDF: {report['before'] / 1048576:.1f} MB -> {report['after'] / 1048576:.1f} MB"
+        f" ({report['pass']}, {report['images']} images) in {report['seconds'] * 1000:.0f}ms"
+        + ("" if report["within_budget"] else "; still over budget")
+    )
+    if pdf is None:
+        return buffer_of(resume_bytes)
+    if cache is not None:
+        cache.put("pdf", key, pdf)
+    return pdf
+
+def resume_to_pdf(
+    resume_bytes: ResumeData,
+    resume_filename: str,
+    cfg: Optional[Dict[str, Any]] = None,
+) -> Tuple[bytes, str]:
+    """
+    resume_bytes may be raw bytes or the spooled upload file itself; PDFs are
+    passed through as a buffer over the upload (mmapped when it spilled to disk),
+    or compressed first when over RESUME_PDF_BUDGET_BYTES. With cfg, converted PDFs and extracted text come from / go to the resume cache.
+    """
     ext = get_extension(resume_filename)
     safe_base = re.sub(r"[^A-Za-z0-9._-]+", "_", Path(resume_filename).stem).strip("_") or "Resume"
 
     if ext == ".pdf":
-        return resume_bytes, f"{safe_base}.pdf"
+        return _budgeted_pdf(resume_bytes, resume_filename, cfg), f"{safe_base}.pdf"
+    if ext not in {".doc", ".docx", ".txt"}:
+        raise ValueError(f"Unsupported resume file type: {ext}")
 
-    # Convert doc/docx/txt to PDF with extracted text
-    if ext in {".doc", ".docx"}:
-        stream = io.BytesIO(resume_bytes)
-        document = docx.Document(stream)
-        text = "\n".join([p.text for p in document.paragraphs if p.text.strip()])
-    elif ext == ".txt":
-        try:
-            text = resume_bytes.decode("utf-8", errors="ignore")
-        except Exception:
-            text = resume_bytes.decode("latin-1", errors="ignore")
+    cache = get_resume_cache(cfg) if cfg else None
+    key = _resume_key(resume_bytes, ext) if cache is not None else None
+    if cache is not None:
+        hit = cache.get("pdf", key)
+        if hit is not None:
+            return hit, f"{safe_base}.pdf"
+        text_hit = cache.get("text", key)
     else:
-        raise ValueError(f"Unsupported resume file type: {ext}")
+        text_hit = None
 
-    styles = _styles()
-    story: List[Any] = []
-    story += _header_block(styles, "Resume (Converted to PDF)", "Original resume was not a PDF; converted for department review.")
-    for p in _split_paragraphs(text.replace("\r\n", "\n")):
-        story.append(Paragraph(p.replace("\n", "<br/>"), styles["Legal"]))
-        story.append(Spacer(1, 6))
+    # Convert doc/docx/txt to PDF with extracted text; untrusted files are
+    # read in the extraction sandbox
+    if text_hit is not None:
+        text = text_hit.decode("utf-8")
+        pdf = _resume_text_pdf(text)
+    else:
+        pdf, text = run_extraction(cfg, "convert", resume_bytes, resume_filename)
 
-    pdf = _build_doc("Resume", "", story)
+    if cache is not None:
+        if text_hit is None:
+            cache.put("text", key, text.encode("utf-8"))
+        cache.put("pdf", key, pdf)
     return pdf, f"{safe_base}.pdf"
 
 # -------------------------------------------------------
 # Email sending (6 PDFs total)
 # -------------------------------------------------------
+def _mail_message(
+    cfg: Dict[str, Any],
+    to: List[str],
+    subject: str,
+    body: str,
+    attachments: List[Tuple[str, ResumeData]],
+):
+    # The streaming message only references the attachments; encoding happens
+    # while sending (so it is counted under smtp_send, not mime_assembly).
+    mime_t0 = time.perf_counter()
+    if cfg["SMTP_STREAM_MIME"]:
+        msg = StreamingMessage(cfg["APPLICATION_MAIL_FROM"], to, subject, body, attachments)
+    else:
+        msg = EmailMessage()
+        msg["From"] = cfg["APPLICATION_MAIL_FROM"]
+        msg["To"] = ", ".join(to)
+        msg["Subject"] = subject
+        msg.set_content(body)
+        for filename, data in attachments:
+            maintype, _, subtype = (mimetypes.guess_type(filename)[0] or "application/octet-stream").partition("/")
+            buffer = buffer_of(data)
+            try:
+                msg.add_attachment(bytes(buffer), maintype=maintype, subtype=subtype, filename=filename)
+            finally:
+                close_buffer(buffer)
+    STAGE_SECONDS.observe(time.perf_counter() - mime_t0, stage="mime_assembly")
+    return msg
+
 def send_application_email(
     payload: Dict[str, Any],
     cfg: Dict[str, Any],
-    resume_bytes: Optional[bytes] = None,
+    resume_bytes: Optional[ResumeData] = None,
     resume_filename: Optional[str] = None,
 ) -> None:
     if not cfg.get("SMTP_HOST"):
         raise RuntimeError("SMTP_HOST is not configured on the server.")
 
+    payload = get_legal_registry(cfg).resolve(payload)
     form = payload.get("form") or {}
     applicant_name = form.get("name") or "Applicant"
     position = form.get("position") or "Unknown Position"
     applicant_email = form.get("email") or "No email"
 
-    # PDFs
-    main_pdf = build_main_application_pdf(payload)
-    eeo_pdf = build_eeo_pdf(payload)
-    disability_pdf = build_disability_pdf(payload)
-    veteran_pdf = build_veteran_pdf(payload)
-    drug_pdf = build_alcohol_drug_pdf(payload)
-
-    resume_pdf_bytes = None
-    if resume_bytes and resume_filename:
-        resume_pdf_bytes, _ = resume_to_pdf(resume_bytes, resume_filename)
-
-    msg = EmailMessage()
-    msg["From"] = cfg["APPLICATION_MAIL_FROM"]
-    msg["To"] = cfg["APPLICATION_MAIL_TO"]
-    msg["Subject"] = f"New Employment Application: {applicant_name} — {position}"
-    msg.set_content(
-        "\n".join(
+    # PDFs (rendered concurrently; see render_pool.py)
+    docs, timings = render_application_pdfs(
+        payload, cfg, resume_bytes=resume_bytes, resume_filename=resume_filename
+    )
+    # A passed-through PDF resume is a buffer over the upload (mmapped when it
+    # spilled to disk); it is unmapped once mailed / spooled and archived.
+    try:
+        print("⏱ PDF render:", ", ".join(f"{k}={v * 1000:.0f}ms" for k, v in timings.items()))
+        for doc_name, seconds in timings.items():
+            STAGE_SECONDS.observe(seconds, stage="pdf_build", detail=doc_name)
+
+        main_pdf = docs["main"]
+        eeo_pdf = docs["eeo"]
+        disability_pdf = docs["disability"]
+        veteran_pdf = docs["veteran"]
+        drug_pdf = docs["drug"]
+        resume_pdf_bytes = docs.get("resume")
+
+        subject = f"New Employment Application: {applicant_name} — {position}"
+        body = "\n".join(
             [
                 "A new employment application was submitted from the web form.",
                 "",
@@ -722,45 +1127,213 @@ def send_application_email(
                 "6) Resume (PDF, if provided)",
             ]
         )
-    )
 
-    safe_app = re.sub(r"[^A-Za-z0-9._-]+", "_", str(applicant_name)).strip("_") or "Applicant"
-    safe_pos = re.sub(r"[^A-Za-z0-9._-]+", "_", str(position)).strip("_") or "Position"
-
-    msg.add_attachment(main_pdf, maintype="application", subtype="pdf",
-                       filename=f"1_Main_Application_{safe_app}_{safe_pos}.pdf")
-    msg.add_attachment(eeo_pdf, maintype="application", subtype="pdf",
-                       filename=f"2_EEO_{safe_app}_{safe_pos}.pdf")
-    msg.add_attachment(disability_pdf, maintype="application", subtype="pdf",
-                       filename=f"3_Disability_{safe_app}_{safe_pos}.pdf")
-    msg.add_attachment(veteran_pdf, maintype="application", subtype="pdf",
-                       filename=f"4_Veteran_{safe_app}_{safe_pos}.pdf")
-    msg.add_attachment(drug_pdf, maintype="application", subtype="pdf",
-                       filename=f"5_Alcohol_Drug_{safe_app}_{safe_pos}.pdf")
-
-    if resume_pdf_bytes:
-        msg.add_attachment(resume_pdf_bytes, maintype="application", subtype="pdf",
-                           filename=f"6_Resume_{safe_app}_{safe_pos}.pdf")
-
-    with smtplib.SMTP(cfg["SMTP_HOST"], cfg["SMTP_PORT"], timeout=20) as server:
-        if cfg["SMTP_USE_TLS"]:
-            server.starttls()
-        if cfg["SMTP_USER"] and cfg["SMTP_PASS"]:
-            server.login(cfg["SMTP_USER"], cfg["SMTP_PASS"])
-        server.send_message(msg)
+        safe_app = re.sub(r"[^A-Za-z0-9._-]+", "_", str(applicant_name)).strip("_") or "Applicant"
+        safe_pos = re.sub(r"[^A-Za-z0-9._-]+", "_", str(position)).strip("_") or "Position"
 
-def submit_application_payload(
+        attachments = [
+            (f"1_Main_Application_{safe_app}_{safe_pos}.pdf", main_pdf),
+            (f"2_EEO_{safe_app}_{safe_pos}.pdf", eeo_pdf),
+            (f"3_Disability_{safe_app}_{safe_pos}.pdf", disability_pdf),
+            (f"4_Veteran_{safe_app}_{safe_pos}.pdf", veteran_pdf),
+            (f"5_Alcohol_Drug_{safe_app}_{safe_pos}.pdf", drug_pdf),
+        ]
+        if resume_pdf_bytes:
+            attachments.append((f"6_Resume_{safe_app}_{safe_pos}.pdf", resume_pdf_bytes))
+
+        for doc_name, pdf in docs.items():
+            ATTACHMENT_BYTES.inc(len(pdf), document=doc_name)
+
+        route = get_mail_router(cfg).route(form)
+        if route.digest is not None:
+            summary = {
+                "name": applicant_name,
+                "position": position,
+                "location": form.get("location") or "",
+                "email": applicant_email,
+                "label": f"{safe_app}_{safe_pos}",
+                "submitted_at": time.time(),
+            }
+            _digest_spool(cfg).add(route, summary, attachments)
+            MAIL_APPLICATIONS.inc(route=route.name, kind="digest")
+            print(f"➡ application from {applicant_name} queued for the {route.name} digest")
+        else:
+            get_smtp_pool(cfg).send(_mail_message(cfg, route.to, subject, body, attachments))
+            MAIL_MESSAGES.inc(route=route.name, kind="single")
+            MAIL_APPLICATIONS.inc(route=route.name, kind="single")
+        _archive_submission(payload, cfg, docs, resume_bytes, resume_filename)
+    finally:
+        close_buffer(docs.get("resume"))
+
+# -------------------------------------------------------
+# Digest mail (see mail_routing.py)
+# -------------------------------------------------------
+def _digest_spool(cfg: Dict[str, Any]) -> DigestSpool:
+    def send_digest(route: Route, entries: List[Dict[str, Any]]) -> None:
+        zipped = bool(route.digest and route.digest["zip"])
+        attachments = digest_attachments(entries, zipped)
+        try:
+            msg = _mail_message(cfg, route.to, digest_subject(route, entries), digest_body(route, entries, zipped), attachments)
+            get_smtp_pool(cfg).send(msg)
+        finally:
+            if zipped:
+                attachments[0][1].close()
+        MAIL_MESSAGES.inc(route=route.name, kind="digest")
+        print(f"➡ sent {route.name} digest with {len(entries)} applications")
+
+    return get_digest_spool(cfg, send_digest)
+
+def mail_digest_stats(cfg: Dict[str, Any], status: str = "pending") -> Optional[Dict[str, int]]:
+    """Applications per digest route in `status` (pending/failed), or None when no route digests."""
+    return _digest_spool(cfg).depth(status) if get_mail_router(cfg).digests else None
+
+# -------------------------------------------------------
+# Archive (see archive.py)
+# -------------------------------------------------------
+def _resume_text(resume_bytes: ResumeData, resume_filename: str, cfg: Dict[str, Any]) -> str:
+    ext = get_extension(resume_filename)
+    cache = get_resume_cache(cfg)
+    key = _resume_key(resume_bytes, ext) if cache is not None else None
+    if cache is not None:
+        hit = cache.get("text", key)
+        if hit is not None:
+            return hit.decode("utf-8")
+    text = read_text(resume_bytes) if ext == ".txt" else run_extraction(cfg, "text", resume_bytes, resume_filename)
+    if cache is not None:
+        cache.put("text", key, text.encode("utf-8"))
+    return text
+
+def _archived_payload(payload: Dict[str, Any], cfg: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The payload with legal texts replaced by registry version ids (they are
+    kilobytes each). Only texts the registry already knows are replaced;
+    client-supplied text is never registered, so it stays inline.
+    """
+    registry = get_legal_registry(cfg)
+    versions = dict(payload.get("legalVersion") or {})
+    inline: Dict[str, Any] = {}
+    for key, text in (payload.get("legalText") or {}).items():
+        if key in versions:
+            continue
+        version = text_version(text) if isinstance(text, str) and text else None
+        if version is not None and registry.get(version) is not None:
+            versions[key] = version
+        else:
+            inline[key] = text
+    archived = {k: v for k, v in payload.items() if k != "legalText"}
+    archived["legalVersion"] = versions
+    if inline:
+        archived["legalText"] = inline
+    return archived
+
+def _archive_submission(
     payload: Dict[str, Any],
     cfg: Dict[str, Any],
-    resume_bytes: Optional[bytes] = None,
-    resume_filename: Optional[str] = None,
+    docs: Dict[str, bytes],
+    resume_bytes: Optional[ResumeData],
+    resume_filename: Optional[str],
 ) -> None:
+    # The email has already gone out, so a failure here is logged, not raised.
+    archive = get_archive(cfg)
+    if archive is None:
+        return
+    try:
+        with STAGE_SECONDS.time(stage="archive"):
+            resume_text = None
+            if resume_bytes is not None and resume_filename:
+                try:
+                    resume_text = _resume_text(resume_bytes, resume_filename, cfg)
+                except ValueError as e:
+                    print("⚠️ archive: resume text not extracted:", e)
+            archive.add(
+                fingerprint(payload, resume_bytes, resume_filename),
+                _archived_payload(payload, cfg),
+                docs,
+                resume_text=resume_text,
+                resume_filename=resume_filename,
+            )
+            archive.purge_expired()
+    except Exception as e:
+        ERRORS.inc(route="archive", type=type(e).__name__)
+        print("❌ could not archive submission:", repr(e))
+
+def _validate_resume_filename(resume_filename: Optional[str]) -> None:
     if resume_filename:
         ext = get_extension(resume_filename)
         if ext not in ALLOWED_EXTENSIONS:
             raise ValueError(f"Unsupported resume file type: {ext}")
 
-    try:
-        send_application_email(payload, cfg, resume_bytes=resume_bytes, resume_filename=resume_filename)
-    except smtplib.SMTPAuthenticationError:
-        raise RuntimeError("SMTP authentication failed. Check SMTP_USER/SMTP_PASS or use an app password.")
+def submit_application_payload(
+    payload: Dict[str, Any],
+    cfg: Dict[str, Any],
+    resume_bytes: Optional[ResumeData] = None,
+    resume_filename: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> bool:
+    """
+    Render and send inline. Returns True when this was a retry of a
+    submission that already went out (nothing is rendered or sent again).
+    """
+    _validate_resume_filename(resume_filename)
+    fp = fingerprint(payload, resume_bytes, resume_filename)
+    key = submission_key(idempotency_key, fp)
+
+    def send() -> None:
+        try:
+            send_application_email(payload, cfg, resume_bytes=resume_bytes, resume_filename=resume_filename)
+        except smtplib.SMTPAuthenticationError:
+            raise RuntimeError("SMTP authentication failed. Check SMTP_USER/SMTP_PASS or use an app password.")
+
+    _, replayed = get_idempotency_store(cfg).run(key, fp, send)
+    return replayed
+
+# -------------------------------------------------------
+# Async submission (spooled to disk, sent by background workers)
+# -------------------------------------------------------
+def get_application_queue(cfg: Dict[str, Any]) -> SubmissionQueue:
+    """The process-wide submission queue, with the handler that renders and sends applications."""
+    def handler(payload: Dict[str, Any], resume_bytes: Optional[bytes], resume_filename: Optional[str]) -> None:
+        if not cfg.get("SMTP_HOST"):
+            raise PermanentJobError("SMTP_HOST is not configured on the server.")
+        profile_id = payload.pop(PROFILE_MARKER, None)
+        profiler = get_request_profiler(cfg) if valid_profile_id(profile_id) else None
+        if profiler is None:
+            send_application_email(payload, cfg, resume_bytes=resume_bytes, resume_filename=resume_filename)
+            return
+        with profiler.profile("submit-job", profile_id):
+            send_application_email(payload, cfg, resume_bytes=resume_bytes, resume_filename=resume_filename)
+
+    return get_submission_queue(cfg, handler)
+
+def enqueue_application_payload(
+    payload: Dict[str, Any],
+    cfg: Dict[str, Any],
+    resume_bytes: Optional[ResumeData] = None,
+    resume_filename: Optional[str] = None,
+    idempotency_key: Optional[str] = None,
+) -> Tuple[str, bool]:
+    """
+    Validate and spool a submission; returns (job id to poll, replayed). A
+    retry of a spooled submission gets the original job id back.
+    """
+    _validate_resume_filename(resume_filename)
+    # The marker is only ever set here, from the profiled request; a client
+    # must not be able to request a profiled job (or name its dump file).
+    payload = {k: v for k, v in payload.items() if k != PROFILE_MARKER}
+    # Fail fast on an unknown version; the spooled payload keeps just the ids.
+    get_legal_registry(cfg).resolve(payload)
+    fp = fingerprint(payload, resume_bytes, resume_filename)
+    if active_profile() is not None:
+        # Profile the background render + send too (added after the fingerprint, so retries still match).
+        payload = {**payload, PROFILE_MARKER: active_profile()}
+    job_id, created = get_application_queue(cfg).enqueue(
+        payload,
+        resume_bytes=resume_bytes,
+        resume_filename=resume_filename,
+        idempotency_key=submission_key(idempotency_key, fp),
+        fingerprint=fp,
+    )
+    return job_id, not created
+
+def get_submission_status(job_id: str, cfg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    return get_application_queue(cfg).status(job_id)
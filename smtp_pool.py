@@ -0,0 +1,297 @@
+# smtp_pool.py
+from __future__ import annotations
+
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+from email.message import EmailMessage
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from metrics import STAGE_SECONDS
+from mime_stream import StreamingMessage, send_streaming
+
+Message = Union[EmailMessage, StreamingMessage]
+
+# -------------------------------------------------------
+# Pooled SMTP sessions
+#
+# Opening a session costs a TCP connect, EHLO, STARTTLS and AUTH, which on
+# our relay is slower than sending the message itself. Sessions are kept
+# open and handed out one caller at a time. An idle session is NOOP-checked
+# before reuse and recycled after idle_timeout or max_messages; a 421 or a
+# dropped connection during send gets one retry on a fresh session.
+# -------------------------------------------------------
+PoolKey = Tuple[str, int, str]
+
+
+class SMTPPoolTimeout(RuntimeError):
+    """No SMTP session became free within the pool's wait timeout."""
+
+
+class _Session:
+    __slots__ = ("smtp", "created_at", "last_used", "sent")
+
+    def __init__(self, smtp: smtplib.SMTP) -> None:
+        self.smtp = smtp
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.sent = 0
+
+
+def _is_reconnectable(exc: BaseException) -> bool:
+    if isinstance(exc, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(exc, smtplib.SMTPResponseException) and exc.smtp_code == 421:
+        return True
+    return isinstance(exc, (ConnectionError, TimeoutError))
+
+
+class SMTPPool:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        user: str = "",
+        password: str = "",
+        use_tls: bool = True,
+        timeout: float = 20.0,
+        max_sessions: int = 4,
+        idle_timeout: float = 60.0,
+        noop_after: float = 5.0,
+        max_messages: int = 100,
+        wait_timeout: float = 30.0,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.max_sessions = max(1, max_sessions)
+        self.idle_timeout = idle_timeout
+        self.noop_after = noop_after
+        self.max_messages = max(1, max_messages)
+        self.wait_timeout = wait_timeout
+
+        self._idle: List[_Session] = []
+        self._open = 0  # idle + checked out
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self.stats = {"connects": 0, "reuses": 0, "noop_failures": 0, "reconnects": 0, "sent": 0}
+
+    def _count(self, stat: str) -> None:
+        # Sender threads update these concurrently.
+        with self._cond:
+            self.stats[stat] += 1
+
+    # ---------------------------------------------------
+    # Session lifecycle
+    # ---------------------------------------------------
+    def _connect(self) -> _Session:
+        with STAGE_SECONDS.time(stage="smtp_connect"):
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            try:
+                if self.use_tls:
+                    smtp.starttls()
+                if self.user and self.password:
+                    smtp.login(self.user, self.password)
+            except BaseException:
+                _quietly_close(smtp)
+                raise
+        self._count("connects")
+        return _Session(smtp)
+
+    def _healthy(self, s: _Session) -> bool:
+        now = time.monotonic()
+        if now - s.last_used > self.idle_timeout or s.sent >= self.max_messages:
+            return False
+        if now - s.last_used <= self.noop_after:
+            return True
+        try:
+            code, _ = s.smtp.noop()
+        except (smtplib.SMTPException, OSError):
+            code = 0
+        if code != 250:
+            self._count("noop_failures")
+            return False
+        return True
+
+    def _acquire(self) -> _Session:
+        deadline = time.monotonic() + self.wait_timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("SMTP pool is closed.")
+                if self._idle:
+                    s = self._idle.pop()  # LIFO: hottest session first
+                    break
+                if self._open < self.max_sessions:
+                    self._open += 1
+                    s = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise SMTPPoolTimeout(f"No SMTP session free after {self.wait_timeout:.0f}s.")
+                self._cond.wait(remaining)
+
+        # Network I/O happens outside the lock.
+        try:
+            if s is not None:
+                if self._healthy(s):
+                    self._count("reuses")
+                    return s
+                _quietly_close(s.smtp)
+            return self._connect()
+        except BaseException:
+            self._discard()
+            raise
+
+    def _release(self, s: _Session) -> None:
+        s.last_used = time.monotonic()
+        with self._cond:
+            if self._closed:
+                self._open -= 1
+                _quietly_close(s.smtp)
+            else:
+                self._idle.append(s)
+            self._cond.notify()
+
+    def _discard(self, s: Optional[_Session] = None) -> None:
+        if s is not None:
+            _quietly_close(s.smtp)
+        with self._cond:
+            self._open -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def session(self) -> Iterator[smtplib.SMTP]:
+        """Check out a live session. A session that raised is closed, not returned."""
+        s = self._acquire()
+        try:
+            yield s.smtp
+        except BaseException:
+            self._discard(s)
+            raise
+        else:
+            self._release(s)
+
+    # ---------------------------------------------------
+    # Sending
+    # ---------------------------------------------------
+    def _send_on(self, s: _Session, msg: Message) -> None:
+        with STAGE_SECONDS.time(stage="smtp_send"):
+            if isinstance(msg, StreamingMessage):
+                send_streaming(s.smtp, msg)
+            else:
+                s.smtp.send_message(msg)
+        s.sent += 1
+        self._count("sent")
+
+    def send_many(self, messages: Iterable[Message]) -> int:
+        """
+        Send messages back to back, reusing one session for as many as it allows.
+        Returns the number sent; stops at the first non-retryable error.
+        """
+        sent = 0
+        s: Optional[_Session] = self._acquire()
+        try:
+            for msg in messages:
+                if s.sent >= self.max_messages:
+                    old, s = s, None
+                    self._discard(old)
+                    s = self._acquire()
+                try:
+                    self._send_on(s, msg)
+                except Exception as e:
+                    if not _is_reconnectable(e):
+                        raise
+                    # Relay dropped us (421 / idle kick); one retry on a fresh session.
+                    self._count("reconnects")
+                    old, s = s, None
+                    self._discard(old)
+                    s = self._acquire()
+                    self._send_on(s, msg)
+                sent += 1
+        except BaseException:
+            if s is not None:
+                self._discard(s)
+            raise
+        self._release(s)
+        return sent
+
+    def send(self, msg: Message) -> None:
+        self.send_many([msg])
+
+    def probe(self, timeout: float = 5.0) -> None:
+        """
+        Readiness check on a separate connection (pooled sessions stay free):
+        connect, STARTTLS, AUTH, NOOP, QUIT. Raises on any failure.
+        """
+        smtp = smtplib.SMTP(self.host, self.port, timeout=timeout)
+        try:
+            if self.use_tls:
+                smtp.starttls()
+            if self.user and self.password:
+                smtp.login(self.user, self.password)
+            code, message = smtp.noop()
+            if code != 250:
+                raise smtplib.SMTPResponseException(code, message)
+            smtp.quit()
+        except BaseException:
+            _quietly_close(smtp)
+            raise
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+            self._cond.notify_all()
+        for s in idle:
+            try:
+                s.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                _quietly_close(s.smtp)
+
+
+def _quietly_close(smtp: smtplib.SMTP) -> None:
+    try:
+        smtp.close()
+    except Exception:
+        pass
+
+
+# -------------------------------------------------------
+# Process-wide pools keyed on relay + account
+# -------------------------------------------------------
+_POOLS: Dict[PoolKey, SMTPPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_smtp_pool(cfg: Dict[str, Any]) -> SMTPPool:
+    key: PoolKey = (cfg["SMTP_HOST"], int(cfg["SMTP_PORT"]), cfg.get("SMTP_USER") or "")
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = SMTPPool(
+                cfg["SMTP_HOST"],
+                int(cfg["SMTP_PORT"]),
+                user=cfg.get("SMTP_USER") or "",
+                password=cfg.get("SMTP_PASS") or "",
+                use_tls=bool(cfg.get("SMTP_USE_TLS")),
+                max_sessions=cfg.get("SMTP_POOL_SIZE", 4),
+                idle_timeout=cfg.get("SMTP_IDLE_TIMEOUT", 60.0),
+                max_messages=cfg.get("SMTP_MAX_MESSAGES_PER_SESSION", 100),
+            )
+            _POOLS[key] = pool
+        return pool
+
+
+def close_smtp_pools() -> None:
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.close()
@@ -9,6 +9,27 @@ import {
   VETERAN_NOTICE_TEXT,
 } from "../../legal/legalTexts";
 
+const LEGAL_TEXT = {
+  alcoholDrugProgram: ALCOHOL_DRUG_PROGRAM_TEXT,
+  requiredNotice: REQUIRED_NOTICE_TEXT,
+  eeoNotice: EEO_NOTICE_TEXT,
+  disabilityNotice: DISABILITY_NOTICE_TEXT,
+  veteranNotice: VETERAN_NOTICE_TEXT,
+};
+
+// The server keeps the legal texts keyed by SHA-256 of their UTF-8 bytes,
+// so we only send the hashes. Returns null where WebCrypto is unavailable
+// (plain-http non-localhost), in which case the full text is sent instead.
+async function legalTextVersions() {
+  if (!window.crypto?.subtle) return null;
+  const versions = {};
+  for (const [key, text] of Object.entries(LEGAL_TEXT)) {
+    const digest = await window.crypto.subtle.digest("SHA-256", new TextEncoder().encode(text));
+    versions[key] = Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, "0")).join("");
+  }
+  return versions;
+}
+
 const API_BASE =
   (import.meta?.env?.VITE_API_URL || "").replace(/\/+$/, "") ||
   (window.location.hostname === "localhost"
@@ -49,13 +70,6 @@ function StepReview({ form, resumeFile, onReset }) {
       submittedAt: new Date().toISOString(),
       form,
       computed: { vetStatusLabel: formatVetStatus() },
-      legalText: {
-        alcoholDrugProgram: ALCOHOL_DRUG_PROGRAM_TEXT,
-        requiredNotice: REQUIRED_NOTICE_TEXT,
-        eeoNotice: EEO_NOTICE_TEXT,
-        disabilityNotice: DISABILITY_NOTICE_TEXT,
-        veteranNotice: VETERAN_NOTICE_TEXT,
-      },
       clientMeta: {
         userAgent: navigator.userAgent,
         language: navigator.language,
@@ -66,6 +80,14 @@ function StepReview({ form, resumeFile, onReset }) {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [form]);
 
+  // One key per version of the form: pressing Submit again after a timeout
+  // re-sends the same key, so the server returns the first outcome instead
+  // of emailing HR a duplicate.
+  const idempotencyKey = useMemo(
+    () => window.crypto?.randomUUID?.() || `${Date.now()}-${Math.random().toString(36).slice(2)}`,
+    [payload]
+  );
+
   // ✅ Only requirement to proceed: confirm checkbox
   const canSubmit = !submitting && !submitState.ok && confirmChecked;
 
@@ -76,18 +98,28 @@ function StepReview({ form, resumeFile, onReset }) {
     setSubmitState({ ok: false, error: "" });
     setSubmitting(true);
 
-    try {
+    const post = async (legal) => {
       const fd = new FormData();
-      fd.append("payload", JSON.stringify(payload));
+      fd.append("payload", JSON.stringify({ ...payload, ...legal }));
       if (resumeFile instanceof File) fd.append("resume", resumeFile, resumeFile.name);
 
       const res = await fetch(`${API_BASE}/api/submit-application`, {
         method: "POST",
         credentials: "include",
+        headers: { "Idempotency-Key": idempotencyKey },
         body: fd,
       });
-
       const data = await res.json().catch(() => ({}));
+      return { res, data };
+    };
+
+    try {
+      const legalVersion = await legalTextVersions();
+      let { res, data } = await post(legalVersion ? { legalVersion } : { legalText: LEGAL_TEXT });
+      if (res.status === 409 && data?.code === "unknown_legal_version") {
+        // The server has not loaded this bundle's legal text: send the text itself.
+        ({ res, data } = await post({ legalText: LEGAL_TEXT }));
+      }
       if (!res.ok) throw new Error(data?.error || "Submission failed.");
 
       setSubmitState({ ok: true, error: "" });
@@ -0,0 +1,357 @@
+# submission_queue.py
+from __future__ import annotations
+
+import json
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from idempotency import IdempotencyConflict
+from metrics import ERRORS
+from uploads import ResumeData, data_size, iter_chunks
+
+# -------------------------------------------------------
+# Durable submission spool
+#
+# /api/submit-application writes the validated payload (and resume bytes)
+# to a SQLite journal and returns a job id right away. Background worker
+# threads claim jobs with a lease, render + send them, and retry with
+# exponential backoff. A job whose lease expires (worker crashed, process
+# killed) is picked up again by any process sharing the same spool file.
+# -------------------------------------------------------
+Handler = Callable[[Dict[str, Any], Optional[bytes], Optional[str]], None]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id              TEXT PRIMARY KEY,
+    status          TEXT NOT NULL,           -- queued | running | sent | failed
+    payload         TEXT,                    -- NULL once sent
+    resume          BLOB,
+    resume_filename TEXT,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    lease_until     REAL,
+    lease_owner     TEXT,                    -- token of the claim holding the lease
+    last_error      TEXT,
+    created_at      REAL NOT NULL,
+    updated_at      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, next_attempt_at);
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key         TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    job_id      TEXT NOT NULL,
+    created_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idempotency_keys_age ON idempotency_keys (created_at);
+"""
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying the job can never succeed."""
+
+
+class SubmissionQueue:
+    def __init__(
+        self,
+        path: str | Path,
+        handler: Handler,
+        workers: int = 2,
+        max_attempts: int = 8,
+        backoff_base: float = 5.0,
+        backoff_max: float = 900.0,
+        lease_seconds: float = 300.0,
+        poll_interval: float = 1.0,
+        idempotency_ttl: float = 86400.0,
+    ) -> None:
+        self.path = Path(path)
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.idempotency_ttl = idempotency_ttl
+        self.purge_interval = min(3600.0, max(1.0, idempotency_ttl / 24))
+
+        self._next_purge = 0.0
+        self._purge_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    # ---------------------------------------------------
+    # Storage
+    # ---------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        # FULL => the commit in enqueue() is the one fsync the request pays for.
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def enqueue(
+        self,
+        payload: Dict[str, Any],
+        resume_bytes: Optional[ResumeData] = None,
+        resume_filename: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+        fingerprint: str = "",
+    ) -> Tuple[str, bool]:
+        """
+        Spool a job and return (job_id, created). With an idempotency key that
+        already maps to a job that has not failed, nothing is written and that
+        job's id comes back with created=False.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if idempotency_key is not None:
+                existing = self._existing_job(conn, idempotency_key, fingerprint, now)
+                if existing is not None:
+                    conn.execute("COMMIT")
+                    return existing, False
+                conn.execute(
+                    "INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, job_id, created_at) VALUES (?, ?, ?, ?)",
+                    (idempotency_key, fingerprint, job_id, now),
+                )
+            if resume_bytes is None or isinstance(resume_bytes, (bytes, bytearray, memoryview)):
+                conn.execute(
+                    "INSERT INTO jobs (id, status, payload, resume, resume_filename, next_attempt_at, created_at, updated_at)"
+                    " VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)",
+                    (job_id, json.dumps(payload), resume_bytes, resume_filename, now, now, now),
+                )
+            else:
+                # Spooled upload file: reserve the blob, then stream it in chunks.
+                cur = conn.execute(
+                    "INSERT INTO jobs (id, status, payload, resume, resume_filename, next_attempt_at, created_at, updated_at)"
+                    " VALUES (?, 'queued', ?, zeroblob(?), ?, ?, ?, ?)",
+                    (job_id, json.dumps(payload), data_size(resume_bytes), resume_filename, now, now, now),
+                )
+                with conn.blobopen("jobs", "resume", cur.lastrowid) as blob:
+                    for chunk in iter_chunks(resume_bytes):
+                        blob.write(chunk)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        self._wake.set()
+        return job_id, True
+
+    def _existing_job(self, conn: sqlite3.Connection, key: str, fingerprint: str, now: float) -> Optional[str]:
+        # Runs inside enqueue()'s write transaction, which is what makes
+        # concurrent duplicates (from any process) coalesce onto one job.
+        conn.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (now - self.idempotency_ttl,))
+        row = conn.execute(
+            "SELECT k.fingerprint, k.job_id, j.status FROM idempotency_keys k"
+            " LEFT JOIN jobs j ON j.id = k.job_id WHERE k.key = ?",
+            (key,),
+        ).fetchone()
+        if row is None or row["status"] in (None, "failed"):
+            return None  # unknown, or retrying a submission that could not be sent
+        if row["fingerprint"] != fingerprint:
+            raise IdempotencyConflict("Idempotency-Key was already used for a different submission.")
+        return row["job_id"]
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT id, status, attempts, next_attempt_at, last_error, created_at, updated_at"
+                " FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "next_attempt_at": row["next_attempt_at"] if row["status"] == "queued" else None,
+            "last_error": row["last_error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def depth(self) -> Dict[str, int]:
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {"queued": 0, "running": 0, "sent": 0, "failed": 0}
+        counts.update({r["status"]: r["n"] for r in rows})
+        return counts
+
+    def purge(self, now: Optional[float] = None) -> int:
+        """
+        Delete sent and failed jobs (and idempotency keys) older than the
+        idempotency TTL: past it a retry is a new submission anyway, and the
+        spool is not meant to keep applicant data. Returns jobs deleted.
+        """
+        cutoff = (now if now is not None else time.time()) - self.idempotency_ttl
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            cur = conn.execute("DELETE FROM jobs WHERE status IN ('sent', 'failed') AND updated_at < ?", (cutoff,))
+            conn.execute("DELETE FROM idempotency_keys WHERE created_at < ?", (cutoff,))
+            conn.execute("COMMIT")
+        return cur.rowcount
+
+    def _maybe_purge(self) -> None:
+        now = time.time()
+        with self._purge_lock:
+            if now < self._next_purge:
+                return
+            self._next_purge = now + self.purge_interval
+        deleted = self.purge(now)
+        if deleted:
+            print(f"➡ purged {deleted} finished submissions from the spool")
+
+    def _claim(self) -> Optional[Tuple[sqlite3.Row, str]]:
+        now = time.time()
+        lease = uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM jobs"
+                " WHERE (status = 'queued' AND next_attempt_at <= ?)"
+                "    OR (status = 'running' AND lease_until < ?)"
+                " ORDER BY next_attempt_at LIMIT 1",
+                (now, now),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ?, lease_owner = ?,"
+                    " updated_at = ? WHERE id = ?",
+                    (now + self.lease_seconds, lease, now, row["id"]),
+                )
+            conn.execute("COMMIT")
+            return (row, lease) if row is not None else None
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _finish(self, job_id: str, lease: str, status: str, error: Optional[str] = None, delay: float = 0.0) -> None:
+        now = time.time()
+        with closing(self._connect()) as conn:
+            # Only while this worker still holds the lease: after it expired the
+            # job may have been claimed (and finished) by another worker.
+            if status == "sent":
+                # Nothing left to retry; /api/submission-status only needs the status.
+                cur = conn.execute(
+                    "UPDATE jobs SET status = 'sent', payload = NULL, resume = NULL, lease_until = NULL,"
+                    " lease_owner = NULL, last_error = NULL, updated_at = ? WHERE id = ? AND lease_owner = ?",
+                    (now, job_id, lease),
+                )
+            else:
+                cur = conn.execute(
+                    "UPDATE jobs SET status = ?, lease_until = NULL, lease_owner = NULL, last_error = ?,"
+                    " next_attempt_at = ?, updated_at = ? WHERE id = ? AND lease_owner = ?",
+                    (status, error, now + delay, now, job_id, lease),
+                )
+        if cur.rowcount == 0:
+            print(f"⚠️ submission {job_id}: lease lost before finishing ({status}); left to its new owner")
+
+    # ---------------------------------------------------
+    # Workers
+    # ---------------------------------------------------
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** max(0, attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _run_job(self, row: sqlite3.Row, lease: str) -> None:
+        job_id = row["id"]
+        attempts = row["attempts"] + 1
+        try:
+            payload = json.loads(row["payload"])
+            self.handler(payload, row["resume"], row["resume_filename"])
+        except (PermanentJobError, ValueError) as e:
+            ERRORS.inc(route="submission-queue", type=type(e).__name__)
+            print(f"❌ submission {job_id} failed permanently:", repr(e))
+            self._finish(job_id, lease, "failed", error=str(e))
+        except Exception as e:
+            ERRORS.inc(route="submission-queue", type=type(e).__name__)
+            if attempts >= self.max_attempts:
+                print(f"❌ submission {job_id} gave up after {attempts} attempts:", repr(e))
+                self._finish(job_id, lease, "failed", error=str(e))
+            else:
+                delay = self._backoff(attempts)
+                print(f"⚠️ submission {job_id} attempt {attempts} failed; retrying in {delay:.0f}s:", repr(e))
+                self._finish(job_id, lease, "queued", error=str(e), delay=delay)
+        else:
+            self._finish(job_id, lease, "sent")
+
+    def _worker_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                claimed = self._claim()
+                if claimed is not None:
+                    self._run_job(*claimed)
+                    continue
+                self._maybe_purge()
+            except sqlite3.Error as e:
+                print("⚠️ submission queue error:", repr(e))
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def start(self) -> None:
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker_loop, name=f"submit-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def workers_alive(self) -> int:
+        with self._start_lock:
+            return sum(t.is_alive() for t in self._threads)
+
+    def stop(self, timeout: float = 30.0) -> None:
+        with self._start_lock:
+            self._stop.set()
+            self._wake.set()
+            for t in self._threads:
+                t.join(timeout)
+            self._threads = []
+
+
+# -------------------------------------------------------
+# Process-wide queue
+# -------------------------------------------------------
+_QUEUE: Optional[SubmissionQueue] = None
+_QUEUE_LOCK = threading.Lock()
+
+
+def get_submission_queue(cfg: Dict[str, Any], handler: Handler) -> SubmissionQueue:
+    global _QUEUE
+
+    with _QUEUE_LOCK:
+        if _QUEUE is None:
+            _QUEUE = SubmissionQueue(
+                cfg["SUBMIT_SPOOL_PATH"],
+                handler,
+                workers=cfg["SUBMIT_QUEUE_WORKERS"],
+                max_attempts=cfg["SUBMIT_MAX_ATTEMPTS"],
+                backoff_base=cfg["SUBMIT_BACKOFF_BASE"],
+                backoff_max=cfg["SUBMIT_BACKOFF_MAX"],
+                idempotency_ttl=cfg["IDEMPOTENCY_TTL"],
+            )
+            _QUEUE.start()
+        return _QUEUE
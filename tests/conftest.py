@@ -0,0 +1,8 @@
+# tests/conftest.py
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+# The modules live flat at the repo root.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
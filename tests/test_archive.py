@@ -0,0 +1,109 @@
+# tests/test_archive.py
+from __future__ import annotations
+
+import time
+
+import pytest
+
+import archive as archive_module
+import services
+from app import create_app
+from archive import SubmissionArchive
+
+TOKEN = "s3cret-token"
+
+
+def _payload(n: int, position: str, skills: str = "") -> dict:
+    return {"form": {"name": f"Applicant {n}", "email": f"a{n}@example.com", "position": position,
+                     "city": "Honolulu", "state": "HI", "skillsTechnical": skills}}
+
+
+@pytest.fixture
+def archive(tmp_path):
+    store = SubmissionArchive(tmp_path / "archive")
+    for n in range(7):
+        position = "Geotechnical Engineer" if n % 2 else "Field Technician"
+        store.add(f"sub-{n}", _payload(n, position, "slope stability" if n < 3 else "AutoCAD"),
+                  {"main": b"%PDF main " + bytes([n]), "eeo": b"%PDF shared eeo"},
+                  resume_text=f"resume of applicant {n}", submitted_at=1000.0 + n)
+    return store
+
+
+def test_add_is_idempotent_per_submission(archive):
+    app_id, created = archive.add("sub-0", _payload(0, "x"), {})
+    assert (app_id, created) == (1, False)
+    assert archive.stats()["applications"] == 7
+
+
+def test_search_matches_words_and_fields(archive):
+    names = [r["name"] for r in archive.search("slope")["results"]]
+    assert names == ["Applicant 2", "Applicant 1", "Applicant 0"]
+    names = [r["name"] for r in archive.search(position="engineer")["results"]]
+    assert names == ["Applicant 5", "Applicant 3", "Applicant 1"]
+    assert archive.search("stab*", position="technician")["results"][0]["name"] == "Applicant 2"
+    assert archive.search('"; DROP TABLE applications; --')["results"] == []
+
+
+def test_cursor_pages_newest_first(archive):
+    seen, cursor = [], None
+    while True:
+        page = archive.search(limit=3, cursor=cursor)
+        seen += [r["id"] for r in page["results"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [7, 6, 5, 4, 3, 2, 1]
+    assert [r["id"] for r in archive.search(since=1002.0, until=1005.0)["results"]] == [5, 4, 3]
+    with pytest.raises(ValueError):
+        archive.search(cursor="abc")
+
+
+def test_purge_deletes_expired_rows_index_entries_and_unshared_pdfs(archive):
+    doomed = archive.document_path(1, "main")
+    shared = archive.document_path(1, "eeo")
+    assert archive.purge(before=1003.0) == 3
+
+    assert archive.get(1) is None
+    assert [r["name"] for r in archive.search("slope")["results"]] == []
+    assert archive.search("applicant")["results"][-1]["id"] == 4
+    assert not doomed.exists()
+    assert shared.exists()  # still used by the newer applications
+    assert archive.purge(before=1003.0) == 0
+
+
+def test_retention_applies_to_new_adds(tmp_path):
+    store = SubmissionArchive(tmp_path / "archive", retention_days=1)
+    store.add("old", _payload(1, "x"), {}, submitted_at=time.time() - 2 * 86400)
+    store.add("new", _payload(2, "x"), {})
+    assert store.purge_expired() == 1
+    assert store.stats()["applications"] == 1
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch, archive):
+    monkeypatch.setattr(archive_module, "_ARCHIVE", archive)
+    cfg = services.load_env_and_config()
+    cfg.update(ARCHIVE_ENABLED=True, ARCHIVE_DIR=str(archive.directory), ARCHIVE_API_TOKEN=TOKEN)
+    return create_app(cfg).test_client()
+
+
+def test_archive_endpoints_need_the_bearer_token(client):
+    assert client.get("/api/archive/search?q=slope").status_code == 401
+    assert client.get("/api/archive/1", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    auth = {"Authorization": f"Bearer {TOKEN}"}
+
+    page = client.get("/api/archive/search?q=slope&limit=2", headers=auth).get_json()
+    assert [r["id"] for r in page["results"]] == [3, 2]
+    page = client.get(f"/api/archive/search?q=slope&limit=2&cursor={page['next_cursor']}", headers=auth).get_json()
+    assert [r["id"] for r in page["results"]] == [1] and page["next_cursor"] is None
+
+    assert client.get("/api/archive/2", headers=auth).get_json()["payload"]["form"]["name"] == "Applicant 1"
+    doc = client.get("/api/archive/2/documents/main", headers=auth)
+    assert doc.status_code == 200 and doc.data.startswith(b"%PDF")
+    assert client.get("/api/archive/99", headers=auth).status_code == 404
+
+
+def test_archive_endpoints_hidden_without_a_token(client, monkeypatch):
+    app_cfg = client.application.config["APP_CFG"]
+    monkeypatch.setitem(app_cfg, "ARCHIVE_API_TOKEN", "")
+    assert client.get("/api/archive/search", headers={"Authorization": "Bearer "}).status_code == 404
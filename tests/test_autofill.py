@@ -0,0 +1,191 @@
+# tests/test_autofill.py
+from __future__ import annotations
+
+import json
+import threading
+import time
+
+import pytest
+
+import services
+from autofill import AutofillUnavailable, get_autofill, set_autofill_model
+from bench import Upload, make_resume_text
+from resume_cache import ResumeCache
+from resume_scan import scan_resume
+
+RESET = 0.2  # AUTOFILL_BREAKER_RESET for these tests
+
+_REPLY = json.dumps({"contact": {"name": "Jane Stub", "email": "jane@stub.example"}, "targetRole": "Driller"})
+
+
+class StubModel:
+    """An AutofillModel that records calls; optionally waits on `gate` or raises `error`."""
+
+    def __init__(self, reply: str = _REPLY, delay: float = 0.0) -> None:
+        self.reply = reply
+        self.delay = delay
+        self.error: BaseException | None = None
+        self.gate: threading.Event | None = None
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt: str, timeout: float) -> str:
+        with self._lock:
+            self.calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.delay:
+            time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.reply
+
+
+@pytest.fixture
+def cfg():
+    cfg = services.load_env_and_config()
+    cfg.update(
+        AUTOFILL_ENABLED=True,
+        AUTOFILL_TIMEOUT=1.0,
+        AUTOFILL_MAX_CONCURRENCY=2,
+        AUTOFILL_BREAKER_FAILURES=2,
+        AUTOFILL_BREAKER_RESET=RESET,
+        RESUME_CACHE_ENABLED=False,
+        GEMINI_MODEL="stub-1",
+    )
+    yield cfg
+    set_autofill_model(None)
+
+
+def _client(cfg, model: StubModel, cache=None):
+    set_autofill_model(model)
+    return get_autofill(cfg, cache)
+
+
+def _in_thread(fn, *args):
+    out = {}
+
+    def run():
+        try:
+            out["result"] = fn(*args)
+        except Exception as e:
+            out["error"] = e
+
+    t = threading.Thread(target=run)
+    t.start()
+    return t, out
+
+
+def test_slow_model_falls_back_to_regex(cfg):
+    cfg["AUTOFILL_TIMEOUT"] = 0.2
+    model = StubModel(delay=1.0)
+    set_autofill_model(model)
+    text = make_resume_text(seed=3)
+
+    t0 = time.monotonic()
+    result = services.parse_resume_file(Upload(text.encode("utf-8"), "resume.txt"), cfg)
+    elapsed = time.monotonic() - t0
+
+    assert model.calls == 1
+    assert elapsed < 0.9
+    assert result["meta"]["mode"] == "simple"
+    assert result["parsed"] == scan_resume(text)
+
+
+def test_fast_model_is_used(cfg):
+    set_autofill_model(StubModel())
+    result = services.parse_resume_file(Upload(make_resume_text(seed=4).encode("utf-8"), "resume.txt"), cfg)
+    assert result["meta"]["mode"] == "llm"
+    assert result["meta"]["model"] == "stub-1"
+    assert result["parsed"]["contact"]["name"] == "Jane Stub"
+    assert result["parsed"]["contact"]["phone"]  # filled in from the regex scan
+
+
+def test_cache_hit_on_same_text_and_model(cfg):
+    cache = ResumeCache()
+    model = StubModel()
+    client = _client(cfg, model, cache)
+    first = client.parse("resume one")
+    assert client.parse("resume one") == first
+    assert model.calls == 1
+
+    client.parse("resume two")
+    assert model.calls == 2
+
+    cfg["GEMINI_MODEL"] = "stub-2"
+    _client(cfg, model, cache).parse("resume one")
+    assert model.calls == 3
+
+
+def test_breaker_opens_after_failures_and_half_opens_for_one_trial(cfg):
+    model = StubModel()
+    model.error = RuntimeError("upstream 500")
+    client = _client(cfg, model)
+
+    for _ in range(2):
+        with pytest.raises(AutofillUnavailable):
+            client.parse("a")
+    assert client.breaker.state == "open"
+    with pytest.raises(AutofillUnavailable, match="circuit open"):
+        client.parse("a")
+    assert model.calls == 2
+
+    # Half-open: exactly one trial goes through; a failed trial re-opens.
+    time.sleep(RESET + 0.05)
+    assert client.breaker.state == "half-open"
+    with pytest.raises(AutofillUnavailable, match="upstream 500"):
+        client.parse("a")
+    assert model.calls == 3
+    assert client.breaker.state == "open"
+
+    # Next half-open trial succeeds; concurrent calls are refused meanwhile.
+    time.sleep(RESET + 0.05)
+    model.error = None
+    model.gate = threading.Event()
+    t, out = _in_thread(client.parse, "a")
+    while model.calls < 4:
+        time.sleep(0.01)
+    with pytest.raises(AutofillUnavailable, match="circuit open"):
+        client.parse("b")
+    model.gate.set()
+    t.join()
+    assert "result" in out
+    assert model.calls == 4
+    assert client.breaker.state == "closed"
+
+
+def test_permission_denied_trips_for_longer(cfg):
+    from google.api_core.exceptions import PermissionDenied
+
+    model = StubModel()
+    model.error = PermissionDenied("API key revoked")
+    client = _client(cfg, model)
+
+    with pytest.raises(AutofillUnavailable):
+        client.parse("a")
+    assert client.breaker.state == "open"  # on the first failure, below the threshold
+    time.sleep(RESET + 0.05)
+    assert client.breaker.state == "open"  # and past the normal reset timeout
+    with pytest.raises(AutofillUnavailable, match="circuit open"):
+        client.parse("a")
+    assert model.calls == 1
+
+
+def test_in_flight_calls_are_limited(cfg):
+    model = StubModel()
+    model.gate = threading.Event()
+    client = _client(cfg, model)
+
+    running = [_in_thread(client.parse, f"resume {n}") for n in range(2)]
+    while model.calls < 2:
+        time.sleep(0.01)
+    with pytest.raises(AutofillUnavailable, match="in flight"):
+        client.parse("resume 3")
+    model.gate.set()
+    for t, out in running:
+        t.join()
+        assert "result" in out
+    assert model.calls == 2
+
+    client.parse("resume 4")  # slots are free again
+    assert model.calls == 3
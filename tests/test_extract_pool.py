@@ -0,0 +1,32 @@
+# tests/test_extract_pool.py
+from __future__ import annotations
+
+import pytest
+
+from extract_pool import SandboxPool
+
+
+@pytest.fixture
+def pool():
+    pool = SandboxPool(workers=1, max_jobs=2)
+    pool.start()
+    yield pool
+    pool.shutdown()
+
+
+def test_pings_do_not_recycle_workers(pool):
+    pid = pool._idle[0].process.pid
+    for _ in range(5):
+        assert pool.ping()
+    assert pool._idle[0].process.pid == pid
+    assert pool._idle[0].jobs == 0
+
+
+def test_jobs_recycle_workers_after_max_jobs(pool):
+    pid = pool._idle[0].process.pid
+    assert pool.run("text", b"hello", "a.txt") == "hello"
+    assert pool._idle[0].process.pid == pid
+    pool.run("text", b"hello", "a.txt")
+    assert not pool._idle  # replaced on the next checkout
+    pool.run("text", b"hello", "a.txt")
+    assert pool._idle[0].process.pid != pid
@@ -0,0 +1,80 @@
+# tests/test_mail_routing.py
+from __future__ import annotations
+
+import smtplib
+
+import pytest
+
+from mail_routing import DigestSpool, MailRouter, Route
+
+DIGEST = {"window": 0.0, "max_count": 10, "max_bytes": 1024 * 1024, "zip": False}
+
+
+class FailingSender:
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+        self.calls = 0
+
+    def __call__(self, route, entries) -> None:
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+
+
+def _spool(tmp_path, sender, **kwargs) -> DigestSpool:
+    router = MailRouter([], Route("default", ["hr@example.com"], digest=DIGEST))
+    kwargs.setdefault("backoff_base", 0.0)
+    return DigestSpool(tmp_path / "digests.db", router, sender, **kwargs)
+
+
+def _add(spool: DigestSpool, n: int = 2) -> None:
+    route = spool.router.default
+    for i in range(n):
+        spool.add(route, {"name": f"Applicant {i}", "submitted_at": 0}, [("a.pdf", b"%PDF-1.4")])
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        smtplib.SMTPRecipientsRefused({"hr@example.com": (550, b"no such user")}),
+        smtplib.SMTPSenderRefused(553, b"sender not allowed", "jobs@example.com"),
+    ],
+    ids=["recipients", "sender"],
+)
+def test_5xx_refusal_fails_batch_at_once(tmp_path, error):
+    sender = FailingSender(error)
+    spool = _spool(tmp_path, sender)
+    _add(spool)
+
+    assert spool.flush() == 0
+    assert spool.flush() == 0
+    assert sender.calls == 1
+    assert spool.depth() == {}
+    assert spool.depth("failed") == {"default": 2}
+
+
+def test_transient_failures_stop_at_max_attempts(tmp_path):
+    sender = FailingSender(smtplib.SMTPRecipientsRefused({"hr@example.com": (450, b"mailbox busy")}))
+    spool = _spool(tmp_path, sender, max_attempts=3)
+    _add(spool)
+
+    for attempt in range(1, 4):
+        spool.flush()
+        assert sender.calls == attempt
+    assert spool.depth() == {}
+    assert spool.depth("failed") == {"default": 2}
+    spool.flush()
+    assert sender.calls == 3
+
+
+def test_retry_after_transient_failure_sends(tmp_path):
+    sender = FailingSender(smtplib.SMTPServerDisconnected("dropped"))
+    spool = _spool(tmp_path, sender)
+    _add(spool)
+
+    assert spool.flush() == 0
+    assert spool.depth() == {"default": 2}
+    sender.error = None
+    assert spool.flush() == 2
+    assert spool.depth() == {}
+    assert spool.depth("failed") == {}
@@ -0,0 +1,81 @@
+# tests/test_pdf_compress.py
+from __future__ import annotations
+
+import io
+
+import pytest
+
+pytest.importorskip("PIL")
+
+from PIL import Image, ImageCms
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ArrayObject, NameObject, NumberObject, StreamObject
+
+from pdf_compress import compress_pdf
+
+TEXT = "Jane Q. Applicant  jane@example.com  (808) 555-0100"
+
+
+def _scan_with_text(pages: int = 2, icc: bool = False) -> bytes:
+    """Pages with a line of real text over a large noisy photo, like a scanned resume with an OCR layer."""
+    from reportlab.lib.pagesizes import LETTER
+    from reportlab.lib.utils import ImageReader
+    from reportlab.pdfgen import canvas
+
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=LETTER)
+    for p in range(pages):
+        photo = Image.effect_noise((1200, 1500), 40 + p).convert("RGB")
+        c.drawImage(ImageReader(photo), 0, 0, width=612, height=792)
+        c.drawString(72, 740, f"{TEXT} page {p + 1}")
+        c.showPage()
+    c.save()
+    if not icc:
+        return buf.getvalue()
+
+    writer = PdfWriter(clone_from=PdfReader(io.BytesIO(buf.getvalue())))
+    profile = StreamObject()
+    profile[NameObject("/N")] = NumberObject(3)
+    profile._data = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+    ref = writer._add_object(profile)
+    for page in writer.pages:
+        for xobj in page["/Resources"]["/XObject"].values():
+            xobj.get_object()[NameObject("/ColorSpace")] = ArrayObject([NameObject("/ICCBased"), ref])
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue()
+
+
+def _image_colorspaces(pdf: bytes):
+    spaces = []
+    for page in PdfReader(io.BytesIO(pdf)).pages:
+        for xobj in page["/Resources"]["/XObject"].values():
+            cs = xobj.get_object()["/ColorSpace"]
+            cs = cs.get_object()
+            spaces.append(str(cs[0]) if isinstance(cs, ArrayObject) else str(cs))
+    return spaces
+
+
+def test_lossy_pass_keeps_pages_and_text():
+    original = _scan_with_text()
+    smaller, report = compress_pdf(original, budget=len(original) // 4)
+
+    assert smaller is not None and report["pass"].endswith(tuple(f"q{q}" for q in (80, 70, 60)))
+    assert report["images"] == 2 and len(smaller) < len(original)
+    reader = PdfReader(io.BytesIO(smaller))
+    assert len(reader.pages) == 2
+    for p, page in enumerate(reader.pages):
+        assert f"{TEXT} page {p + 1}" in page.extract_text()
+    assert _image_colorspaces(smaller) == ["/DeviceRGB", "/DeviceRGB"]
+
+
+def test_icc_color_space_is_kept():
+    original = _scan_with_text(icc=True)
+    smaller, report = compress_pdf(original, budget=len(original) // 4)
+
+    assert smaller is not None and report["images"] == 2
+    assert _image_colorspaces(smaller) == ["/ICCBased", "/ICCBased"]
+    for page in PdfReader(io.BytesIO(smaller)).pages:
+        for xobj in page["/Resources"]["/XObject"].values():
+            assert xobj.get_object()["/Filter"] == "/DCTDecode"
+            assert xobj.get_object()["/ColorSpace"][1].get_object()["/N"] == 3
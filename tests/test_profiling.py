@@ -0,0 +1,44 @@
+# tests/test_profiling.py
+from __future__ import annotations
+
+import pytest
+
+import services
+from bench import make_payload
+from profiling import PROFILE_MARKER, RequestProfiler, valid_profile_id
+
+
+class RecordingQueue:
+    def __init__(self) -> None:
+        self.payloads = []
+        self.fingerprints = []
+
+    def enqueue(self, payload, **kwargs):
+        self.payloads.append(payload)
+        self.fingerprints.append(kwargs["fingerprint"])
+        return "job-1", True
+
+
+def test_profile_ids_are_validated(tmp_path):
+    assert valid_profile_id("0123456789ab")
+    for bad in ("../../etc/x", "0123456789AB", "0123456789abc", "", None, 7):
+        assert not valid_profile_id(bad)
+
+    profiler = RequestProfiler(tmp_path)
+    with pytest.raises(ValueError):
+        with profiler.profile("submit-job", "../escape"):
+            pass
+
+
+def test_client_cannot_request_a_profiled_job(monkeypatch):
+    queue = RecordingQueue()
+    monkeypatch.setattr(services, "get_application_queue", lambda cfg: queue)
+    cfg = services.load_env_and_config()
+    payload = {**make_payload(), PROFILE_MARKER: "../../../tmp/owned"}
+
+    services.enqueue_application_payload(payload, cfg)
+    assert PROFILE_MARKER not in queue.payloads[0]
+
+    # A client-sent marker does not change the fingerprint either.
+    services.enqueue_application_payload(make_payload(), cfg)
+    assert queue.fingerprints[0] == queue.fingerprints[1]
@@ -0,0 +1,31 @@
+# tests/test_render_pool.py
+from __future__ import annotations
+
+import pytest
+
+import render_pool
+from bench import make_payload
+
+CFG = {"RENDER_MODE": "process", "RENDER_WORKERS": 2}
+
+
+@pytest.fixture(autouse=True)
+def _shutdown():
+    yield
+    render_pool.shutdown_render_executor()
+
+
+def test_default_context_is_not_fork():
+    executor = render_pool.get_render_executor(CFG)
+    assert executor._mp_context.get_start_method() in {"forkserver", "spawn"}
+
+
+def test_fork_is_an_explicit_opt_in():
+    executor = render_pool.get_render_executor({**CFG, "RENDER_START_METHOD": "fork"})
+    assert executor._mp_context.get_start_method() == "fork"
+
+
+def test_renders_every_form_in_the_pool():
+    docs, timings = render_pool.render_application_pdfs(make_payload(jobs=1, duty_words=20), CFG)
+    assert set(docs) == set(render_pool.RENDER_JOBS)
+    assert all(pdf.startswith(b"%PDF") for pdf in docs.values())
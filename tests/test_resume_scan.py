@@ -0,0 +1,63 @@
+# tests/test_resume_scan.py
+from __future__ import annotations
+
+import re
+
+from bench import make_resume_corpus
+from resume_scan import scan_resume
+
+# The contact-only parser parse_resume_file used before resume_scan.py.
+_EMAIL_RE = re.compile(r"\b[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}\b", re.I)
+_PHONE_RE = re.compile(
+    r"(?:(?:\+?1[\s\-\.])?\(?\d{3}\)?[\s\-\.]?\d{3}[\s\-\.]?\d{4})(?:\s*(?:x|ext\.?)\s*\d+)?",
+    re.I,
+)
+
+
+def _old_contact(text: str):
+    email = _EMAIL_RE.search(text)
+    phone = _PHONE_RE.search(text)
+    return email.group(0) if email else None, phone.group(0) if phone else None
+
+
+def test_contact_matches_regex_parser_on_corpus():
+    for text in make_resume_corpus(200):
+        contact = scan_resume(text)["contact"]
+        assert (contact["email"], contact["phone"]) == _old_contact(text)
+
+
+def test_phone_outside_header_falls_back_to_first_hit():
+    text = "Jane Doe\nExperience\nEngineer, Acme Inc.\nContact: jane@example.com (808) 555-1234"
+    contact = scan_resume(text)["contact"]
+    assert contact["email"] == "jane@example.com"
+    assert contact["phone"] == "(808) 555-1234"
+
+
+
+def _resume_pdf(text: str, lines_per_page: int = 12) -> bytes:
+    import io
+
+    from reportlab.lib.pagesizes import LETTER
+    from reportlab.pdfgen import canvas
+
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf, pagesize=LETTER)
+    lines = text.splitlines()
+    for start in range(0, len(lines), lines_per_page):
+        y = 740
+        for line in lines[start:start + lines_per_page]:
+            c.drawString(72, y, line)
+            y -= 15
+        c.showPage()
+    c.save()
+    return buf.getvalue()
+
+
+def test_pdf_prefix_scan_matches_scanning_its_text():
+    import services
+
+    for seed in range(3):
+        pdf = _resume_pdf(make_resume_corpus(seed + 1)[seed])
+        text, pages, scan = services._extract_pdf_prefix(pdf, "resume.pdf", 10**6, stop_when_found=False)
+        assert pages > 1
+        assert scan == scan_resume(text)
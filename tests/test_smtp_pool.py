@@ -0,0 +1,166 @@
+# tests/test_smtp_pool.py
+from __future__ import annotations
+
+import smtplib
+import threading
+from email.message import EmailMessage
+
+import pytest
+
+from bench import SMTPSink
+from mime_stream import StreamingMessage, send_streaming
+from smtp_pool import SMTPPool, SMTPPoolTimeout
+
+
+@pytest.fixture
+def sink():
+    server = SMTPSink()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _pool(sink: SMTPSink, **kwargs) -> SMTPPool:
+    kwargs.setdefault("timeout", 5.0)
+    return SMTPPool("127.0.0.1", sink.port, use_tls=False, **kwargs)
+
+
+def _message(n: int = 0) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = "jobs@example.com"
+    msg["To"] = "hr@example.com"
+    msg["Subject"] = f"Application {n}"
+    msg.set_content("hello")
+    return msg
+
+
+def test_session_is_reused_across_sends(sink):
+    pool = _pool(sink)
+    try:
+        pool.send(_message(1))
+        pool.send(
+            StreamingMessage("jobs@example.com", "hr@example.com", "Application 2", "hello", [("a.pdf", b"%PDF" * 100)])
+        )
+        pool.send_many([_message(3), _message(4)])
+    finally:
+        pool.close()
+    assert sink.connections == 1
+    assert pool.stats["connects"] == 1
+    assert pool.stats["reuses"] == 2
+    assert pool.stats["sent"] == 4
+    assert sink.bytes_received > 400
+
+
+def test_session_recycled_after_max_messages(sink):
+    pool = _pool(sink, max_messages=2)
+    try:
+        assert pool.send_many(_message(n) for n in range(5)) == 5
+    finally:
+        pool.close()
+    assert pool.stats["connects"] == 3
+
+
+def test_failed_noop_reconnects(sink):
+    pool = _pool(sink, noop_after=-1)  # NOOP-check every reuse
+    try:
+        pool.send(_message(1))
+        sink.faults[b"NOOP"] = [b"421 closing\r\n"]
+        pool.send(_message(2))
+        pool.send(_message(3))
+    finally:
+        pool.close()
+    assert pool.stats["noop_failures"] == 1
+    assert pool.stats["connects"] == 2
+    assert pool.stats["sent"] == 3
+    assert sink.connections == 2
+
+
+@pytest.mark.parametrize("reply", [b"421 too busy\r\n", b""], ids=["421", "disconnect"])
+def test_dropped_session_retries_once_on_a_fresh_one(sink, reply):
+    pool = _pool(sink)
+    try:
+        pool.send(_message(1))
+        sink.faults[b"MAIL"] = [reply]
+        pool.send(_message(2))
+    finally:
+        pool.close()
+    assert pool.stats["reconnects"] == 1
+    assert pool.stats["connects"] == 2
+    assert pool.stats["sent"] == 2
+
+
+def test_retry_is_not_repeated(sink):
+    pool = _pool(sink)
+    sink.faults[b"MAIL"] = [b"421 too busy\r\n", b"421 still busy\r\n"]
+    try:
+        with pytest.raises(smtplib.SMTPSenderRefused):
+            pool.send(_message())
+    finally:
+        pool.close()
+    assert pool.stats["reconnects"] == 1
+    assert pool.stats["sent"] == 0
+
+
+def test_permanent_refusal_is_not_retried(sink):
+    pool = _pool(sink)
+    sink.faults[b"MAIL"] = [b"550 no such sender\r\n"]
+    try:
+        with pytest.raises(smtplib.SMTPSenderRefused):
+            pool.send(_message())
+        pool.send(_message())  # the pool still works afterwards
+    finally:
+        pool.close()
+    assert pool.stats["reconnects"] == 0
+    assert pool.stats["sent"] == 1
+
+
+def test_concurrent_sessions_are_capped(sink):
+    pool = _pool(sink, max_sessions=2)
+    errors = []
+
+    def sender(n: int) -> None:
+        try:
+            pool.send_many(_message(n * 10 + i) for i in range(5))
+        except Exception as e:  # surfaced by the assertion below
+            errors.append(e)
+
+    threads = [threading.Thread(target=sender, args=(n,)) for n in range(8)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        pool.close()
+    assert errors == []
+    assert pool.stats["sent"] == 40
+    assert pool.stats["connects"] <= 2
+    assert sink.max_active <= 2
+
+
+def test_waiting_for_a_session_times_out(sink):
+    pool = _pool(sink, max_sessions=1, wait_timeout=0.2)
+    try:
+        with pool.session():
+            with pytest.raises(SMTPPoolTimeout):
+                with pool.session():
+                    pass
+        with pool.session() as smtp:  # freed again
+            assert smtp.noop()[0] == 250
+    finally:
+        pool.close()
+    assert pool.stats["connects"] == 1
+
+
+@pytest.mark.parametrize("command", [b"DATA", b"RCPT"])
+def test_refused_streaming_send_leaves_the_session_reusable(sink, command):
+    sink.faults[command] = [b"554 transaction failed\r\n"]
+    message = StreamingMessage("jobs@example.com", "hr@example.com", "Application", "hello", [("a.pdf", b"%PDF")])
+    smtp = smtplib.SMTP("127.0.0.1", sink.port, timeout=5.0)
+    try:
+        with pytest.raises((smtplib.SMTPDataError, smtplib.SMTPRecipientsRefused)):
+            send_streaming(smtp, message)
+        assert send_streaming(smtp, message) == {}  # no 503 for a MAIL inside the old transaction
+    finally:
+        smtp.quit()
+    assert sink.connections == 1
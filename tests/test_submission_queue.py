@@ -0,0 +1,73 @@
+# tests/test_submission_queue.py
+from __future__ import annotations
+
+import sqlite3
+import time
+from contextlib import closing
+
+import pytest
+
+from submission_queue import SubmissionQueue
+
+
+class Handler:
+    def __init__(self) -> None:
+        self.calls = []
+
+    def __call__(self, payload, resume, filename) -> None:
+        self.calls.append((payload, resume, filename))
+
+
+@pytest.fixture
+def queue(tmp_path):
+    # Workers are not started; the tests drive _claim / _run_job directly.
+    return SubmissionQueue(tmp_path / "submissions.db", Handler(), idempotency_ttl=3600)
+
+
+def _row(queue: SubmissionQueue, job_id: str) -> sqlite3.Row:
+    with closing(sqlite3.connect(queue.path)) as conn:
+        conn.row_factory = sqlite3.Row
+        return conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+def test_sent_job_keeps_only_its_status(queue):
+    job_id, _ = queue.enqueue({"form": {"name": "Jane"}}, b"%PDF resume", "resume.pdf", idempotency_key="k")
+    queue._run_job(*queue._claim())
+
+    assert queue.handler.calls == [({"form": {"name": "Jane"}}, b"%PDF resume", "resume.pdf")]
+    row = _row(queue, job_id)
+    assert row["payload"] is None and row["resume"] is None
+    assert queue.status(job_id)["status"] == "sent"
+    # A retry with the same key still finds the job.
+    assert queue.enqueue({"form": {"name": "Jane"}}, idempotency_key="k") == (job_id, False)
+
+
+def test_purge_removes_finished_jobs_past_the_ttl(queue):
+    sent, _ = queue.enqueue({"n": 1}, idempotency_key="a", fingerprint="a")
+    queue._run_job(*queue._claim())
+    queued, _ = queue.enqueue({"n": 2}, idempotency_key="b", fingerprint="b")
+
+    assert queue.purge() == 0  # too recent
+    assert queue.purge(now=time.time() + 3600 + 1) == 1
+    assert queue.status(sent) is None
+    assert queue.status(queued)["status"] == "queued"
+    with closing(sqlite3.connect(queue.path)) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM idempotency_keys").fetchone()[0] == 0
+
+
+def test_expired_lease_cannot_overwrite_the_new_owner(queue):
+    job_id, _ = queue.enqueue({"n": 1})
+    stale = queue._claim()
+    with closing(sqlite3.connect(queue.path)) as conn:
+        conn.execute("UPDATE jobs SET lease_until = 0 WHERE id = ?", (job_id,))
+        conn.commit()
+    fresh = queue._claim()
+    assert fresh is not None and fresh[1] != stale[1]
+
+    queue._run_job(*fresh)
+    assert queue.status(job_id)["status"] == "sent"
+
+    queue._finish(job_id, stale[1], "queued", error="late failure", delay=60)
+    status = queue.status(job_id)
+    assert status["status"] == "sent"
+    assert status["last_error"] is None
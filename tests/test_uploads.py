@@ -0,0 +1,46 @@
+# tests/test_uploads.py
+from __future__ import annotations
+
+import os
+from tempfile import SpooledTemporaryFile
+
+from uploads import buffer_of, close_buffer
+
+DATA = b"%PDF-1.7 " * 4096
+
+
+def _open_fds() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+def _spooled(rolled: bool) -> SpooledTemporaryFile:
+    f = SpooledTemporaryFile(max_size=1024 if rolled else len(DATA) * 2, mode="w+b")
+    f.write(DATA)
+    return f
+
+
+def test_rolled_upload_is_mapped_and_unmapped():
+    with _spooled(rolled=True) as f:
+        before = _open_fds()
+        buffer = buffer_of(f)
+        assert isinstance(buffer, memoryview) and buffer == DATA
+        assert _open_fds() == before + 1  # the mapping's own fd
+        close_buffer(buffer)
+        assert _open_fds() == before
+
+
+def test_close_buffer_leaves_plain_buffers_alone():
+    with _spooled(rolled=False) as f:
+        assert buffer_of(f) == DATA
+    data = bytearray(DATA)
+    close_buffer(data)
+    close_buffer(None)
+    assert buffer_of(data) is data
+
+
+def test_close_buffer_with_a_live_slice():
+    with _spooled(rolled=True) as f:
+        buffer = buffer_of(f)
+        head = buffer[:8]
+        close_buffer(buffer)  # unmapped later, once the slice is gone
+        assert head == b"%PDF-1.7"
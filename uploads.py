@@ -0,0 +1,156 @@
+# uploads.py
+from __future__ import annotations
+
+import io
+import mmap
+import os
+from tempfile import SpooledTemporaryFile
+from typing import Any, BinaryIO, Dict, Union
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+
+# -------------------------------------------------------
+# Streamed, size-capped uploads
+#
+# Multipart file parts are written straight into a SpooledTemporaryFile
+# that stays in memory up to UPLOAD_SPOOL_THRESHOLD and spills to disk
+# above it. The per-extension byte limit is enforced on every write, so an
+# oversized upload is rejected as soon as it crosses the limit instead of
+# after it has been fully buffered.
+# -------------------------------------------------------
+ResumeData = Union[bytes, bytearray, memoryview, BinaryIO]
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _human(n: int) -> str:
+    if n >= 1024 * 1024:
+        return f"{n / (1024 * 1024):.0f} MB"
+    return f"{n / 1024:.0f} KB"
+
+
+def upload_limit(filename: str | None, limits: Dict[str, int]) -> int:
+    ext = os.path.splitext(filename or "")[1].lower()
+    # Unknown types get the tightest limit; they are rejected later anyway.
+    return limits.get(ext, min(limits.values()))
+
+
+class CappedSpooledFile(SpooledTemporaryFile):
+    def __init__(self, limit: int, max_size: int, filename: str | None = None) -> None:
+        super().__init__(max_size=max_size, mode="w+b")
+        self.limit = limit
+        self.filename = filename or "upload"
+        self.written = 0
+
+    def write(self, s) -> int:
+        self.written += len(s)
+        if self.written > self.limit:
+            raise RequestEntityTooLarge(
+                f"{self.filename} exceeds the {_human(self.limit)} limit for this file type."
+            )
+        return super().write(s)
+
+
+class SpooledUploadRequest(Request):
+    def _get_file_stream(
+        self,
+        total_content_length: int | None,
+        content_type: str | None,
+        filename: str | None = None,
+        content_length: int | None = None,
+    ) -> BinaryIO:
+        config = current_app.config
+        limit = upload_limit(filename, config["UPLOAD_MAX_BYTES"])
+        if content_length is not None and content_length > limit:
+            raise RequestEntityTooLarge(f"{filename or 'upload'} exceeds the {_human(limit)} limit for this file type.")
+        return CappedSpooledFile(limit, config["UPLOAD_SPOOL_THRESHOLD"], filename)  # type: ignore[return-value]
+
+
+def configure_uploads(app, cfg: Dict[str, Any]) -> None:
+    app.request_class = SpooledUploadRequest
+    app.config["MAX_CONTENT_LENGTH"] = cfg["MAX_CONTENT_LENGTH"]
+    app.config["UPLOAD_MAX_BYTES"] = cfg["UPLOAD_MAX_BYTES"]
+    app.config["UPLOAD_SPOOL_THRESHOLD"] = cfg["UPLOAD_SPOOL_THRESHOLD"]
+
+
+# -------------------------------------------------------
+# Reading resume data without extra copies
+# -------------------------------------------------------
+def open_binary(data: ResumeData) -> BinaryIO:
+    """Seekable binary stream over bytes or an (already seekable) upload file."""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return io.BytesIO(data)
+    data.seek(0)
+    return data
+
+
+def read_text(data: ResumeData) -> str:
+    """Decode a text upload as UTF-8 (ignoring bad bytes) without an intermediate bytes copy."""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return bytes(data).decode("utf-8", errors="ignore")
+    data.seek(0)
+    wrapper = io.TextIOWrapper(data, encoding="utf-8", errors="ignore")
+    try:
+        return wrapper.read()
+    finally:
+        wrapper.detach()  # leave the underlying upload open
+
+
+def buffer_of(data: ResumeData) -> Union[bytes, bytearray, memoryview]:
+    """
+    Byte buffer over the whole upload. A spooled file that rolled over to disk
+    is mmapped read-only instead of being read back into memory; pass the
+    result to close_buffer() when done with it.
+    """
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return data
+    if not isinstance(data, SpooledTemporaryFile) or data._rolled:
+        try:
+            return memoryview(mmap.mmap(data.fileno(), 0, access=mmap.ACCESS_READ))
+        except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+            pass  # empty file, or not backed by a real fd
+    data.seek(0)
+    return data.read()
+
+
+def close_buffer(buffer: Any) -> None:
+    """
+    Unmap a buffer_of() result backed by an mmap (anything else is left alone).
+    The mapping holds its own fd, so callers do this in the same `finally` that
+    is done with the upload instead of leaving it to the garbage collector.
+    """
+    if not isinstance(buffer, memoryview):
+        return
+    mapped = buffer.obj
+    buffer.release()
+    if isinstance(mapped, mmap.mmap):
+        try:
+            mapped.close()
+        except BufferError:
+            pass  # a slice is still exported; it is unmapped when that goes away
+
+
+def data_size(data: ResumeData) -> int:
+    if isinstance(data, (bytes, bytearray)):
+        return len(data)
+    if isinstance(data, memoryview):
+        return data.nbytes
+    data.seek(0, io.SEEK_END)
+    size = data.tell()
+    data.seek(0)
+    return size
+
+
+def iter_chunks(data: ResumeData, chunk_size: int = CHUNK_SIZE):
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        view = memoryview(data)
+        for i in range(0, len(view), chunk_size):
+            yield view[i:i + chunk_size]
+        return
+    data.seek(0)
+    while True:
+        chunk = data.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk